@@ -13,6 +13,7 @@ setup(
     entry_points={
         'console_scripts': [
             'nli=src.cli:main',
+            'nli-batch=src.batch:main',
         ],
     },
 )
\ No newline at end of file
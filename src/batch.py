@@ -0,0 +1,69 @@
+# src/batch.py
+
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add the parent directory to sys.path if needed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pipeline import NLIpipeline
+
+def read_questions(path):
+    """
+    Read a batch of questions.
+
+    Args:
+        path (str): JSONL file with one {"question": ..., "role": ...} object per line;
+                    "domain" and any other keys, such as an "id", are optional
+
+    Returns:
+        list: Question dicts
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question"):
+                raise ValueError(f"{path}:{line_number}: missing 'question'")
+            items.append(item)
+    return items
+
+def write_results(results, path):
+    """
+    Write batch results as JSONL, one line per question in the order they were read.
+
+    Args:
+        results (list): Results from NLIpipeline.process_batch()
+        path (str): Output file
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for result in results:
+            # Previews can hold dates and numpy numbers
+            f.write(json.dumps(result, default=str) + "\n")
+
+def main():
+    """Answer a file of questions in one batch."""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Answer a JSONL file of questions, sharing repeated work')
+    parser.add_argument('input', type=str, help='JSONL file with one {"question", "role"} object per line')
+    parser.add_argument('--output', '-o', type=str, default='./output/batch_results.jsonl',
+                        help='JSONL file for the results (default: ./output/batch_results.jsonl)')
+    parser.add_argument('--workers', '-w', type=int, help='Questions processed at once (default: BATCH_WORKERS or 4)')
+
+    args = parser.parse_args()
+
+    items = read_questions(args.input)
+    with NLIpipeline() as pipeline:
+        results, _ = pipeline.process_batch(items, workers=args.workers)
+    write_results(results, args.output)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# src/benchmark.py
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Add the parent directory to sys.path if needed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.llm_backends import MockBackend, RecordReplayBackend, create_backend
+from src.models.sql_generator import SQLGenerator
+from src.models.template_matcher import TemplateMatcher
+from src.utils.llm_cache import LLMCache
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.semantic_cache import SemanticCache
+from src.utils.single_flight import SingleFlight
+
+SAMPLE_QUESTIONS = [
+    "What are the sales by region?",
+    "Show me the top 5 products by revenue",
+    "Which regions have the most customers?",
+    "Monthly sales trend for laptops in 2024",
+    "Average order value by customer segment",
+    "Which customers bought more than 3 items online?",
+    "Compare sales in the North and South regions",
+    "What share of revenue comes from each sales channel?",
+]
+
+def run_benchmark(generator, questions, schema_text, requests=100, concurrency=8, user_role="Analyst"):
+    """
+    Send questions through a generator and measure throughput and latency.
+
+    Args:
+        generator (SQLGenerator): Generator to benchmark
+        questions (list): Questions, cycled through until requests have been sent
+        schema_text (str): Database schema in text format
+        requests (int): Total number of requests
+        concurrency (int): Requests in flight at once
+        user_role (str): User role
+
+    Returns:
+        dict: Request count, errors, wall time, throughput and p50/p95/p99/max latency in seconds
+    """
+    def timed(question):
+        start = time.perf_counter()
+        sql = generator.generate_sql(question, schema_text, user_role)
+        return time.perf_counter() - start, sql.startswith("Error:")
+
+    batch = [questions[i % len(questions)] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, batch))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+    return {
+        "requests": requests,
+        "errors": sum(1 for _, error in results if error),
+        "seconds": wall,
+        "throughput": requests / wall if wall > 0 else 0.0,
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": latencies[-1],
+    }
+
+def main():
+    """Benchmark SQL generation offline against a mock or replayed backend."""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Benchmark SQL generation throughput and tail latency')
+    parser.add_argument('--backend', '-b', choices=['mock', 'record', 'replay'], default='mock',
+                        help='mock, record the configured remote backend, or replay a recording (default: mock)')
+    parser.add_argument('--recording', type=str, help='Recording file for the record and replay backends')
+    parser.add_argument('--latency', type=float,
+                        help='Median synthetic LLM latency in seconds (default: 0.5 for mock, recorded for replay)')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Spread of the lognormal latency (0 for fixed)')
+    parser.add_argument('--requests', '-n', type=int, default=100, help='Number of requests (default: 100)')
+    parser.add_argument('--concurrency', '-c', type=int, default=8, help='Requests in flight (default: 8)')
+    parser.add_argument('--domain', '-d', type=str, default='sales', help='Data domain (default: sales)')
+    parser.add_argument('--with-caches', action='store_true',
+                        help='Keep the fast path, SQL caches and request coalescing on instead of sending '
+                             'every request to the backend')
+
+    args = parser.parse_args()
+
+    if args.backend == 'replay':
+        # A replayed recording uses each answer's captured latency unless one is given
+        backend = RecordReplayBackend(args.recording, latency=args.latency, jitter=args.jitter)
+    elif args.backend == 'record':
+        remote = create_backend(os.getenv("LLM_RECORD_BACKEND", "huggingface"))
+        backend = RecordReplayBackend(args.recording, backend=remote)
+    else:
+        backend = MockBackend(latency=0.5 if args.latency is None else args.latency, jitter=args.jitter)
+
+    options = {}
+    if not args.with_caches:
+        options = {"cache": LLMCache(enabled=False), "semantic_cache": SemanticCache(enabled=False),
+                   "template_matcher": TemplateMatcher(enabled=False), "single_flight": SingleFlight(enabled=False)}
+    generator = SQLGenerator(backend=backend, max_concurrency=args.concurrency, **options)
+    schema_text = SchemaDefinition().get_schema_text(args.domain)
+
+    stats = run_benchmark(generator, SAMPLE_QUESTIONS, schema_text, args.requests, args.concurrency)
+    print(f"\n=== {args.requests} requests, {args.concurrency} in flight, {args.backend} backend ===")
+    print(f"Throughput: {stats['throughput']:.1f} requests/s over {stats['seconds']:.2f}s ({stats['errors']} errors)")
+    print(f"Latency p50 {stats['p50'] * 1000:.0f} ms, p95 {stats['p95'] * 1000:.0f} ms, "
+          f"p99 {stats['p99'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,14 @@
 
 import argparse
 import os
+import sys
 from dotenv import load_dotenv
-from models.sql_generator import SQLGenerator
-from utils.schema_definitions import SchemaDefinition
+
+# Add the parent directory to sys.path if needed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.sql_generator import SQLGenerator
+from src.utils.schema_definitions import SchemaDefinition
 
 def main():
     """Command-line interface for Natural Language to SQL conversion."""
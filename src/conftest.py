@@ -0,0 +1,108 @@
+# src/conftest.py
+
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from src.pipeline import NLIpipeline
+from src.models.llm_backends import MockBackend
+from src.models.sql_generator import SQLGenerator
+from src.models.template_matcher import TemplateMatcher
+from src.utils.llm_cache import LLMCache
+from src.utils.query_executor import QueryExecutor
+from src.utils.semantic_cache import SemanticCache
+
+# Settings whose defaults write under ./output
+OUTPUT_SETTINGS = {
+    "VISUALIZATION_DIR": "visualizations",
+    "LLM_CACHE_PATH": "llm_cache.db",
+    "LLM_RECORDING_PATH": "llm_recording.jsonl",
+    "TRACE_PATH": "traces.jsonl",
+    "METRICS_PATH": "metrics.prom",
+}
+
+@pytest.fixture(scope="session", autouse=True)
+def output_dir():
+    """Send the charts, caches and traces the tests produce to a temporary directory instead of ./output."""
+    directory = tempfile.mkdtemp(prefix="nli-test-output-")
+    previous = {name: os.environ.get(name) for name in OUTPUT_SETTINGS}
+    for name, file_name in OUTPUT_SETTINGS.items():
+        os.environ[name] = os.path.join(directory, file_name)
+    try:
+        yield directory
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(directory, ignore_errors=True)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+LLM_SECONDS = 0.3
+LOAD_SECONDS = 0.25
+
+class NoChart:
+    def recommend(self, df, question):
+        return "bar"
+
+    def visualize(self, df, question, user_role, viz_type=None):
+        return {"type": viz_type}
+
+@pytest.fixture
+def work_dir():
+    """Temporary data directory holding copies of the sample CSV files."""
+    directory = tempfile.mkdtemp(prefix="nli-test-data-")
+    try:
+        for name in ("sales.csv", "customers.csv"):
+            shutil.copy(os.path.join(DATA_DIR, name), directory)
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture
+def build_pipeline(work_dir):
+    """
+    Build pipelines over work_dir with a mock LLM and a CSV loader that each take a fixed time.
+
+    Every pipeline built is closed when the test ends.
+    """
+    pipelines = []
+
+    def build(prefetch=False, sql=None, **options):
+        previous = os.environ.get("LLM_BACKEND")
+        os.environ["LLM_BACKEND"] = "mock"
+        try:
+            pipeline = NLIpipeline(prefetch=prefetch, **options)
+        finally:
+            if previous is None:
+                del os.environ["LLM_BACKEND"]
+            else:
+                os.environ["LLM_BACKEND"] = previous
+        pipelines.append(pipeline)
+        # The default components are replaced, so release what they hold
+        pipeline.sql_generator.close()
+        pipeline.query_executor.close()
+        pipeline.sql_generator = SQLGenerator(
+            backend=MockBackend(sql=sql, latency=LLM_SECONDS), cache=LLMCache(enabled=False),
+            semantic_cache=SemanticCache(enabled=False), template_matcher=TemplateMatcher(enabled=False)
+        )
+        pipeline.query_executor = QueryExecutor(data_dir=work_dir)
+        # Charts are not what is being timed
+        pipeline.visualizer = NoChart()
+
+        open_csv = pipeline.query_executor.open_csv
+        def slow_open_csv(*args, **kwargs):
+            time.sleep(LOAD_SECONDS)
+            return open_csv(*args, **kwargs)
+        pipeline.query_executor.open_csv = slow_open_csv
+        return pipeline
+
+    try:
+        yield build
+    finally:
+        for pipeline in pipelines:
+            pipeline.close()
@@ -1,18 +1,33 @@
 # src/insights/insights_generator.py
 
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from src.utils.result_stream import sample_frame
 
 class InsightsGenerator:
     """Generate natural language insights from query results."""
     
+    def __init__(self, max_rows=None):
+        """
+        Initialize the insights generator.
+        
+        Args:
+            max_rows (int, optional): Most rows read from a streamed result.
+                                      Defaults to INSIGHTS_MAX_ROWS or 10000.
+        """
+        if max_rows is None:
+            max_rows = int(os.getenv("INSIGHTS_MAX_ROWS", "10000"))
+        self.max_rows = max_rows
+    
     def generate_insights(self, df, query_text, viz_type, user_role=None):
         """
         Generate insights based on the data and visualization type.
         
         Args:
-            df (pandas.DataFrame): The query result data
+            df (pandas.DataFrame or ResultStream): The query result data. Only the first
+                                                   max_rows rows of a stream are analyzed.
             query_text (str): The original natural language query
             viz_type (str): The type of visualization created
             user_role (str, optional): The user's role for contextual insights
@@ -20,6 +35,7 @@ class InsightsGenerator:
         Returns:
             dict: Dictionary containing insights and metadata
         """
+        df, truncated = sample_frame(df, self.max_rows)
         if df.empty:
             return {"summary": "No data available for analysis."}
         
@@ -44,6 +60,10 @@ class InsightsGenerator:
             role_insights = self._add_role_specific_insights(df, insights["summary"], user_role)
             insights["role_specific"] = role_insights
         
+        if truncated:
+            insights["truncated"] = True
+            insights["summary"] = insights["summary"].rstrip() + f" (Based on the first {self.max_rows:,} rows of the result.)"
+        
         return insights
     
     def _generate_bar_chart_insights(self, df, query_text):
@@ -0,0 +1,376 @@
+# src/models/llm_backends.py
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from src.utils.http_client import get_shared_client
+
+class HuggingFaceBackend:
+    """Text generation through the Hugging Face inference API or a TGI server."""
+
+    def __init__(self, api_key=None, model_url=None, http_client=None):
+        """
+        Initialize the backend.
+
+        Args:
+            api_key (str, optional): Hugging Face API key. Defaults to HUGGINGFACE_API_KEY.
+            model_url (str, optional): Inference endpoint. Defaults to HF_MODEL_URL or Mistral-7B-Instruct.
+            http_client (HTTPClient, optional): Client used to call the model. Defaults to
+                                                the process-wide pooled client.
+        """
+        self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
+        if not self.api_key:
+            raise ValueError("Hugging Face API key is required. Set HUGGINGFACE_API_KEY in .env or pass directly.")
+        # Default to a good SQL generation model
+        self.model_url = model_url or os.getenv(
+            "HF_MODEL_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+        )
+        self.http_client = http_client or get_shared_client()
+
+    @property
+    def model_id(self):
+        """Identifies the model in cache keys."""
+        return self.model_url
+
+    def generate(self, prompt, stop=None):
+        """
+        Generate a completion.
+
+        Args:
+            prompt (str): Prompt text
+            stop (list, optional): Sequences that end the generation
+
+        Returns:
+            str: Generated text
+        """
+        return "".join(self.stream(prompt, stop, stream=False))
+
+    def stream(self, prompt, stop=None, stream=True):
+        """
+        Generate a completion as a stream of text pieces.
+
+        Closing the iterator closes the connection, which cancels the rest of
+        the generation on the server. Endpoints that do not stream yield the
+        whole completion as one piece.
+
+        Args:
+            prompt (str): Prompt text
+            stop (list, optional): Sequences that end the generation
+            stream (bool): Ask the endpoint to stream tokens
+
+        Yields:
+            str: Generated text pieces
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": 512,
+                "temperature": 0.1,
+                "return_full_text": False,
+                "stop": stop or []
+            }
+        }
+        if stream:
+            payload["stream"] = True
+
+        response = self.http_client.post(self.model_url, headers=headers, json=payload, stream=stream)
+        try:
+            response.raise_for_status()
+            if not _is_event_stream(response):
+                result = response.json()
+                if isinstance(result, list) and len(result) > 0:
+                    yield result[0].get('generated_text', '')
+                else:
+                    yield str(result)
+                return
+            for event in _events(response):
+                token = event.get("token") or {}
+                if not token.get("special"):
+                    yield token.get("text", "")
+        finally:
+            response.close()
+
+class OpenAICompatibleBackend:
+    """Chat completions from an OpenAI-compatible server, such as vLLM, llama.cpp or Ollama."""
+
+    def __init__(self, base_url=None, model=None, api_key=None, http_client=None):
+        """
+        Initialize the backend.
+
+        Args:
+            base_url (str, optional): API root. Defaults to OPENAI_BASE_URL or http://localhost:8000/v1.
+            model (str, optional): Model name. Defaults to OPENAI_MODEL or "default".
+            api_key (str, optional): Bearer token, if the server needs one. Defaults to OPENAI_API_KEY.
+            http_client (HTTPClient, optional): Client used to call the model. Defaults to
+                                                the process-wide pooled client.
+        """
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", "http://localhost:8000/v1")).rstrip("/")
+        self.model = model or os.getenv("OPENAI_MODEL", "default")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.http_client = http_client or get_shared_client()
+
+    @property
+    def model_id(self):
+        return f"{self.base_url}#{self.model}"
+
+    def generate(self, prompt, stop=None):
+        """Generate a completion, see HuggingFaceBackend.generate()."""
+        return "".join(self.stream(prompt, stop, stream=False))
+
+    def stream(self, prompt, stop=None, stream=True):
+        """Generate a completion as a stream of text pieces, see HuggingFaceBackend.stream()."""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 512,
+            "temperature": 0.1,
+            "stream": stream
+        }
+        if stop:
+            payload["stop"] = stop
+
+        response = self.http_client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload,
+                                         stream=stream)
+        try:
+            response.raise_for_status()
+            if not _is_event_stream(response):
+                choices = response.json().get("choices") or [{}]
+                yield (choices[0].get("message") or {}).get("content") or ""
+                return
+            for event in _events(response):
+                choices = event.get("choices") or [{}]
+                yield (choices[0].get("delta") or {}).get("content") or ""
+        finally:
+            response.close()
+
+class MockBackend:
+    """
+    In-process stand-in that answers every prompt without a model.
+
+    Answers come from a responder function, or a fixed SQL query, after a
+    synthetic delay, so the rest of the pipeline can be exercised and load
+    tested without a network.
+    """
+
+    def __init__(self, sql=None, responder=None, latency=None, jitter=None, seed=0):
+        """
+        Initialize the backend.
+
+        Args:
+            sql (str, optional): Answer to every prompt. Defaults to MOCK_LLM_SQL or sales by region.
+            responder (callable, optional): Called with the prompt; returns the answer instead of sql
+            latency (float, optional): Median seconds per answer. Defaults to MOCK_LLM_LATENCY or 0.
+            jitter (float, optional): Spread of the lognormal delay; 0 makes every answer take
+                                      exactly latency seconds. Defaults to MOCK_LLM_JITTER or 0.
+            seed (int): Seed for the delays, so benchmark runs are repeatable
+        """
+        self.sql = sql or os.getenv(
+            "MOCK_LLM_SQL", "SELECT region, SUM(sales_amount) AS total_sales FROM sales GROUP BY region"
+        )
+        self.responder = responder
+        self.delay = SyntheticLatency(
+            float(os.getenv("MOCK_LLM_LATENCY", "0")) if latency is None else latency,
+            float(os.getenv("MOCK_LLM_JITTER", "0")) if jitter is None else jitter,
+            seed
+        )
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        return "mock"
+
+    def generate(self, prompt, stop=None):
+        with self._lock:
+            self.calls += 1
+        self.delay.sleep()
+        return self.responder(prompt) if self.responder else self.sql
+
+    def stream(self, prompt, stop=None):
+        yield self.generate(prompt, stop)
+
+    async def agenerate(self, prompt, stop=None):
+        """Answer without holding a thread while the synthetic delay passes."""
+        with self._lock:
+            self.calls += 1
+        await self.delay.asleep()
+        return self.responder(prompt) if self.responder else self.sql
+
+class RecordReplayBackend:
+    """
+    Record another backend's answers to a JSONL file, or replay them offline.
+
+    With a backend to record, every prompt is passed through and the answer
+    and its latency are appended to the file. Without one, answers are
+    served from the file, keyed by the prompt, after the recorded latency or
+    a configured synthetic one. Replayed runs give deterministic SQL with
+    realistic timings for throughput and tail latency benchmarks.
+    """
+
+    def __init__(self, path=None, backend=None, latency=None, jitter=None, seed=0):
+        """
+        Initialize the backend.
+
+        Args:
+            path (str, optional): Recording file. Defaults to LLM_RECORDING_PATH or ./output/llm_recording.jsonl.
+            backend (optional): Backend to record. Replays the file if not provided.
+            latency (float, optional): Median seconds per replayed answer. Defaults to
+                                       LLM_REPLAY_LATENCY, or each answer's recorded latency.
+            jitter (float, optional): Spread of the lognormal delay. Defaults to LLM_REPLAY_JITTER or 0.
+            seed (int): Seed for the delays, so benchmark runs are repeatable
+        """
+        self.path = path or os.getenv("LLM_RECORDING_PATH", "./output/llm_recording.jsonl")
+        self.backend = backend
+        if latency is None and os.getenv("LLM_REPLAY_LATENCY"):
+            latency = float(os.getenv("LLM_REPLAY_LATENCY"))
+        if jitter is None:
+            jitter = float(os.getenv("LLM_REPLAY_JITTER", "0"))
+        # Without a configured latency each answer is delayed by its recorded one
+        self.latency = latency
+        self.delay = SyntheticLatency(latency or 0.0, jitter, seed)
+        self._lock = threading.Lock()
+
+        # prompt key -> {"response": str, "latency": float}
+        self.recordings = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record["key"]] = record
+        elif backend is None:
+            raise FileNotFoundError(f"No LLM recording at {self.path}; record one first")
+
+    @property
+    def model_id(self):
+        return self.backend.model_id if self.backend is not None else f"replay:{os.path.abspath(self.path)}"
+
+    def generate(self, prompt, stop=None):
+        """
+        Answer a prompt from the recording, or record the wrapped backend's answer.
+
+        Raises:
+            KeyError: If replaying a prompt that was never recorded
+        """
+        if self.backend is None:
+            record = self._replay(prompt)
+            self.delay.sleep(record["latency"] if self.latency is None else None)
+            return record["response"]
+        key = prompt_key(prompt)
+
+        start = time.perf_counter()
+        response = self.backend.generate(prompt, stop)
+        record = {"key": key, "response": response, "latency": time.perf_counter() - start}
+        with self._lock:
+            self.recordings[key] = record
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return response
+
+    def stream(self, prompt, stop=None):
+        yield self.generate(prompt, stop)
+
+    async def agenerate(self, prompt, stop=None):
+        """Replay an answer without holding a thread; recording runs on a worker thread."""
+        if self.backend is not None:
+            return await asyncio.to_thread(self.generate, prompt, stop)
+        record = self._replay(prompt)
+        await self.delay.asleep(record["latency"] if self.latency is None else None)
+        return record["response"]
+
+    def _replay(self, prompt):
+        key = prompt_key(prompt)
+        record = self.recordings.get(key)
+        if record is None:
+            raise KeyError(f"Prompt {key[:12]} is not in the recording {self.path}")
+        return record
+
+class SyntheticLatency:
+    """Lognormal delays around a median, the long-tailed shape of real LLM latencies."""
+
+    def __init__(self, median, jitter=0.0, seed=0):
+        self.median = median
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, median=None):
+        """One delay in seconds, around median if given instead of the configured one."""
+        median = self.median if median is None else median
+        if median <= 0:
+            return 0.0
+        with self._lock:
+            return median * self._rng.lognormvariate(0, self.jitter) if self.jitter else median
+
+    def sleep(self, median=None):
+        """Sleep for one sampled delay."""
+        delay = self.sample(median)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def asleep(self, median=None):
+        """Wait for one sampled delay without blocking the event loop."""
+        delay = self.sample(median)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def create_backend(name=None, api_key=None, http_client=None):
+    """
+    Create the backend selected by configuration.
+
+    Args:
+        name (str, optional): "huggingface", "openai", "mock", "record" or "replay".
+                              Defaults to LLM_BACKEND or "huggingface".
+        api_key (str, optional): API key for the Hugging Face backend
+        http_client (HTTPClient, optional): Client for the remote backends
+
+    Returns:
+        A backend with generate(), stream() and model_id; backends that can wait for
+        an answer without a thread also have a coroutine agenerate()
+    """
+    name = (name or os.getenv("LLM_BACKEND", "huggingface")).lower()
+    if name == "huggingface":
+        return HuggingFaceBackend(api_key, http_client=http_client)
+    if name == "openai":
+        return OpenAICompatibleBackend(http_client=http_client)
+    if name == "mock":
+        return MockBackend()
+    if name == "replay":
+        return RecordReplayBackend()
+    if name == "record":
+        # Records whichever remote backend LLM_RECORD_BACKEND names
+        inner = create_backend(os.getenv("LLM_RECORD_BACKEND", "huggingface"), api_key, http_client)
+        return RecordReplayBackend(backend=inner)
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+def prompt_key(prompt):
+    """Key of a prompt in recordings."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def _is_event_stream(response):
+    return "text/event-stream" in response.headers.get("Content-Type", "")
+
+def _events(response):
+    """Decode the JSON payloads of a server-sent event stream."""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        event = json.loads(data)
+        if "error" in event:
+            raise ValueError(event["error"])
+        yield event
@@ -1,20 +1,84 @@
 # src/models/sql_generator.py
 
+import asyncio
+import contextlib
+import contextvars
 import os
-import requests
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.utils.llm_cache import LLMCache, is_cacheable, request_scope
+from src.utils.semantic_cache import SemanticCache
+from src.utils.schema_linker import SchemaLinker, count_tokens
+from src.utils.single_flight import SingleFlight
+from src.utils.sql_validator import SQLValidator
+from src.utils.tracing import get_tracer
+from src.models.llm_backends import create_backend
+from src.models.template_matcher import TemplateMatcher
+
+# The server stops at the end of the first statement instead of running to max_new_tokens
+STOP_SEQUENCES = [";"]
 
 class SQLGenerator:
     """Generates SQL queries from natural language using LLMs."""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, http_client=None, max_concurrency=None, cache=None, semantic_cache=None,
+                 template_matcher=None, schema_linker=None, stream=None, validator=None, max_repairs=None,
+                 backend=None, single_flight=None):
+        """
+        Initialize the generator.
+        
+        Args:
+            api_key (str, optional): Hugging Face API key. Defaults to HUGGINGFACE_API_KEY.
+            http_client (HTTPClient, optional): Client used to call a remote model. Defaults to
+                                                the process-wide pooled client.
+            max_concurrency (int, optional): Requests in flight at once for the async and
+                                             batch APIs. Defaults to LLM_MAX_CONCURRENCY or 8.
+            cache (LLMCache, optional): Cache of generated SQL. A new one is created if not provided.
+            semantic_cache (SemanticCache, optional): Similarity index used when the exact cache
+                                                      misses. A new one is created if not provided.
+            template_matcher (TemplateMatcher, optional): Rule-based fast path tried before the
+                                                          caches and the LLM. A new one is created
+                                                          if not provided.
+            schema_linker (SchemaLinker, optional): Prunes the prompt schema to the question.
+                                                    A new one is created if not provided.
+            stream (bool, optional): Stream tokens and stop reading once a complete statement
+                                     has arrived. Defaults to LLM_STREAM or True.
+            validator (SQLValidator, optional): Checks generated SQL against the schema before it
+                                                is returned. A new one is created if not provided.
+            max_repairs (int, optional): Repair requests sent for SQL that fails validation.
+                                         Defaults to SQL_MAX_REPAIRS or 2.
+            backend (optional): Model backend, see llm_backends. Defaults to the one LLM_BACKEND
+                                selects, which is the Hugging Face inference API.
+            single_flight (SingleFlight, optional): Lets concurrent identical questions share one
+                                                    model request. A new one is created if not provided.
+        """
         load_dotenv()
-        self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
-        if not self.api_key:
-            raise ValueError("Hugging Face API key is required. Set HUGGINGFACE_API_KEY in .env or pass directly.")
+        self.backend = backend or create_backend(api_key=api_key, http_client=http_client)
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self.cache = cache if cache is not None else LLMCache()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else SemanticCache()
+        self.template_matcher = template_matcher or TemplateMatcher()
+        self.schema_linker = schema_linker or SchemaLinker()
+        if stream is None:
+            stream = os.getenv("LLM_STREAM", "true").lower() == "true"
+        self.stream = stream
+        self.validator = validator or SQLValidator()
+        if max_repairs is None:
+            max_repairs = int(os.getenv("SQL_MAX_REPAIRS", "2"))
+        self.max_repairs = max_repairs
+        self.single_flight = single_flight or SingleFlight()
         
-        # Default to a good SQL generation model
-        self.model_url = os.getenv("HF_MODEL_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2")
+        # Number of questions answered by the fast path, each cache, the LLM or an
+        # identical request already in flight, and of repair requests for SQL that
+        # failed validation
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
     
     def generate_sql(self, question, schema_text, user_role):
         """
@@ -28,10 +92,189 @@ class SQLGenerator:
         Returns:
             str: Generated SQL query
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        sql_query, key, scope = self._lookup(question, schema_text, user_role)
+        if sql_query is not None:
+            return sql_query
+        
+        # Identical questions asked while the model works on this one wait for its answer
+        sql_query, shared = self.single_flight.do(
+            key, lambda: self._generate_with_model(question, schema_text, user_role, key, scope)
+        )
+        if shared:
+            self._joined()
+        return sql_query
+    
+    def _generate_with_model(self, question, schema_text, user_role, key, scope):
+        """Ask the model, have its SQL repaired if needed and cache the answer."""
+        start = time.perf_counter()
+        sql_query = self._call_model(question, schema_text, user_role)
+        self._route("llm")
+        sql_query = self._validate(question, schema_text, user_role, sql_query)
+        self._store(question, key, scope, sql_query, time.perf_counter() - start)
+        return sql_query
+    
+    def _lookup(self, question, schema_text, user_role):
+        """
+        Answer a question from the fast path or the caches.
+        
+        Returns:
+            tuple: (SQL or None if the model has to be asked, exact cache key, semantic cache scope)
+        """
+        # Common question shapes compile straight to SQL
+        sql_query = self.template_matcher.match(question, schema_text)
+        if sql_query is not None:
+            print("Answered by the rule-based fast path")
+            self._route("fast_path")
+            return sql_query, None, None
+        
+        key = self.cache.make_key(question, schema_text, user_role, self.backend.model_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            print("LLM cache hit")
+            self._route("exact_cache")
+            return cached, key, None
+        
+        # Reuse the SQL of a question that differs only in its literals, with them swapped in
+        scope = request_scope(schema_text, user_role, self.backend.model_id)
+        similar, similarity = self.semantic_cache.lookup(question, scope)
+        if similar is not None:
+            print(f"Semantic cache hit (similarity {similarity:.2f})")
+            self._route("semantic_cache")
+            return similar, key, scope
+        return None, key, scope
+    
+    def _store(self, question, key, scope, sql_query, seconds):
+        """Cache SQL the model generated; error results are skipped by the cache."""
+        self.cache.put(key, sql_query, seconds)
+        if is_cacheable(sql_query):
+            self.semantic_cache.add(question, scope, sql_query)
+    
+    def _validate(self, question, schema_text, user_role, sql_query):
+        """
+        Check generated SQL against the schema and ask the model to repair it if it fails.
+        
+        Args:
+            question (str): Natural language question
+            schema_text (str): Database schema in text format
+            user_role (str): User role (e.g., "Sales Manager")
+            sql_query (str): Generated SQL query
+            
+        Returns:
+            str: SQL that compiles against the schema, or an error result if it still
+                 fails after max_repairs repair requests
+        """
+        if not is_cacheable(sql_query):
+            return sql_query
+        error = self.validator.validate(sql_query, schema_text)
+        for _ in range(self.max_repairs):
+            if error is None:
+                return sql_query
+            print(f"Generated SQL failed validation ({error}), requesting a repair")
+            self._count("repair")
+            sql_query = self._call_model(question, schema_text, user_role, repair=(sql_query, error))
+            if not is_cacheable(sql_query):
+                return sql_query
+            error = self.validator.validate(sql_query, schema_text)
+        if error is not None:
+            print(f"Generated SQL is still invalid: {error}")
+            return f"Error: Generated SQL is invalid: {error}"
+        return sql_query
+    
+    async def _avalidate(self, question, schema_text, user_role, sql_query):
+        """Check generated SQL and await repairs, see _validate()."""
+        if not is_cacheable(sql_query):
+            return sql_query
+        error = self.validator.validate(sql_query, schema_text)
+        for _ in range(self.max_repairs):
+            if error is None:
+                return sql_query
+            print(f"Generated SQL failed validation ({error}), requesting a repair")
+            self._count("repair")
+            sql_query = await self._acall_model(question, schema_text, user_role, repair=(sql_query, error))
+            if not is_cacheable(sql_query):
+                return sql_query
+            error = self.validator.validate(sql_query, schema_text)
+        if error is not None:
+            print(f"Generated SQL is still invalid: {error}")
+            return f"Error: Generated SQL is invalid: {error}"
+        return sql_query
+    
+    def _call_model(self, question, schema_text, user_role, repair=None):
+        """
+        Send one generation request to the inference endpoint.
+        
+        Args:
+            question (str): Natural language question
+            schema_text (str): Database schema in text format
+            user_role (str): User role (e.g., "Sales Manager")
+            repair (tuple, optional): (previous SQL, validation error) to ask for a corrected query
+            
+        Returns:
+            str: Generated SQL query, or an error result
+        """
+        prompt = self._prompt(question, schema_text, user_role, repair)
+        with get_tracer().span("llm_call", model=self.backend.model_id, stream=self.stream) as span:
+            try:
+                # Clean up the output
+                return self._clean_sql(self._complete(prompt))
+            except Exception as e:
+                return self._model_error(e, span)
+    
+    async def _acall_model(self, question, schema_text, user_role, repair=None):
+        """
+        Send one generation request without blocking the event loop, see _call_model().
+        
+        Backends with a coroutine agenerate() are awaited directly; the others
+        run on the generator's worker threads.
+        """
+        prompt = self._prompt(question, schema_text, user_role, repair)
+        with get_tracer().span("llm_call", model=self.backend.model_id, stream=self.stream) as span:
+            try:
+                agenerate = getattr(self.backend, "agenerate", None)
+                if agenerate is not None:
+                    generated_text = await agenerate(prompt, STOP_SEQUENCES)
+                else:
+                    loop = asyncio.get_running_loop()
+                    context = contextvars.copy_context()
+                    generated_text = await loop.run_in_executor(self._get_executor(), context.run,
+                                                                self._complete, prompt)
+                return self._clean_sql(generated_text)
+            except Exception as e:
+                return self._model_error(e, span)
+    
+    def _prompt(self, question, schema_text, user_role, repair=None):
+        """Build the prompt for one generation request and report its size."""
+        with get_tracer().span("prompt_build", repair=repair is not None) as span:
+            prompt, full_tokens, linked_tokens = self._build_prompt(question, schema_text, user_role, repair)
+            prompt_tokens = count_tokens(prompt)
+            span.set(prompt_tokens=prompt_tokens, schema_tokens=linked_tokens)
+        print(f"Prompt tokens: {prompt_tokens + full_tokens - linked_tokens} -> {prompt_tokens} "
+              f"(schema {full_tokens} -> {linked_tokens})")
+        return prompt
+    
+    def _complete(self, prompt):
+        """Get the model's completion of a prompt, streamed if enabled."""
+        if self.stream:
+            return self._read_stream(self.backend.stream(prompt, STOP_SEQUENCES))
+        return self.backend.generate(prompt, STOP_SEQUENCES)
+    
+    def _model_error(self, e, span):
+        """Report a failed generation request and turn it into an error result."""
+        span.set(error=str(e))
+        print(f"Error generating SQL: {e}")
+        if hasattr(e, 'response') and hasattr(e.response, 'text'):
+            print(f"Response: {e.response.text}")
+        return f"Error: {str(e)}"
+    
+    def _build_prompt(self, question, schema_text, user_role, repair=None):
+        """
+        Build the generation prompt.
+        
+        Returns:
+            tuple: (prompt, full schema tokens, tokens of the schema in the prompt)
+        """
+        # Only the tables and columns the question needs go into the prompt
+        schema_text, full_tokens, linked_tokens = self.schema_linker.schema_text(question, schema_text)
         
         prompt = f"""
         You are an expert SQL query generator for a business intelligence system.
@@ -46,36 +289,153 @@ class SQLGenerator:
         Generate a valid SQL query that answers the user's question based on the provided schema.
         Return ONLY the SQL query, without any explanations or markdown formatting.
         """
+        if repair is not None:
+            previous_sql, error = repair
+            prompt += f"""
+        PREVIOUS QUERY:
+        {previous_sql}
         
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 512,
-                "temperature": 0.1,
-                "return_full_text": False
-            }
-        }
+        ERROR: {error}
         
-        try:
-            response = requests.post(self.model_url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
+        The previous query fails with this error. Return ONLY the corrected SQL query.
+        """
+        return prompt, full_tokens, linked_tokens
+    
+    def _read_stream(self, pieces):
+        """
+        Read a token stream until the SQL statement is complete.
+        
+        Closing the stream as soon as a terminating semicolon or closing code
+        fence arrives drops the connection, which cancels the rest of the
+        generation on the server instead of waiting for trailing chatter.
+        
+        Args:
+            pieces (iterator): Generated text pieces from the backend
             
-            # Extract the generated SQL
-            if isinstance(result, list) and len(result) > 0:
-                generated_text = result[0].get('generated_text', '')
-            else:
-                generated_text = str(result)
+        Returns:
+            str: Generated text up to the end of the first complete statement
+        """
+        received = []
+        try:
+            for text in pieces:
+                received.append(text)
+                # Only a semicolon or a backtick can complete the statement
+                if ";" in text or "`" in text:
+                    generated_text = "".join(received)
+                    end = statement_end(generated_text)
+                    if end is not None:
+                        if len(received) > 1:
+                            print(f"Complete SQL statement after {len(received)} tokens; "
+                                  f"cancelling the rest of the generation")
+                        return generated_text[:end]
+        finally:
+            pieces.close()
+        return "".join(received)
+    
+    async def agenerate_sql(self, question, schema_text, user_role, semaphore=None):
+        """
+        Generate SQL without blocking the event loop.
+        
+        The fast path and the caches answer inline. Model requests are awaited
+        on the event loop if the backend supports it, and otherwise make their
+        HTTP round trip on the generator's worker threads, which share the
+        pooled client's keep-alive connections.
+        
+        Args:
+            question (str): Natural language question
+            schema_text (str): Database schema in text format
+            user_role (str): User role (e.g., "Sales Manager")
+            semaphore (asyncio.Semaphore, optional): Limits requests in flight across callers
             
-            # Clean up the output
-            sql_query = self._clean_sql(generated_text)
+        Returns:
+            str: Generated SQL query
+        """
+        sql_query, key, scope = self._lookup(question, schema_text, user_role)
+        if sql_query is not None:
             return sql_query
+        
+        # A caller that is cancelled stops waiting; the request goes on for the others
+        sql_query, shared = await self.single_flight.ado(
+            key, lambda: self._agenerate_with_model(question, schema_text, user_role, key, scope, semaphore)
+        )
+        if shared:
+            self._joined()
+        return sql_query
+    
+    async def _agenerate_with_model(self, question, schema_text, user_role, key, scope, semaphore=None):
+        """Ask the model without blocking the event loop, see _generate_with_model()."""
+        start = time.perf_counter()
+        # Repair requests count against the same limit
+        async with semaphore or contextlib.nullcontext():
+            sql_query = await self._acall_model(question, schema_text, user_role)
+            self._route("llm")
+            sql_query = await self._avalidate(question, schema_text, user_role, sql_query)
+        self._store(question, key, scope, sql_query, time.perf_counter() - start)
+        return sql_query
+    
+    async def agenerate_sql_many(self, questions, schema_text, user_role="Analyst", max_concurrency=None):
+        """
+        Generate SQL for many questions concurrently.
+        
+        Args:
+            questions (list): Natural language questions
+            schema_text (str): Database schema in text format
+            user_role (str): User role shared by the questions
+            max_concurrency (int, optional): Requests in flight at once. Defaults to max_concurrency.
             
-        except Exception as e:
-            print(f"Error generating SQL: {e}")
-            if hasattr(e, 'response') and hasattr(e.response, 'text'):
-                print(f"Response: {e.response.text}")
-            return f"Error: {str(e)}"
+        Returns:
+            list: Generated SQL queries, in the same order as the questions
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        return await asyncio.gather(*(
+            self.agenerate_sql(question, schema_text, user_role, semaphore) for question in questions
+        ))
+    
+    def generate_sql_many(self, questions, schema_text, user_role="Analyst", max_concurrency=None):
+        """
+        Generate SQL for many questions concurrently from synchronous code.
+        
+        Total time scales with the concurrency limit rather than with the sum of
+        the individual LLM latencies.
+        
+        Args:
+            questions (list): Natural language questions
+            schema_text (str): Database schema in text format
+            user_role (str): User role shared by the questions
+            max_concurrency (int, optional): Requests in flight at once. Defaults to max_concurrency.
+            
+        Returns:
+            list: Generated SQL queries, in the same order as the questions
+        """
+        workers = max_concurrency or self.max_concurrency
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda question: self.generate_sql(question, schema_text, user_role), questions))
+    
+    def close(self):
+        """Shut down the worker threads used by agenerate_sql and close the LLM cache."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.cache.close()
+    
+    def _count(self, route):
+        with self._stats_lock:
+            self.stats[route] += 1
+    
+    def _joined(self):
+        print("Answered by an identical request already in flight")
+        self._route("coalesced")
+    
+    def _route(self, route):
+        """Count the route that answered a question and note it on the open trace span."""
+        self._count(route)
+        get_tracer().annotate(route=route)
+    
+    def _get_executor(self):
+        """Worker threads for agenerate_sql, sized to the concurrency limit."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="sql-generator")
+        return self._executor
     
     def _clean_sql(self, text):
         """Clean the generated SQL output."""
@@ -94,4 +454,45 @@ class SQLGenerator:
             if line and not line.startswith("--"):  # Skip comment lines
                 sql_lines.append(line)
         
-        return "\n".join(sql_lines)
\ No newline at end of file
+        return "\n".join(sql_lines)
+
+def statement_end(text):
+    """
+    Find where the first complete SQL statement in generated text ends.
+    
+    A statement is complete at a closing code fence, or at a semicolon outside
+    string literals and comments. Inside an open fence, text before the fence
+    is chatter and is not searched.
+    
+    Args:
+        text (str): Generated text so far
+        
+    Returns:
+        int or None: Index just past the end of the statement, or None if it is incomplete
+    """
+    start = 0
+    fence = text.find("```")
+    if fence != -1:
+        close = text.find("```", fence + 3)
+        if close != -1:
+            return close + 3
+        start = fence + 3
+    
+    quote = None
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif text.startswith("--", i):
+            newline = text.find("\n", i)
+            if newline == -1:
+                return None
+            i = newline
+        elif char == ";" and text[start:i].strip():
+            return i + 1
+        i += 1
+    return None
@@ -0,0 +1,270 @@
+# src/models/template_matcher.py
+
+import os
+import re
+from src.utils.schema_definitions import SchemaDefinition
+
+# Words that carry no meaning for the shapes below
+STOPWORDS = {
+    "a", "all", "an", "and", "are", "breakdown", "broken", "did", "display", "do", "does", "down", "find",
+    "for", "generated", "get", "give", "how", "i", "in", "is", "list", "made", "make", "me", "much", "of",
+    "our", "overall", "please", "see", "selling", "show", "sold", "sum", "the", "to", "total", "want",
+    "was", "we", "were", "what", "which", "whats",
+}
+AVG_WORDS = {"average", "avg", "mean"}
+COUNT_WORDS = {"count", "number", "many"}
+# Nouns that name the rows being counted rather than a column
+COUNT_NOUNS = {"orders", "order", "transactions", "transaction", "sales", "sale", "records", "rows"}
+TOP_WORDS = {"top", "best", "highest", "most", "largest", "biggest", "leading"}
+BOTTOM_WORDS = {"bottom", "worst", "lowest", "least", "smallest", "fewest"}
+SPLIT_WORDS = {"by", "per", "each", "across"}
+# "Which region has the highest sales" ranks the words before these by the words after
+RANK_SPLIT_WORDS = {"has", "have", "had", "with"}
+# Time grains: word -> (strftime format, result column)
+GRAINS = {
+    "day": ("%Y-%m-%d", "day"), "days": ("%Y-%m-%d", "day"), "daily": ("%Y-%m-%d", "day"),
+    "week": ("%Y-%W", "week"), "weeks": ("%Y-%W", "week"), "weekly": ("%Y-%W", "week"),
+    "month": ("%Y-%m", "month"), "months": ("%Y-%m", "month"), "monthly": ("%Y-%m", "month"),
+    "year": ("%Y", "year"), "years": ("%Y", "year"), "yearly": ("%Y", "year"), "annual": ("%Y", "year"),
+}
+# Business words for column name parts
+SYNONYMS = {"revenue": "amount", "sales": "amount", "turnover": "amount", "units": "quantity"}
+MEASURE_TYPES = {"DECIMAL", "INTEGER", "REAL", "FLOAT", "NUMERIC"}
+DEFAULT_TOP_N = 5
+
+class TemplateMatcher:
+    """
+    Compile common question shapes straight to SQL without calling the LLM.
+
+    Handles aggregates of one measure, optionally grouped by one dimension
+    column or a time grain, and top/bottom-N rankings, with column names taken
+    from the schema definition. Questions with anything else in them (filters,
+    several dimensions, unknown words) do not match, and go to the LLM.
+    """
+
+    def __init__(self, schema_def=None, enabled=None):
+        """
+        Initialize the matcher.
+
+        Args:
+            schema_def (SchemaDefinition, optional): Schema providing tables, column types and relationships
+            enabled (bool, optional): Use the fast path. Defaults to FAST_PATH or True.
+        """
+        if enabled is None:
+            enabled = os.getenv("FAST_PATH", "true").lower() == "true"
+        self.schema_def = schema_def or SchemaDefinition()
+        self.enabled = enabled
+        self._vocabularies = {}
+
+    def match(self, question, schema_text=None, domain=None):
+        """
+        Compile a question to SQL if it has a known shape.
+
+        Args:
+            question (str): Natural language question
+            schema_text (str, optional): Schema text the question is asked against. Used to
+                                         find the domain when none is given.
+            domain (str, optional): Data domain (e.g., "sales")
+
+        Returns:
+            str or None: SQL query, or None if the question needs the LLM
+        """
+        if not self.enabled:
+            return None
+        if domain is None and schema_text is not None:
+            domain = self.schema_def.domain_for_text(schema_text)
+        if domain is None or not self.schema_def.get_schema(domain):
+            return None
+        vocab = self._vocabulary(domain)
+        if not vocab["measures"]:
+            return None
+
+        tokens = re.findall(r"[a-z0-9]+", question.lower().replace("'", ""))
+        agg = "AVG" if AVG_WORDS & set(tokens) else "COUNT" if COUNT_WORDS & set(tokens) else "SUM"
+        direction = "DESC" if TOP_WORDS & set(tokens) else "ASC" if BOTTOM_WORDS & set(tokens) else None
+        numbers = [int(token) for token in tokens if token.isdigit()]
+        # A number is a top-N limit; anywhere else it is a filter such as a year
+        if len(numbers) > 1 or (numbers and direction is None):
+            return None
+
+        split_words = SPLIT_WORDS | RANK_SPLIT_WORDS if direction else SPLIT_WORDS
+        words = [token for token in tokens if token not in STOPWORDS and not token.isdigit()
+                 and token not in AVG_WORDS | COUNT_WORDS | TOP_WORDS | BOTTOM_WORDS
+                 and (token in split_words or token not in RANK_SPLIT_WORDS)]
+        split = next((i for i, word in enumerate(words) if word in split_words), None)
+        if split is None:
+            left, right = words, []
+        else:
+            left, right = words[:split], [word for word in words[split + 1:] if word not in split_words]
+
+        # "top 5 products by revenue" ranks the left side; "sales by region" groups by the right
+        if direction:
+            dimension_words, measure_words = left, right
+        else:
+            measure_words, dimension_words = left, right
+
+        grain = None
+        for word_list in (dimension_words, measure_words):
+            for word in list(word_list):
+                if word in GRAINS:
+                    if grain is not None:
+                        return None
+                    grain = GRAINS[word]
+                    word_list.remove(word)
+
+        if agg == "COUNT":
+            fact, measure = self._count_target(measure_words, vocab)
+        else:
+            measure = self._resolve(measure_words, vocab["measures"], vocab) if measure_words else vocab["default"]
+            fact = measure["table"] if measure else None
+        if fact is None:
+            return None
+
+        dimension = None
+        if dimension_words:
+            if grain is not None:
+                return None
+            dimension = self._resolve(dimension_words, vocab["dimensions"], vocab, fact)
+            if dimension is None:
+                return None
+        if direction and dimension is None:
+            return None
+
+        return self._build_sql(vocab, fact, agg, measure, dimension, grain, direction,
+                               numbers[0] if numbers else self._default_limit(dimension_words))
+
+    def _vocabulary(self, domain):
+        """Classify a domain's columns into measures, dimensions and dates."""
+        if domain in self._vocabularies:
+            return self._vocabularies[domain]
+        schema = self.schema_def.get_schema(domain)
+        relationships = schema.get("relationships", [])
+        keys = {(rel.get("from_table"), rel.get("from_column")) for rel in relationships}
+        keys |= {(rel.get("to_table"), rel.get("to_column")) for rel in relationships}
+        vocab = {"measures": [], "dimensions": [], "dates": {}, "tables": {}, "relationships": relationships}
+        for table_name, table_info in schema.get("tables", {}).items():
+            vocab["tables"][table_name] = {table_name, table_name.rstrip("s")}
+            primary_key = table_info.get("primary_key")
+            for col_name, col_info in table_info.get("columns", {}).items():
+                col_type = col_info.get("type", "").upper()
+                if col_name == primary_key or (table_name, col_name) in keys or col_name.endswith("_id"):
+                    continue
+                # "customer segment" names customers.segment through its table
+                aliases = _aliases(col_name) | vocab["tables"][table_name]
+                column = {"table": table_name, "name": col_name, "aliases": aliases}
+                if col_type == "DATE":
+                    vocab["dates"].setdefault(table_name, col_name)
+                elif col_type in MEASURE_TYPES:
+                    vocab["measures"].append(column)
+                elif col_type == "TEXT":
+                    vocab["dimensions"].append(column)
+        # Unqualified questions ("top products") are about the main amount column
+        vocab["default"] = next(
+            (col for col in vocab["measures"] if "amount" in col["name"]),
+            vocab["measures"][0] if vocab["measures"] else None
+        )
+        self._vocabularies[domain] = vocab
+        return vocab
+
+    def _resolve(self, words, columns, vocab, table=None):
+        """
+        Find the column that every word refers to.
+
+        Args:
+            table (str, optional): Table being queried; its own columns win ties,
+                                   so a join is only needed when it lacks the column
+
+        Returns:
+            dict or None: The best column, preferring the queried table, then the
+                          main fact table and name columns on ties; None if any
+                          word is left over
+        """
+        default_table = vocab["default"]["table"] if vocab["default"] else None
+        candidates = [col for col in columns if set(words) <= col["aliases"]]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda col: (
+            len(set(words) & set(col["name"].split("_"))),
+            col["table"] == table,
+            col["table"] == default_table,
+            col["name"].endswith("_name"),
+        ))
+
+    def _count_target(self, words, vocab):
+        """Resolve what a COUNT question counts: a table's rows, by its name or a generic noun."""
+        default = vocab["default"]["table"]
+        if not words:
+            return default, None
+        if len(words) > 1:
+            return None, None
+        word = words[0]
+        for table_name, names in vocab["tables"].items():
+            if word in names:
+                return table_name, None
+        return (default, None) if word in COUNT_NOUNS else (None, None)
+
+    def _default_limit(self, dimension_words):
+        """'Which region has the most sales' asks for one row, 'top products' for several."""
+        if dimension_words and not dimension_words[-1].endswith("s"):
+            return 1
+        return DEFAULT_TOP_N
+
+    def _build_sql(self, vocab, fact, agg, measure, dimension, grain, direction, limit):
+        join = None
+        if dimension is not None and dimension["table"] != fact:
+            join = self._join(vocab, fact, dimension["table"])
+            if join is None:
+                return None
+
+        def column(table, name):
+            return f"{table}.{name}" if join else name
+
+        if agg == "COUNT":
+            value, alias = "COUNT(*)", "count"
+        else:
+            label = "total" if agg == "SUM" else "average"
+            value, alias = f"{agg}({column(measure['table'], measure['name'])})", f"{label}_{measure['name']}"
+
+        select, group = [], None
+        if grain is not None:
+            date_column = vocab["dates"].get(fact)
+            if date_column is None:
+                return None
+            fmt, grain_name = grain
+            select.append(f"strftime('{fmt}', {column(fact, date_column)}) AS {grain_name}")
+            group = grain_name
+        elif dimension is not None:
+            group = column(dimension["table"], dimension["name"])
+            select.append(group)
+        select.append(f"{value} AS {alias}")
+
+        lines = [f"SELECT {', '.join(select)}", f"FROM {fact}"]
+        if join:
+            lines.append(join)
+        if group:
+            lines.append(f"GROUP BY {group}")
+            if grain is not None:
+                lines.append(f"ORDER BY {group}")
+            else:
+                lines.append(f"ORDER BY {alias} {direction or 'DESC'}")
+        if direction:
+            lines.append(f"LIMIT {limit}")
+        return "\n".join(lines)
+
+    def _join(self, vocab, fact, table):
+        """JOIN clause for a direct relationship between two tables, or None."""
+        for rel in vocab["relationships"]:
+            ends = {(rel.get("from_table"), rel.get("from_column")), (rel.get("to_table"), rel.get("to_column"))}
+            tables = {end[0] for end in ends}
+            if tables == {fact, table}:
+                fact_column = next(col for tbl, col in ends if tbl == fact)
+                other_column = next(col for tbl, col in ends if tbl == table)
+                return f"JOIN {table} ON {fact}.{fact_column} = {table}.{other_column}"
+        return None
+
+def _aliases(column_name):
+    """Words that can refer to a column: its name parts, their plurals and business synonyms."""
+    parts = column_name.split("_")
+    aliases = set(parts) | {f"{part}s" for part in parts} | {f"{part[:-1]}ies" for part in parts if part.endswith("y")}
+    aliases |= {word for word, part in SYNONYMS.items() if part in parts}
+    return aliases
@@ -1,8 +1,14 @@
 # src/pipeline.py
 
+import asyncio
+import contextvars
+import multiprocessing
 import os
 import sys
+import time
+import weakref
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Add the parent directory to sys.path if needed
@@ -11,19 +17,89 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.models.sql_generator import SQLGenerator
 from src.utils.schema_definitions import SchemaDefinition
 from src.utils.query_executor import QueryExecutor
+from src.utils.query_guard import CancelToken
+from src.utils.result_stream import sample_frame
+from src.utils.sql_parser import base_tables, canonical_sql
+from src.utils.schema_linker import SchemaLinker
+from src.utils.single_flight import SingleFlight
+from src.utils.stage_graph import StageGraph
+from src.utils.tracing import Tracer, get_tracer, set_tracer
 from src.visualization.visualizer import DataVisualizer
 from src.insights.insights_generator import InsightsGenerator
 
+# Questions in each stage of process_async() at once. The SQL stage mostly waits
+# on the model; the others hold a worker thread while they run.
+STAGE_LIMITS = {"sql": 32, "execute": 4, "chart_type": 4, "visualization": 2, "insights": 4}
+
 class NLIpipeline:
     """End-to-end pipeline for Natural Language to Insights."""
     
-    def __init__(self, api_key=None):
-        """Initialize the pipeline components."""
+    def __init__(self, api_key=None, prefetch=None, stage_limits=None, render_processes=None):
+        """
+        Initialize the pipeline components.
+        
+        Args:
+            api_key (str, optional): Hugging Face API key, see SQLGenerator
+            prefetch (bool, optional): Load the tables a question probably needs while its SQL
+                                       is being generated. Defaults to PREFETCH_TABLES or True.
+            stage_limits (dict, optional): Questions in each stage of process_async() at once,
+                                           overriding PIPELINE_<STAGE>_CONCURRENCY and STAGE_LIMITS
+            render_processes (int, optional): Render charts in this many worker processes instead
+                                              of in turn on threads. Defaults to
+                                              PIPELINE_RENDER_PROCESSES or 0 (threads).
+        """
         self.schema_def = SchemaDefinition()
         self.sql_generator = SQLGenerator(api_key)
         self.query_executor = QueryExecutor()
         self.visualizer = DataVisualizer()
         self.insights_generator = InsightsGenerator()
+        self.schema_linker = SchemaLinker(self.schema_def)
+        if prefetch is None:
+            prefetch = os.getenv("PREFETCH_TABLES", "true").lower() == "true"
+        self.prefetch = prefetch
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._stage_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_WORKERS", "4")),
+                                              thread_name_prefix="pipeline-stage")
+        
+        self.stage_limits = {
+            name: int(os.getenv(f"PIPELINE_{name.upper()}_CONCURRENCY", str(limit)))
+            for name, limit in STAGE_LIMITS.items()
+        }
+        self.stage_limits.update(stage_limits or {})
+        # Enough workers for every stage that runs on threads to be at its limit
+        self._async_pool = ThreadPoolExecutor(
+            max_workers=sum(limit for name, limit in self.stage_limits.items() if name != "sql"),
+            thread_name_prefix="pipeline-async"
+        )
+        # event loop -> stage name -> asyncio.Semaphore
+        self._limits = weakref.WeakKeyDictionary()
+        # Identical questions asked at the same time are answered once
+        self.single_flight = SingleFlight()
+        
+        if render_processes is None:
+            render_processes = int(os.getenv("PIPELINE_RENDER_PROCESSES", "0"))
+        self._render_pool = None
+        if render_processes > 0:
+            # pyplot is not thread-safe, so charts on threads are drawn one at a time;
+            # each process has its own. Spawned, not forked, from this threaded process.
+            self._render_pool = ProcessPoolExecutor(max_workers=render_processes,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=_init_render_process)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Shut down the pipeline's worker threads and processes and close the table catalog."""
+        for pool in (self._prefetcher, self._stage_pool, self._async_pool, self._render_pool):
+            if pool is not None:
+                pool.shutdown()
+        self._render_pool = None
+        self.sql_generator.close()
+        self.query_executor.close()
     
     def process(self, question, user_role="Analyst", domain="sales", csv_files=None):
         """
@@ -36,69 +112,441 @@ class NLIpipeline:
             csv_files (dict, optional): Mapping of table names to CSV files
             
         Returns:
-            dict: Results including SQL, data, and visualization
+            dict: Results including SQL, data, visualization, insights and the
+                  seconds spent in each stage under "timings"
         """
+        # A question asked again while it is being answered waits for that answer,
+        # so a dashboard opened by many users at once costs one LLM call, query and chart
+        results, shared = self.single_flight.do(
+            _request_key(question, user_role, domain, csv_files),
+            lambda: self._process_traced(question, user_role, domain, csv_files)
+        )
+        if shared:
+            print(f"Answered '{question}' with an identical request already in flight")
+            return dict(results)
+        return results
+    
+    def _process_traced(self, question, user_role, domain, csv_files):
+        # Every span opened while answering the question belongs to this trace
+        with get_tracer().span("pipeline", question=question, user_role=user_role, domain=domain) as span:
+            results = self._process(question, user_role, domain, csv_files)
+            span.set(rows=results["data"]["rows"], status=results["data"]["status"])
+        return results
+    
+    def _process(self, question, user_role, domain, csv_files):
+        """Run the stages of process() for one question."""
         # Step 1: Get schema information
         schema_text = self.schema_def.get_schema_text(domain)
         
-        # Step 2: Generate SQL from natural language
-        print(f"Generating SQL for: '{question}'")
-        sql_query = self.sql_generator.generate_sql(question, schema_text, user_role)
-        print(f"Generated SQL: {sql_query}")
+        # Start loading the tables the question probably needs while the LLM works
+        cancel_prefetch = self._start_prefetch(question, domain, csv_files)
         
-        # Step 3: Execute the SQL query
-        if csv_files is None:
-            # If no files specified, infer from query or use default
-            csv_files = {'sales': 'sales.csv'}
-            if 'customers' in sql_query.lower():
-                csv_files['customers'] = 'customers.csv'
-                
-        result_df = self.query_executor.execute_query(sql_query, csv_files)
-        
-        # Step 4: Generate visualization
-        if not result_df.empty:
-            viz_result = self.visualizer.visualize(result_df, question, user_role)
-            print(f"Created visualization: {viz_result.get('type', 'unknown')} chart")
-        else:
-            viz_result = {"error": "No data to visualize"}
-            print("No data available for visualization")
+        # Steps 2-5 as a dependency graph: the chart and the insights only need the
+        # query result and the chart type, so they run in parallel
+        graph = StageGraph()
+        graph.add("sql", lambda done: self._generate(question, schema_text, user_role, cancel_prefetch))
+        # A failing later stage must not leave the query result's cursor open
+        graph.add("execute", lambda done: self._execute(done["sql"], csv_files), after=("sql",),
+                  cleanup=_close_result)
+        graph.add("chart_type", lambda done: self._chart_type(done["execute"], question), after=("execute",))
+        graph.add("visualization", lambda done: self._visualize(done["execute"], question, user_role,
+                                                                done["chart_type"]),
+                  after=("execute", "chart_type"))
+        graph.add("insights", lambda done: self._insights(done["execute"], question, user_role, done["chart_type"]),
+                  after=("execute", "chart_type"))
+        start = time.perf_counter()
+        outputs, timings = graph.run(self._stage_pool)
+        timings["total"] = time.perf_counter() - start
+        print("Stage timings: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+        
+        data = self._summarize(outputs["sql"], outputs["execute"], outputs["insights"])
+        
+        # Prepare the complete results
+        return {
+            "question": question,
+            "user_role": user_role,
+            "domain": domain,
+            "sql_query": outputs["sql"],
+            "data": data,
+            "visualization": outputs["visualization"],
+            "insights": outputs["insights"],
+            "timings": timings
+        }
+    
+    def process_batch(self, items, csv_files=None, workers=None):
+        """
+        Process many questions, doing the work they share only once.
+        
+        Repeated questions (same role and domain) get their SQL generated once.
+        Questions whose SQL only differs in formatting share one execution of
+        it, every table the queries read is loaded once before any of them
+        runs, and each chart is rendered once per query, chart type and
+        question, however many roles ask for it.
+        
+        Args:
+            items (list): Dicts with a "question" and optionally "user_role" (or "role")
+                          and "domain"; other keys, such as an "id", are copied to the result
+            csv_files (dict, optional): Mapping of table names to CSV files for every question
+            workers (int, optional): Questions, then queries, processed at once.
+                                     Defaults to BATCH_WORKERS or 4.
+            
+        Returns:
+            tuple: (results in the order of items, as from process() but without
+                    "timings"; report with the work done and the throughput)
+        """
+        if workers is None:
+            workers = int(os.getenv("BATCH_WORKERS", "4"))
+        requests = [
+            (item["question"], item.get("user_role") or item.get("role") or "Analyst", item.get("domain") or "sales")
+            for item in items
+        ]
+        start = time.perf_counter()
+        results = [None] * len(items)
+        with get_tracer().span("batch", questions=len(items)) as span, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            # Step 1: SQL for each distinct question
+            distinct = list(dict.fromkeys(requests))
+            context = contextvars.copy_context()
+            sqls = dict(zip(distinct, pool.map(
+                lambda request: context.copy().run(self._batch_sql, *request), distinct
+            )))
+            
+            # Step 2: group the questions by query
+            groups = {}
+            for index, request in enumerate(requests):
+                sql_query = sqls[request]
+                key = sql_query if sql_query.startswith("Error:") else canonical_sql(sql_query)
+                groups.setdefault(key, (sql_query, []))[1].append(index)
+            
+            # Step 3: load every table the queries read, once
+            tables = []
+            for sql_query, _ in groups.values():
+                if not sql_query.startswith("Error:"):
+                    tables += [table for table in base_tables(sql_query) if table not in tables]
+            if csv_files is not None:
+                tables = [table for table in tables if table in csv_files]
+            loaded = self.query_executor.prefetch(tables, csv_files) if tables else []
+            
+            # Step 4: execute each query once and answer its questions
+            futures = {
+                pool.submit(context.copy().run, self._process_group, sql_query,
+                            [requests[index] for index in indices], csv_files): indices
+                for sql_query, indices in groups.values()
+            }
+            charts = 0
+            errors = 0
+            done = 0
+            for future in as_completed(futures):
+                indices = futures[future]
+                try:
+                    answers, rendered = future.result()
+                    charts += rendered
+                except Exception as e:
+                    print(f"Error processing batch query: {e}")
+                    answers = [
+                        {"question": requests[index][0], "user_role": requests[index][1],
+                         "domain": requests[index][2], "sql_query": sqls[requests[index]], "error": str(e)}
+                        for index in indices
+                    ]
+                for index, answer in zip(indices, answers):
+                    extra = {key: value for key, value in items[index].items()
+                             if key not in ("question", "user_role", "role", "domain")}
+                    results[index] = {**extra, **answer}
+                    if "error" in answer or answer["data"]["status"] == "error":
+                        errors += 1
+                done += len(indices)
+                print(f"Progress: {done}/{len(items)} questions")
+            
+            seconds = time.perf_counter() - start
+            report = {
+                "questions": len(items),
+                "distinct_questions": len(distinct),
+                "queries": sum(1 for sql_query, _ in groups.values() if not sql_query.startswith("Error:")),
+                "tables_loaded": len(loaded),
+                "charts": charts,
+                "errors": errors,
+                "seconds": seconds,
+                "throughput": len(items) / seconds if seconds > 0 else 0.0,
+            }
+            span.set(**report)
+        print(f"Batch: {report['questions']} questions in {seconds:.2f}s ({report['throughput']:.1f}/s); "
+              f"{report['distinct_questions']} distinct questions, {report['queries']} queries executed, "
+              f"{report['tables_loaded']} tables loaded, {report['charts']} charts rendered, "
+              f"{report['errors']} errors")
+        return results, report
+    
+    def _batch_sql(self, question, user_role, domain):
+        """Batch step: generate the SQL for one distinct question."""
+        schema_text = self.schema_def.get_schema_text(domain)
+        return self.sql_generator.generate_sql(question, schema_text, user_role)
+    
+    def _process_group(self, sql_query, requests, csv_files=None):
+        """
+        Batch step: answer the questions that share one SQL query.
+        
+        Args:
+            sql_query (str): SQL query, or an error result from the generator
+            requests (list): (question, user_role, domain) of each question
+            csv_files (dict, optional): Mapping of table names to CSV files
+            
+        Returns:
+            tuple: (results of the questions, charts rendered)
+        """
+        result = self._execute(sql_query, csv_files)
+        try:
+            charts = {}
+            answers = []
+            for question, user_role, domain in requests:
+                chart_type = self._chart_type(result, question)
+                # The role does not change the chart, only the insights
+                if (chart_type, question) not in charts:
+                    charts[chart_type, question] = self._visualize(result, question, user_role, chart_type)
+                insights = self._insights(result, question, user_role, chart_type)
+                answers.append((question, user_role, domain, charts[chart_type, question], insights))
+            data = self._summarize(sql_query, result, answers[-1][4])
+        finally:
+            if result is not None:
+                result.close()
+        results = [
+            {"question": question, "user_role": user_role, "domain": domain, "sql_query": sql_query,
+             "data": data, "visualization": visualization, "insights": insights}
+            for question, user_role, domain, visualization, insights in answers
+        ]
+        return results, sum(1 for chart in charts.values() if "error" not in chart)
+    
+    async def process_async(self, question, user_role="Analyst", domain="sales", csv_files=None):
+        """
+        Process a question without blocking the event loop, see process().
         
-        if not result_df.empty:
-            viz_result = self.visualizer.visualize(result_df, question, user_role)
-            print(f"Created visualization: {viz_result.get('type', 'unknown')} chart")
+        Many questions can be in flight on one event loop. The LLM request is
+        awaited, and query execution, charting and insights run on worker
+        threads (or processes, for charts). Each stage admits at most its
+        stage_limits entry of questions at once, so a burst of slow queries
+        queues at the execute stage without holding up SQL generation or the
+        charts of questions that already have their data.
+        
+        Identical questions in flight at the same time share one answer, as in
+        process(). Cancelling one caller leaves the answer running for the others.
+        
+        Args:
+            question (str): Natural language question
+            user_role (str): User role (e.g., "Sales Manager")
+            domain (str): Data domain (e.g., "sales")
+            csv_files (dict, optional): Mapping of table names to CSV files
             
-            # Generate insights
-            insights = self.insights_generator.generate_insights(
-                result_df, 
-                question, 
-                viz_result.get('type', 'bar'),
-                user_role
+        Returns:
+            dict: Same results as process()
+        """
+        results, shared = await self.single_flight.ado(
+            _request_key(question, user_role, domain, csv_files),
+            lambda: self._process_async_traced(question, user_role, domain, csv_files)
+        )
+        if shared:
+            print(f"Answered '{question}' with an identical request already in flight")
+            return dict(results)
+        return results
+    
+    async def _process_async_traced(self, question, user_role, domain, csv_files):
+        with get_tracer().span("pipeline", question=question, user_role=user_role, domain=domain) as span:
+            results = await self._process_async(question, user_role, domain, csv_files)
+            span.set(rows=results["data"]["rows"], status=results["data"]["status"])
+        return results
+    
+    async def _process_async(self, question, user_role, domain, csv_files):
+        """Run the stages of process_async() for one question."""
+        schema_text = self.schema_def.get_schema_text(domain)
+        cancel_prefetch = self._start_prefetch(question, domain, csv_files)
+        
+        timings = {}
+        start = time.perf_counter()
+        async with self._limit("sql"):
+            stage_start = time.perf_counter()
+            print(f"Generating SQL for: '{question}'")
+            try:
+                sql_query = await self.sql_generator.agenerate_sql(question, schema_text, user_role)
+            finally:
+                # Stop the prefetch whether or not the LLM answered
+                if cancel_prefetch is not None:
+                    cancel_prefetch.cancel()
+            print(f"Generated SQL: {sql_query}")
+            timings["sql"] = time.perf_counter() - stage_start
+        
+        result = await self._offload("execute", timings, self._execute, sql_query, csv_files)
+        try:
+            chart_type = await self._offload("chart_type", timings, self._chart_type, result, question)
+            # Both stages read the result, so neither may be abandoned while the other still runs
+            outputs = await asyncio.gather(
+                self._offload("visualization", timings, self._visualize, result, question, user_role, chart_type),
+                self._offload("insights", timings, self._insights, result, question, user_role, chart_type),
+                return_exceptions=True
             )
-            print(f"Generated insights: {insights.get('summary', '')[:100]}...")
-        else:
-            viz_result = {"error": "No data to visualize"}
-            insights = {"summary": "No data available for analysis."}
-            print("No data available for visualization or insights")
-
-        # Prepare the complete results
-        results = {
+            for output in outputs:
+                if isinstance(output, BaseException):
+                    raise output
+            visualization, insights = outputs
+            timings["total"] = time.perf_counter() - start
+            print("Stage timings: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+            
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._async_pool, self._summarize, sql_query, result, insights)
+        except BaseException:
+            _close_result(result)
+            raise
+        return {
             "question": question,
             "user_role": user_role,
             "domain": domain,
             "sql_query": sql_query,
-            "data": {
-                "rows": len(result_df),
-                "columns": list(result_df.columns),
-                "preview": result_df.head(10).to_dict('records') if not result_df.empty else []
-            },
-            "visualization": viz_result,
-            "insights": insights
+            "data": data,
+            "visualization": visualization,
+            "insights": insights,
+            "timings": timings
         }
+    
+    async def _offload(self, name, timings, func, *args):
+        """Run a blocking stage on a worker thread once the stage has room for another question."""
+        loop = asyncio.get_running_loop()
+        async with self._limit(name):
+            start = time.perf_counter()
+            # The worker sees the question's open trace span
+            context = contextvars.copy_context()
+            result = await loop.run_in_executor(self._async_pool, context.run, func, *args)
+            timings[name] = time.perf_counter() - start
+        return result
+    
+    def _limit(self, name):
+        """Semaphore admitting stage_limits[name] questions to a stage on the running event loop."""
+        loop = asyncio.get_running_loop()
+        limits = self._limits.get(loop)
+        if limits is None:
+            limits = {stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()}
+            self._limits[loop] = limits
+        return limits[name]
+    
+    def _summarize(self, sql_query, result, insights):
+        """Describe the query result for the response and close it."""
+        if result is None:
+            # SQL that never compiled against the schema is not worth loading any data for
+            return {"rows": 0, "columns": [], "preview": [], "truncated": False,
+                    "status": "error", "reason": sql_query}
+        try:
+            return {
+                # None when the stages read only part of a large result
+                "rows": result.count(),
+                "columns": list(result.columns),
+                "preview": result.head(10).to_dict('records'),
+                "truncated": bool(insights.get("truncated", False)),
+                # "aborted" when a timeout, row cap or cancellation stopped the query
+                "status": result.status,
+                "reason": result.reason or result.error
+            }
+        finally:
+            result.close()
+    
+    def _generate(self, question, schema_text, user_role, cancel_prefetch=None):
+        """Stage: generate SQL from natural language, then stop the prefetch."""
+        print(f"Generating SQL for: '{question}'")
+        try:
+            sql_query = self.sql_generator.generate_sql(question, schema_text, user_role)
+        finally:
+            # A table already loading is finished and reused by the query if it reads it;
+            # predicted tables not started yet are left to the query to load if needed.
+            # With no query coming, nothing further is loaded.
+            if cancel_prefetch is not None:
+                cancel_prefetch.cancel()
+        print(f"Generated SQL: {sql_query}")
+        return sql_query
+    
+    def _execute(self, sql_query, csv_files=None):
+        """
+        Stage: execute the SQL query.
+        
+        Returns:
+            ResultStream or None: Streamed result, or None for an error result from the generator
+        """
+        if sql_query.startswith("Error:"):
+            return None
+        # If no files are specified, the executor loads exactly the tables the query reads.
+        # Rows are streamed, so the stages below only materialize what they need.
+        result = self.query_executor.execute_query_iter(sql_query, csv_files)
+        result.head(1)
+        return result
+    
+    def _chart_type(self, result, question):
+        """Stage: pick the chart type, which the insights are phrased around; None without rows."""
+        if result is None or result.head(1).empty:
+            return None
+        return self.visualizer.recommend(result, question)
+    
+    def _visualize(self, result, question, user_role, chart_type):
+        """Stage: render and save the chart."""
+        if chart_type is None:
+            print("No data available for visualization")
+            return {"error": "No data to visualize"}
+        if self._render_pool is None:
+            viz_result = self.visualizer.visualize(result, question, user_role, viz_type=chart_type)
+        else:
+            # Only the rows that get plotted are sent to the render process
+            df, _ = sample_frame(result, self.visualizer.max_rows)
+            with get_tracer().span("render", chart=chart_type, rows=len(df), process=True):
+                viz_result = self._render_pool.submit(
+                    _render_chart, self.visualizer, df, question, user_role, chart_type
+                ).result()
+        print(f"Created visualization: {viz_result.get('type', 'unknown')} chart")
+        return viz_result
+    
+    def _insights(self, result, question, user_role, chart_type):
+        """Stage: describe the result in words."""
+        if chart_type is None:
+            print("No data available for insights")
+            return {"summary": "No data available for analysis."}
+        with get_tracer().span("insights", chart=chart_type):
+            insights = self.insights_generator.generate_insights(result, question, chart_type, user_role)
+        print(f"Generated insights: {insights.get('summary', '')[:100]}...")
+        return insights
+    
+    def _start_prefetch(self, question, domain, csv_files=None):
+        """
+        Load the tables a question probably reads in the background.
+        
+        Args:
+            question (str): Natural language question
+            domain (str): Data domain
+            csv_files (dict, optional): Mapping of table names to CSV files
+            
+        Returns:
+            CancelToken or None: Token that stops the prefetch, or None if nothing was started
+        """
+        if not self.prefetch:
+            return None
+        tables = self.schema_linker.likely_tables(question, domain)
+        if csv_files is not None:
+            tables = [table for table in tables if table in csv_files]
+        if not tables:
+            return None
+        cancel_token = CancelToken()
+        # Run inside the question's trace
+        context = contextvars.copy_context()
+        self._prefetcher.submit(context.run, self.query_executor.prefetch, tables, csv_files, cancel_token)
+        return cancel_token
+    
+def _request_key(question, user_role, domain, csv_files):
+    """Identifies identical questions for request coalescing."""
+    return (" ".join(question.split()), user_role, domain, tuple(sorted((csv_files or {}).items())))
 
+def _close_result(result):
+    """Release a query result that will not be summarized."""
+    if result is not None:
+        result.close()
 
-        
-        return results
+def _init_render_process():
+    # Render spans are recorded by the parent process, which owns the trace and metrics files
+    set_tracer(Tracer(enabled=False))
 
+def _render_chart(visualizer, df, question, user_role, chart_type):
+    """Render a chart in a render process."""
+    return visualizer.visualize(df, question, user_role, viz_type=chart_type)
+    
 def test_full_pipeline():
     """Test the full NLI pipeline with some example questions."""
     # Create the pipeline
@@ -121,7 +569,8 @@ def test_full_pipeline():
         
         # Display results
         print(f"SQL: {results['sql_query']}")
-        print(f"Data: {results['data']['rows']} rows, {len(results['data']['columns'])} columns")
+        rows = results['data']['rows']
+        print(f"Data: {rows if rows is not None else 'unknown number of'} rows, {len(results['data']['columns'])} columns")
         
         if 'error' not in results['visualization']:
             print(f"Visualization: {results['visualization']['type']} chart saved to {results['visualization']['path']}")
@@ -135,6 +584,8 @@ def test_full_pipeline():
             print(preview_df.head(5).to_string())
         
         print("\n" + "-" * 60 + "\n")
+    
+    pipeline.close()
 
 if __name__ == "__main__":
     test_full_pipeline()
\ No newline at end of file
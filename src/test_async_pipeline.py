@@ -0,0 +1,183 @@
+# src/test_async_pipeline.py
+
+import asyncio
+import os
+import threading
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.conftest import LLM_SECONDS
+from src.models.llm_backends import MockBackend
+from src.models.sql_generator import SQLGenerator
+from src.models.template_matcher import TemplateMatcher
+from src.utils.llm_cache import LLMCache
+from src.utils.semantic_cache import SemanticCache
+from src.visualization.visualizer import DataVisualizer
+
+QUESTIONS = [f"What are the sales by region for store {i}?" for i in range(16)]
+
+# Questions reading different columns of the same table, so each one reloads it wider
+COLUMN_QUESTIONS = {
+    "sales by region": "SELECT region, SUM(sales_amount) AS total FROM sales GROUP BY region",
+    "units by product": "SELECT product_name, SUM(quantity) AS units FROM sales GROUP BY product_name",
+    "price by customer": "SELECT customer_id, AVG(unit_price) AS price FROM sales GROUP BY customer_id",
+    "sales by channel": "SELECT sales_channel, COUNT(*) AS sales FROM sales GROUP BY sales_channel",
+    "sales by day": "SELECT date, SUM(sales_amount) AS total FROM sales GROUP BY date",
+    "units by category": "SELECT product_category, SUM(quantity) AS units FROM sales GROUP BY product_category",
+}
+
+class Overlap:
+    """Count the calls in progress at once."""
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self.now -= 1
+
+class CountingBackend(MockBackend):
+    """Mock backend that counts the answers being generated at once."""
+
+    def __init__(self, overlap, **options):
+        super().__init__(**options)
+        self.overlap = overlap
+
+    async def agenerate(self, prompt, stop=None):
+        with self.overlap:
+            return await super().agenerate(prompt, stop)
+
+class BlockingBackend:
+    """Backend with only a blocking generate(), like the HTTP backends."""
+
+    model_id = "blocking"
+
+    def __init__(self, overlap):
+        self.overlap = overlap
+
+    def generate(self, prompt, stop=None):
+        with self.overlap:
+            time.sleep(LLM_SECONDS)
+        return "SELECT region, SUM(sales_amount) AS total_sales FROM sales GROUP BY region"
+
+    def stream(self, prompt, stop=None):
+        yield self.generate(prompt, stop)
+
+def test_concurrent_questions(build_pipeline):
+    """Test that many questions share one event loop and stay within the stage limits"""
+    pipeline = build_pipeline(False)
+    pipeline.stage_limits["execute"] = 2
+    llm = Overlap()
+    pipeline.sql_generator.backend = CountingBackend(llm, latency=LLM_SECONDS)
+
+    # Count questions inside the execute stage at once
+    executing = Overlap()
+    execute = pipeline._execute
+    def counted_execute(*args):
+        with executing:
+            time.sleep(0.02)
+            return execute(*args)
+    pipeline._execute = counted_execute
+
+    async def run():
+        # The loop keeps ticking while the questions are answered
+        gaps = []
+        async def heartbeat():
+            while True:
+                before = time.perf_counter()
+                await asyncio.sleep(0.01)
+                gaps.append(time.perf_counter() - before)
+        ticker = asyncio.create_task(heartbeat())
+        results = await asyncio.gather(*(
+            pipeline.process_async(question, csv_files={"sales": "sales.csv"}) for question in QUESTIONS
+        ))
+        ticker.cancel()
+        return results, max(gaps)
+
+    print("=== Testing Async Pipeline ===\n")
+
+    results, longest_gap = asyncio.run(run())
+    print(f"{len(QUESTIONS)} questions, {llm.peak} LLM calls at once, "
+          f"longest event loop stall {longest_gap * 1000:.0f} ms")
+
+    assert all(r["data"]["status"] == "ok" and r["data"]["rows"] == 4 for r in results)
+    assert [r["question"] for r in results] == QUESTIONS
+    assert set(results[0]["timings"]) == {"sql", "execute", "chart_type", "visualization", "insights", "total"}
+    # The LLM waits overlap instead of following one another
+    assert llm.peak > 1
+    assert executing.peak <= 2
+    # Blocking the loop on each 0.3s LLM call in turn would stall it for seconds
+    assert longest_gap < 1.0
+
+    # A backend without agenerate() is called on the generator's worker threads
+    pipeline.sql_generator.close()
+    blocking = Overlap()
+    pipeline.sql_generator = SQLGenerator(
+        backend=BlockingBackend(blocking), max_concurrency=8, cache=LLMCache(enabled=False),
+        semantic_cache=SemanticCache(enabled=False), template_matcher=TemplateMatcher(enabled=False)
+    )
+    results, longest_gap = asyncio.run(run())
+    print(f"Blocking backend: {len(QUESTIONS)} questions, {blocking.peak} LLM calls at once")
+    assert all(r["data"]["status"] == "ok" for r in results)
+    assert 1 < blocking.peak <= 8
+    assert longest_gap < 1.0
+
+def test_concurrent_column_sets(build_pipeline):
+    """Test that concurrent questions reading different columns of one table all succeed"""
+    pipeline = build_pipeline(False)
+    # Answers arrive at different times, so tables are reloaded while other results are still read
+    pipeline.sql_generator.backend = MockBackend(
+        responder=lambda prompt: next(sql for q, sql in COLUMN_QUESTIONS.items() if q in prompt),
+        latency=0.05, jitter=1.0
+    )
+
+    async def run():
+        return await asyncio.gather(*(
+            pipeline.process_async(question, user_role=f"Analyst {i}", csv_files={"sales": "sales.csv"})
+            for i in range(3) for question in COLUMN_QUESTIONS
+        ))
+
+    # Small chunks keep each result's cursor open across its later stages
+    previous = os.environ.get("RESULT_CHUNK_ROWS")
+    os.environ["RESULT_CHUNK_ROWS"] = "5"
+    try:
+        results = asyncio.run(run())
+    finally:
+        if previous is None:
+            del os.environ["RESULT_CHUNK_ROWS"]
+        else:
+            os.environ["RESULT_CHUNK_ROWS"] = previous
+    statuses = [r["data"]["status"] for r in results]
+    print(f"Column sets: {statuses}")
+    assert statuses == ["ok"] * len(COLUMN_QUESTIONS) * 3
+    assert pipeline.query_executor.catalog.drop_retired() == 0
+
+def test_render_processes(build_pipeline, work_dir):
+    """Test that charts can be rendered in worker processes"""
+    pipeline = build_pipeline(False, render_processes=2)
+    pipeline.visualizer = DataVisualizer(output_dir=os.path.join(work_dir, "charts"))
+
+    async def run():
+        return await asyncio.gather(*(
+            pipeline.process_async(question, csv_files={"sales": "sales.csv"}) for question in QUESTIONS[:2]
+        ))
+
+    results = asyncio.run(run())
+    paths = [r["visualization"]["path"] for r in results]
+    print(f"Charts: {paths}")
+    assert len(set(paths)) == 2 and all(os.path.exists(path) for path in paths)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
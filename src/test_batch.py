@@ -0,0 +1,98 @@
+# src/test_batch.py
+
+import json
+import os
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.batch import read_questions, write_results
+from src.models.llm_backends import MockBackend
+
+# The same query, formatted two ways
+REGION_SQL = "SELECT region, SUM(sales_amount) AS total_sales FROM sales GROUP BY region"
+REGION_SQL_REFORMATTED = "select region,\n  SUM(sales_amount) as total_sales\nfrom sales group by region;"
+SEGMENT_SQL = "SELECT segment, COUNT(*) AS customers FROM customers GROUP BY segment"
+
+ANSWERS = {
+    "sales by region": REGION_SQL,
+    "regional sales": REGION_SQL_REFORMATTED,
+    "customers per segment": SEGMENT_SQL,
+}
+
+class CountingChart:
+    def __init__(self):
+        self.rendered = []
+
+    def recommend(self, df, question):
+        return "bar"
+
+    def visualize(self, df, question, user_role, viz_type=None):
+        self.rendered.append(question)
+        return {"type": viz_type, "path": f"{len(self.rendered)}.png"}
+
+def test_batch(build_pipeline, work_dir):
+    """Test that a batch shares SQL generation, execution, table loads and charts"""
+    questions = [
+        {"id": 1, "question": "sales by region", "role": "Executive"},
+        {"id": 2, "question": "sales by region", "role": "Sales Manager"},
+        {"id": 3, "question": "regional sales", "role": "Analyst"},
+        {"id": 4, "question": "customers per segment", "role": "Analyst"},
+        {"id": 5, "question": "sales by region", "role": "Executive"},
+    ]
+    input_path = os.path.join(work_dir, "questions.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(item) + "\n" for item in questions) + "\n")
+    items = read_questions(input_path)
+    assert items == questions
+
+    pipeline = build_pipeline(False)
+    backend = MockBackend(responder=lambda prompt: next(sql for q, sql in ANSWERS.items() if q in prompt))
+    pipeline.sql_generator.backend = backend
+    pipeline.visualizer = CountingChart()
+
+    loads = []
+    open_csv = pipeline.query_executor.open_csv
+    def counted_open_csv(file_path, *args, **kwargs):
+        loads.append(os.path.basename(file_path))
+        return open_csv(file_path, *args, **kwargs)
+    pipeline.query_executor.open_csv = counted_open_csv
+
+    executed = []
+    execute = pipeline.query_executor.execute_query_iter
+    def counted_execute(sql_query, *args, **kwargs):
+        executed.append(sql_query)
+        return execute(sql_query, *args, **kwargs)
+    pipeline.query_executor.execute_query_iter = counted_execute
+
+    print("=== Testing Batch Processing ===\n")
+
+    results, report = pipeline.process_batch(items, workers=4)
+
+    # Results come back in input order with the caller's extra keys
+    assert [r["id"] for r in results] == [1, 2, 3, 4, 5]
+    assert [r["user_role"] for r in results] == ["Executive", "Sales Manager", "Analyst", "Analyst", "Executive"]
+    assert all(r["data"]["status"] == "ok" for r in results)
+    assert results[0]["data"]["rows"] == 4 and results[2]["data"]["rows"] == 4
+
+    # The role is part of the prompt: four distinct requests, but only two distinct
+    # queries, reading two tables, and three distinct charts
+    assert backend.calls == 4
+    assert len(executed) == 2
+    assert sorted(set(loads)) == ["customers.csv", "sales.csv"] and len(loads) == 2
+    assert sorted(pipeline.visualizer.rendered) == ["customers per segment", "regional sales", "sales by region"]
+    assert results[0]["visualization"] == results[1]["visualization"]
+    assert report["questions"] == 5 and report["distinct_questions"] == 4 and report["queries"] == 2
+    assert report["tables_loaded"] == 2 and report["charts"] == 3 and report["errors"] == 0
+
+    output_path = os.path.join(work_dir, "results.jsonl")
+    write_results(results, output_path)
+    with open(output_path, encoding="utf-8") as f:
+        written = [json.loads(line) for line in f]
+    assert [r["question"] for r in written] == [item["question"] for item in questions]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
@@ -0,0 +1,216 @@
+# src/test_http_client.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from src.utils.http_client import CircuitBreaker, CircuitOpenError, HTTPClient
+from src.utils.llm_cache import LLMCache
+from src.utils.semantic_cache import SemanticCache
+from src.models.sql_generator import SQLGenerator
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """Simulates an inference endpoint that is loading, slow or down."""
+
+    protocol_version = "HTTP/1.1"
+    calls = {}
+    payloads = {}
+    streamed_tokens = {}
+    # Requests to /latency being served at once, and the most seen together
+    in_flight = 0
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        StubInferenceHandler.payloads[self.path] = json.loads(self.rfile.read(length) or b"null")
+        count = StubInferenceHandler.calls.get(self.path, 0) + 1
+        StubInferenceHandler.calls[self.path] = count
+
+        if self.path == "/loading" and count <= 2:
+            # Hugging Face answers 503 while the model is loading
+            return self._reply(503, {"error": "Model is currently loading", "estimated_time": 1.0})
+        if self.path == "/down":
+            return self._reply(503, {"error": "Service unavailable"})
+        if self.path == "/slow":
+            time.sleep(0.5)
+        if self.path == "/latency":
+            with StubInferenceHandler.lock:
+                StubInferenceHandler.in_flight += 1
+                StubInferenceHandler.peak_in_flight = max(StubInferenceHandler.peak_in_flight,
+                                                          StubInferenceHandler.in_flight)
+            time.sleep(0.2)
+            with StubInferenceHandler.lock:
+                StubInferenceHandler.in_flight -= 1
+        if self.path == "/stream":
+            return self._stream(["SELECT", " region", ",", " SUM", "(sales", "_amount", ")", " FROM", " sales",
+                                 " WHERE", " note", " =", " 'a;b'", " GROUP", " BY", " region", ";"])
+        if self.path == "/stream-fence":
+            return self._stream(["Here", " is", " the", " query", ":\n", "```", "sql", "\n", "SELECT", " COUNT",
+                                 "(*)", " FROM", " sales", "\n", "```"])
+        self._reply(200, [{"generated_text": "```sql\nSELECT region, SUM(sales_amount)\nFROM sales\nGROUP BY region\n```"}])
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, tokens):
+        """Send tokens as server-sent events, then keep generating chatter until the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chatter = [" This", " query", " groups", " the", " sales", " by", " region", "."] * 10
+        sent = 0
+        try:
+            for token in tokens + chatter:
+                event = {"token": {"text": token, "special": False}, "generated_text": None}
+                self.wfile.write(f"data:{json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                sent += 1
+                time.sleep(0.01)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        StubInferenceHandler.streamed_tokens[self.path] = sent
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    """Start the stub endpoint on a free local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubInferenceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_http_client():
+    """Test retries, timeouts and the circuit breaker against a local stub endpoint"""
+    server, base_url = start_stub_server()
+    try:
+        client = HTTPClient(connect_timeout=1, read_timeout=0.2, max_retries=2, backoff_base=0.01, backoff_max=0.05,
+                            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+
+        print("=== Testing HTTP Client ===\n")
+
+        # 503 while the model loads is retried until it answers
+        response = client.post(f"{base_url}/loading", json={"inputs": "q"})
+        print(f"Loading endpoint: {response.status_code} after {StubInferenceHandler.calls['/loading']} calls")
+        assert response.status_code == 200
+        assert StubInferenceHandler.calls["/loading"] == 3
+
+        # A hung endpoint is bounded by the read timeout
+        start = time.perf_counter()
+        try:
+            client.post(f"{base_url}/slow", json={"inputs": "q"})
+            assert False, "expected a timeout"
+        except requests.exceptions.Timeout:
+            pass
+        print(f"Slow endpoint gave up after {time.perf_counter() - start:.2f}s")
+        assert StubInferenceHandler.calls["/slow"] == 3
+
+        # Two failed requests in a row open the circuit, which then fails fast
+        assert client.post(f"{base_url}/down").status_code == 503
+        calls = StubInferenceHandler.calls["/down"]
+        try:
+            client.post(f"{base_url}/down")
+            assert False, "expected the circuit to be open"
+        except CircuitOpenError:
+            pass
+        print(f"Circuit state: {client.breaker.state}")
+        assert client.breaker.state == "open"
+        assert StubInferenceHandler.calls["/down"] == calls
+
+        # After the reset timeout a successful trial request closes it again
+        time.sleep(0.25)
+        assert client.post(f"{base_url}/loading").status_code == 200
+        assert client.breaker.state == "closed"
+        client.close()
+    finally:
+        server.shutdown()
+
+def test_sql_generator_with_stub():
+    """Test that SQLGenerator goes through the pooled client"""
+    server, base_url = start_stub_server()
+    try:
+        client = HTTPClient(max_retries=0)
+        generator = SQLGenerator(api_key="test-key", http_client=client, cache=LLMCache(enabled=False),
+                                 semantic_cache=SemanticCache(enabled=False))
+        generator.backend.model_url = f"{base_url}/model"
+        sql = generator.generate_sql("What are the sales by region?", "sales(region, sales_amount)", "Analyst")
+        print(f"Generated SQL: {sql!r}")
+        assert sql == "SELECT region, SUM(sales_amount)\nFROM sales\nGROUP BY region"
+    finally:
+        server.shutdown()
+
+def test_streaming_generation():
+    """Test that streamed generation stops once the SQL statement is complete"""
+    server, base_url = start_stub_server()
+    try:
+        generator = SQLGenerator(api_key="test-key", http_client=HTTPClient(max_retries=0), cache=LLMCache(enabled=False),
+                                 semantic_cache=SemanticCache(enabled=False))
+        generator.backend.model_url = f"{base_url}/stream"
+
+        # The semicolon inside the string literal does not end the statement
+        sql = generator.generate_sql("What are the sales by region?", "sales(region, sales_amount)", "Analyst")
+        print(f"Streamed SQL: {sql!r}")
+        assert sql == "SELECT region, SUM(sales_amount) FROM sales WHERE note = 'a;b' GROUP BY region;"
+        payload = StubInferenceHandler.payloads["/stream"]
+        assert payload["stream"] is True and payload["parameters"]["stop"] == [";"]
+
+        # A closing code fence also completes the statement
+        generator.backend.model_url = f"{base_url}/stream-fence"
+        sql = generator.generate_sql("How many sales are there?", "sales(region, sales_amount)", "Analyst")
+        assert sql == "SELECT COUNT(*) FROM sales"
+
+        # Hanging up stops the chatter long before the 80 tokens that follow the SQL
+        time.sleep(0.2)
+        print(f"Tokens sent by the server: {StubInferenceHandler.streamed_tokens}")
+        assert StubInferenceHandler.streamed_tokens["/stream"] < 17 + 40
+        assert StubInferenceHandler.streamed_tokens["/stream-fence"] < 15 + 40
+    finally:
+        server.shutdown()
+
+def test_generate_sql_many():
+    """Test that batch generation overlaps LLM round trips and keeps input order"""
+    server, base_url = start_stub_server()
+    try:
+        generator = SQLGenerator(api_key="test-key", http_client=HTTPClient(max_retries=0, pool_size=8),
+                                 max_concurrency=8, cache=LLMCache(enabled=False),
+                                 semantic_cache=SemanticCache(enabled=False))
+        generator.backend.model_url = f"{base_url}/latency"
+        questions = [f"Question {i}" for i in range(8)]
+
+        # The requests overlap at the server instead of arriving one by one
+        StubInferenceHandler.peak_in_flight = 0
+        results = generator.generate_sql_many(questions, "sales(region, sales_amount)")
+        print(f"8 questions, at most {StubInferenceHandler.peak_in_flight} in flight")
+        assert len(results) == 8 and all(sql.startswith("SELECT") for sql in results)
+        assert StubInferenceHandler.peak_in_flight > 1
+
+        # The async limit caps the requests in flight
+        StubInferenceHandler.peak_in_flight = 0
+        results = asyncio.run(generator.agenerate_sql_many(questions, "sales(region, sales_amount)", max_concurrency=4))
+        print(f"8 questions with a limit of 4: at most {StubInferenceHandler.peak_in_flight} in flight")
+        assert len(results) == 8
+        assert 1 < StubInferenceHandler.peak_in_flight <= 4
+        assert StubInferenceHandler.calls["/latency"] == 16
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_http_client()
+    test_sql_generator_with_stub()
+    test_streaming_generation()
+    test_generate_sql_many()
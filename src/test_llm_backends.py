@@ -0,0 +1,89 @@
+# src/test_llm_backends.py
+
+import os
+import shutil
+import tempfile
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.benchmark import SAMPLE_QUESTIONS, run_benchmark
+from src.models.llm_backends import MockBackend, RecordReplayBackend, create_backend
+from src.models.sql_generator import SQLGenerator
+from src.models.template_matcher import TemplateMatcher
+from src.utils.llm_cache import LLMCache
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.semantic_cache import SemanticCache
+from src.utils.single_flight import SingleFlight
+
+def offline_generator(backend, **kwargs):
+    """Generator that sends every question to the backend."""
+    return SQLGenerator(backend=backend, cache=LLMCache(enabled=False), semantic_cache=SemanticCache(enabled=False),
+                        template_matcher=TemplateMatcher(enabled=False), single_flight=SingleFlight(enabled=False),
+                        **kwargs)
+
+def test_record_replay():
+    """Test that recorded answers replay offline with their latency"""
+    recording_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(recording_dir, "recording.jsonl")
+        schema_text = SchemaDefinition().get_schema_text("sales")
+        answers = {
+            "sales by region": "SELECT region, SUM(sales_amount) FROM sales GROUP BY region",
+            "top customers": "SELECT customer_id, SUM(sales_amount) FROM sales GROUP BY customer_id LIMIT 5",
+        }
+        live = MockBackend(responder=lambda prompt: next(sql for q, sql in answers.items() if q in prompt),
+                           latency=0.05)
+
+        print("=== Testing Record and Replay ===\n")
+
+        recorder = offline_generator(RecordReplayBackend(path, backend=live))
+        recorded = [recorder.generate_sql(question, schema_text, "Analyst") for question in answers]
+        assert live.calls == 2
+
+        # Replay answers the same prompts without the live backend, after the recorded latency
+        replayer = offline_generator(RecordReplayBackend(path))
+        start = time.perf_counter()
+        replayed = [replayer.generate_sql(question, schema_text, "Analyst") for question in answers]
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {len(replayed)} answers in {elapsed:.2f}s")
+        assert replayed == recorded and live.calls == 2
+        assert 0.1 <= elapsed < 0.5
+
+        # A configured latency replaces the recorded one; unknown prompts are errors
+        fast = offline_generator(RecordReplayBackend(path, latency=0))
+        assert fast.generate_sql("sales by region", schema_text, "Analyst") == recorded[0]
+        assert fast.generate_sql("something new", schema_text, "Analyst").startswith("Error:")
+
+        try:
+            RecordReplayBackend(os.path.join(recording_dir, "missing.jsonl"))
+            assert False, "expected a missing recording to be reported"
+        except FileNotFoundError:
+            pass
+    finally:
+        shutil.rmtree(recording_dir)
+
+def test_offline_benchmark():
+    """Test that the mock backend needs no API key and drives the throughput benchmark"""
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ.pop("HUGGINGFACE_API_KEY", None)
+    try:
+        assert isinstance(create_backend(), MockBackend)
+        assert SQLGenerator(cache=LLMCache(enabled=False)).backend.model_id == "mock"
+    finally:
+        del os.environ["LLM_BACKEND"]
+
+    schema_text = SchemaDefinition().get_schema_text("sales")
+    generator = offline_generator(MockBackend(latency=0.02, jitter=0.5, seed=7), max_concurrency=8)
+    stats = run_benchmark(generator, SAMPLE_QUESTIONS, schema_text, requests=48, concurrency=8)
+    print(f"Throughput {stats['throughput']:.0f}/s, p50 {stats['p50'] * 1000:.0f} ms, "
+          f"p99 {stats['p99'] * 1000:.0f} ms")
+    assert stats["errors"] == 0 and stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"]
+    # 48 requests of ~20 ms each, 8 at a time, finish well under the 1s they would take in sequence
+    assert stats["seconds"] < 0.6
+
+if __name__ == "__main__":
+    test_record_replay()
+    test_offline_benchmark()
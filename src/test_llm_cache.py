@@ -0,0 +1,80 @@
+# src/test_llm_cache.py
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from src.utils.llm_cache import LLMCache
+from src.models.sql_generator import SQLGenerator
+
+SCHEMA_TEXT = "sales(sale_id, region, sales_amount)"
+
+class FakeClient:
+    """Stands in for HTTPClient and counts the requests that reach the model."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise requests.exceptions.ConnectionError("endpoint unreachable")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps([{"generated_text": "SELECT region, SUM(sales_amount) FROM sales GROUP BY region"}]).encode("utf-8")
+        return response
+
+def test_llm_cache():
+    """Test that repeated questions skip the model and errors are never cached"""
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "llm_cache.db")
+        client = FakeClient()
+        generator = SQLGenerator(api_key="test-key", http_client=client, cache=LLMCache(cache_path))
+
+        print("=== Testing LLM Cache ===\n")
+
+        # Case, spacing and trailing punctuation do not change the question
+        first = generator.generate_sql("What are the sales by region?", SCHEMA_TEXT, "Analyst")
+        second = generator.generate_sql("what are the  sales by region", SCHEMA_TEXT, "Analyst")
+        assert first == second and client.calls == 1
+
+        # A different role or schema is a different request
+        generator.generate_sql("What are the sales by region?", SCHEMA_TEXT, "Executive")
+        generator.generate_sql("What are the sales by region?", SCHEMA_TEXT + ", customers(customer_id)", "Analyst")
+        assert client.calls == 3
+
+        # The cache survives a restart
+        reopened = SQLGenerator(api_key="test-key", http_client=client, cache=LLMCache(cache_path))
+        reopened.generate_sql("What are the sales by region?", SCHEMA_TEXT, "Analyst")
+        assert client.calls == 3
+        print(f"Hit rate: {reopened.cache.hit_rate:.0%}, saved {reopened.cache.stats['saved_seconds']:.4f}s")
+        assert reopened.cache.stats["hits"] == 1
+
+        # Failed calls return an error string that is not cached
+        failing = SQLGenerator(api_key="test-key", http_client=FakeClient(fail=True), cache=LLMCache(cache_path))
+        result = failing.generate_sql("Show me the top 5 products by revenue", SCHEMA_TEXT, "Analyst")
+        assert result.startswith("Error:")
+        assert len(failing.cache) == 3
+
+        # Expired entries are dropped, and the oldest entries are evicted beyond the limit
+        short = LLMCache(os.path.join(cache_dir, "short.db"), ttl_seconds=0.05, max_entries=2)
+        for i in range(3):
+            short.put(f"key{i}", f"SELECT {i}", 0.5)
+            time.sleep(0.01)
+        assert len(short) == 2 and short.get("key0") is None
+        time.sleep(0.06)
+        assert short.get("key2") is None and short.stats["expired"] == 1
+    finally:
+        shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    test_llm_cache()
@@ -0,0 +1,62 @@
+# src/test_prefetch.py
+
+import asyncio
+import os
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.conftest import LOAD_SECONDS
+
+def test_prefetch(build_pipeline):
+    """Test that table loading overlaps SQL generation"""
+    question = "What are the sales by region?"
+    csv_files = {"sales": "sales.csv"}
+
+    print("=== Testing Speculative Prefetch ===\n")
+
+    timings = {}
+    for prefetch in (False, True):
+        pipeline = build_pipeline(prefetch)
+        start = time.perf_counter()
+        results = pipeline.process(question, csv_files=csv_files)
+        timings[prefetch] = time.perf_counter() - start
+        assert results["data"]["rows"] == 4 and results["data"]["status"] == "ok"
+    print(f"Sequential {timings[False]:.2f}s, with prefetch {timings[True]:.2f}s")
+    # Loading hides behind the LLM call instead of following it
+    assert timings[False] - timings[True] > LOAD_SECONDS * 0.6
+
+    # A wrong guess is discarded: the query still loads and reads what it needs
+    sql = "SELECT segment, COUNT(*) AS customers FROM customers GROUP BY segment"
+    results = build_pipeline(True, sql=sql).process("Top products by revenue")
+    assert results["data"]["status"] == "ok" and results["data"]["rows"] > 0
+
+def test_failed_generation_stops_prefetch(build_pipeline):
+    """Test that the prefetch is cancelled when SQL generation fails"""
+    pipeline = build_pipeline(True)
+    tokens = []
+    start_prefetch = pipeline._start_prefetch
+    pipeline._start_prefetch = lambda *args: tokens.append(start_prefetch(*args)) or tokens[-1]
+    def failing_generate(*args):
+        raise RuntimeError("model unavailable")
+    async def failing_agenerate(*args):
+        raise RuntimeError("model unavailable")
+    pipeline.sql_generator.generate_sql = failing_generate
+    pipeline.sql_generator.agenerate_sql = failing_agenerate
+
+    question = "What are the sales by region?"
+    for process in (lambda: pipeline.process(question, csv_files={"sales": "sales.csv"}),
+                    lambda: asyncio.run(pipeline.process_async(question, csv_files={"sales": "sales.csv"}))):
+        try:
+            process()
+            assert False, "expected the generation error"
+        except RuntimeError:
+            pass
+    assert len(tokens) == 2 and all(token.cancelled for token in tokens)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
@@ -0,0 +1,78 @@
+# src/test_result_cache.py
+
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.result_cache import ResultCache
+
+def test_result_cache():
+    """Test hits, invalidation by table and the on-disk tier of the result cache"""
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = ResultCache(max_mb=1, cache_dir=cache_dir)
+        sales_v1 = {"mtime": 1, "size": 100}
+        customers_v1 = {"mtime": 1, "size": 50}
+        result = pd.DataFrame({"region": ["North", "South"], "total_sales": [10.0, 20.0]})
+
+        print("=== Testing Result Cache ===\n")
+
+        # Whitespace and keyword case do not change the key
+        cache.put("SELECT region, SUM(sales_amount) AS total_sales FROM sales GROUP BY region",
+                  {"sales": sales_v1}, result)
+        cache.put("SELECT segment FROM customers", {"customers": customers_v1}, result)
+        hit = cache.get("select region, SUM(sales_amount) AS total_sales\nfrom sales\ngroup by region;",
+                        {"sales": sales_v1})
+        assert hit is not None and hit.equals(result)
+
+        # A changed sales.csv invalidates only the entries that read it
+        assert cache.get("SELECT region, SUM(sales_amount) AS total_sales FROM sales GROUP BY region",
+                         {"sales": {"mtime": 2, "size": 120}}) is None
+        assert cache.get("SELECT segment FROM customers", {"customers": customers_v1}) is not None
+        print(f"Stats: {cache.stats}")
+        assert cache.stats["invalidations"] == 2  # memory and disk copies
+
+        # A fresh cache finds the surviving entry on disk
+        reopened = ResultCache(max_mb=1, cache_dir=cache_dir)
+        assert reopened.get("SELECT segment FROM customers", {"customers": customers_v1}) is not None
+        assert reopened.stats["disk_hits"] == 1
+
+        # Results are stored as columns, not pickles, and read back with their types
+        mixed = pd.DataFrame({"region": ["North", None], "orders": [3, 4],
+                              "first_sale": pd.to_datetime(["2024-01-05", "2024-02-01"])})
+        reopened.put("SELECT region, orders, first_sale FROM sales", {"sales": sales_v1}, mixed)
+        assert not any(name.endswith(".pkl") for name in os.listdir(cache_dir))
+        again = ResultCache(max_mb=1, cache_dir=cache_dir)
+        stored = again.get("SELECT region, orders, first_sale FROM sales", {"sales": sales_v1})
+        assert stored is not None and again.stats["disk_hits"] == 1
+        assert stored["region"].dtype == object and stored["region"].tolist()[0] == "North"
+        assert stored["region"].isna().tolist() == [False, True]
+        assert stored["orders"].dtype == "int64" and stored["orders"].tolist() == [3, 4]
+        assert (stored["first_sale"] == mixed["first_sale"]).all()
+
+        # A column the format would turn into text stays in memory only
+        again.put("SELECT sale_id, note FROM sales", {"sales": sales_v1}, pd.DataFrame({"note": ["a", 1]}))
+        assert len(again.disk_entries) == 2
+
+        # Pickles left by older versions are deleted, never loaded
+        open(os.path.join(cache_dir, "old.pkl"), "wb").close()
+        ResultCache(max_mb=1, cache_dir=cache_dir)
+        assert not os.path.exists(os.path.join(cache_dir, "old.pkl"))
+
+        # Entries beyond the memory budget evict the least recently used ones
+        small = ResultCache(max_mb=0.001)
+        for i in range(5):
+            small.put(f"SELECT {i}", {}, result)
+        print(f"Entries kept under budget: {len(small.entries)}, evictions: {small.stats['evictions']}")
+        assert small.total_bytes <= small.max_bytes
+        assert small.stats["evictions"] > 0
+    finally:
+        shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    test_result_cache()
@@ -0,0 +1,76 @@
+# src/test_schema_linker.py
+
+import os
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.schema_linker import SchemaLinker
+
+def build_retail_schema():
+    """A wider domain: orders reach products only through order_items, plus unrelated tables"""
+    def table(primary_key, *columns):
+        return {
+            "columns": {name: {"type": col_type, "description": description} for name, col_type, description in columns},
+            "primary_key": primary_key,
+        }
+
+    tables = {
+        "orders": table("order_id", ("order_id", "INTEGER", "Unique order identifier"),
+                        ("order_date", "DATE", "Date the order was placed"),
+                        ("store_id", "INTEGER", "Store that took the order")),
+        "order_items": table("item_id", ("item_id", "INTEGER", "Line item identifier"),
+                             ("order_id", "INTEGER", "Order of the line item"),
+                             ("product_id", "INTEGER", "Product on the line item"),
+                             ("line_total", "DECIMAL", "Revenue of the line item")),
+        "products": table("product_id", ("product_id", "INTEGER", "Unique product identifier"),
+                          ("product_name", "TEXT", "Name of the product"),
+                          ("brand", "TEXT", "Brand of the product")),
+        "stores": table("store_id", ("store_id", "INTEGER", "Unique store identifier"),
+                        ("city", "TEXT", "City the store is in")),
+    }
+    for i in range(12):
+        tables[f"hr_table_{i}"] = table(f"row_{i}", (f"row_{i}", "INTEGER", "Identifier"),
+                                        (f"payroll_{i}", "DECIMAL", "Payroll amount for employees"),
+                                        (f"shift_{i}", "TEXT", "Shift schedule of employees"))
+    relationships = [
+        {"from_table": "order_items", "from_column": "order_id", "to_table": "orders", "to_column": "order_id"},
+        {"from_table": "order_items", "from_column": "product_id", "to_table": "products", "to_column": "product_id"},
+        {"from_table": "orders", "from_column": "store_id", "to_table": "stores", "to_column": "store_id"},
+    ]
+    return {"description": "Retail orders", "tables": tables, "relationships": relationships}
+
+def test_schema_linker():
+    """Test that prompts keep the linked tables and join paths and drop the rest"""
+    schema_def = SchemaDefinition()
+    schema_def.schemas["retail"] = build_retail_schema()
+    linker = SchemaLinker(schema_def)
+    full_text = schema_def.get_schema_text("retail")
+
+    print("=== Testing Schema Linking ===\n")
+
+    # Products and order dates are linked through order_items, which the question never names
+    text, before, after = linker.schema_text("Monthly order count per product brand", full_text)
+    print(text)
+    print(f"Schema tokens: {before} -> {after}")
+    tables = [line.split(": ")[1] for line in text.splitlines() if line.startswith("Table: ")]
+    assert sorted(tables) == ["order_items", "orders", "products"]
+    assert "order_items.product_id -> products.product_id" in text
+    assert "stores.store_id" not in text
+    assert after < before / 3
+
+    # The sales domain is narrow, so linked tables stay whole and only customers is dropped
+    sales_text = schema_def.get_schema_text("sales")
+    text, before, after = linker.schema_text("What are the top 5 products by revenue in the North?", sales_text)
+    assert "Table: customers" not in text and "product_name" in text and "region" in text
+
+    # Questions that link nothing and unknown schemas keep the full text
+    assert linker.schema_text("What is the weather like?", sales_text)[0] == sales_text
+    assert linker.schema_text("Sales by region", "Table: t\nColumns:\n  - x (TEXT)")[0] == "Table: t\nColumns:\n  - x (TEXT)"
+    print(f"Stats: {linker.stats}")
+    assert linker.stats["prompts"] == 4
+
+if __name__ == "__main__":
+    test_schema_linker()
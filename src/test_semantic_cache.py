@@ -0,0 +1,97 @@
+# src/test_semantic_cache.py
+
+import os
+import random
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.semantic_cache import SemanticCache
+
+TOP_PRODUCTS_SQL = ("SELECT product_name, SUM(sales_amount) AS revenue FROM sales "
+                    "GROUP BY product_name ORDER BY revenue DESC LIMIT 5")
+REGION_SQL = ("SELECT strftime('%m', date) AS month, SUM(sales_amount) FROM sales "
+              "WHERE region = 'North' AND strftime('%Y', date) = '2024' GROUP BY month")
+
+def test_semantic_cache():
+    """Test that questions differing only in literals reuse cached SQL with their own literals"""
+    cache = SemanticCache(threshold=0.75)
+    cache.add("What are the top 5 products by revenue?", "sales", TOP_PRODUCTS_SQL)
+    cache.add("Show monthly sales for the North region in 2024", "sales", REGION_SQL)
+    cache.add("How many orders came from the South region?", "sales",
+              "SELECT COUNT(*) FROM sales WHERE region = 'South'")
+
+    print("=== Testing Semantic Cache ===\n")
+
+    # N is re-substituted into the LIMIT clause
+    sql, similarity = cache.lookup("what are the top 10 products by revenue", "sales")
+    print(f"Similarity {similarity:.2f}: {sql}")
+    assert sql == TOP_PRODUCTS_SQL.replace("LIMIT 5", "LIMIT 10")
+
+    # Region and year come from the new question, written the way the SQL wrote them
+    sql, similarity = cache.lookup("Show monthly sales for the south region in 2023", "sales")
+    print(f"Similarity {similarity:.2f}: {sql}")
+    assert "region = 'South'" in sql and "= '2023'" in sql
+
+    # Unrelated questions and other schemas or roles miss
+    assert cache.lookup("Which customer segment buys the most?", "sales")[0] is None
+    assert cache.lookup("What are the top 5 products by revenue?", "other-scope")[0] is None
+
+    # A literal the SQL does not contain cannot be carried over, so the match is rejected
+    cache.add("Top products in the last 3 months", "sales", TOP_PRODUCTS_SQL)
+    assert cache.lookup("Top products in the last 6 months", "sales")[0] is None
+    assert cache.stats["rejected"] == 1
+
+    # A region the SQL does not know yet is swapped in like any other value of the slot
+    sql, _ = cache.lookup("Show monthly sales for the Online region in 2024", "sales")
+    print(f"Swapped value: {sql}")
+    assert "region = 'Online'" in sql and "North" not in sql
+
+    # Any other added, missing or changed word may ask for something else, however similar
+    cache.threshold = 0.5
+    for question in ["Show monthly sales for the North region in 2024 by channel",
+                     "Show monthly sales for the North region in 2024 by product",
+                     "Show sales for the North region in 2024",
+                     "Show monthly sales for the North channel in 2024",
+                     "Show weekly sales for the North region in 2024",
+                     "What are the top 5 customers by revenue?",
+                     "What are the bottom 5 products by revenue?",
+                     "What are the top 5 products by lowest revenue?",
+                     "What are the top 5 products not by revenue?",
+                     "Show monthly sales for the North region before 2024",
+                     "Show monthly sales for the North region since 2024",
+                     "Show monthly sales for the North region not in 2024",
+                     "Show average monthly sales for the North region in 2024"]:
+        rejected = cache.stats["rejected"]
+        sql, similarity = cache.lookup(question, "sales")
+        print(f"Similarity {similarity:.2f}, no reuse: {question!r}")
+        assert sql is None and cache.stats["rejected"] > rejected
+    print(f"Stats: {cache.stats}")
+
+def test_semantic_cache_scale():
+    """Test that lookups stay fast with many cached questions"""
+    rng = random.Random(0)
+    words = ("sales revenue products customers region monthly total average top best quantity segment "
+             "category channel online store show list what are the by in for of per each year").split()
+    cache = SemanticCache(max_entries=10000)
+    for i in range(12000):
+        question = " ".join(rng.choice(words) for _ in range(rng.randint(4, 9))) + f" item{i}"
+        cache.add(question, "sales", f"SELECT {i}")
+    assert len(cache) == 10000
+    cache.add("What are the top 5 products by revenue?", "sales", TOP_PRODUCTS_SQL)
+
+    timings = []
+    for _ in range(50):
+        start = time.perf_counter()
+        sql, _ = cache.lookup("what are the top 3 products by revenue", "sales")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"Median lookup over {len(cache)} questions: {timings[25] * 1000:.3f} ms")
+    assert sql.endswith("LIMIT 3")
+    assert timings[25] < 0.005
+
+if __name__ == "__main__":
+    test_semantic_cache()
+    test_semantic_cache_scale()
@@ -0,0 +1,158 @@
+# src/test_single_flight.py
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.utils.query_guard import CancelToken
+from src.utils.single_flight import SingleFlight
+
+CALLERS = 10
+
+def run_together(func):
+    """Call func from CALLERS threads released at the same moment."""
+    barrier = threading.Barrier(CALLERS)
+    def call(_):
+        barrier.wait()
+        try:
+            return func()
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        return list(pool.map(call, range(CALLERS)))
+
+def test_threads():
+    """Test that concurrent identical calls share one computation and its errors"""
+    flight = SingleFlight(enabled=True)
+
+    def slow_answer():
+        time.sleep(0.2)
+        return object()
+
+    print("=== Testing Single-Flight Coalescing ===\n")
+
+    results = run_together(lambda: flight.do("question", slow_answer))
+    assert flight.calls == 1 and flight.shared == CALLERS - 1
+    assert len({id(result) for result, _ in results}) == 1
+    assert sum(1 for _, shared in results if shared) == CALLERS - 1
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("model unavailable")
+
+    errors = run_together(lambda: flight.do("question", failing))
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.calls == 2
+
+    # Errors are not remembered: the next call runs again
+    assert flight.do("question", lambda: "retried") == ("retried", False)
+    assert SingleFlight(enabled=False).do("question", lambda: "alone") == ("alone", False)
+
+def test_async_cancellation():
+    """Test that cancelling one caller leaves the shared computation running for the others"""
+    flight = SingleFlight(enabled=True)
+    state = {"started": 0, "cancelled": 0}
+
+    async def slow_answer():
+        state["started"] += 1
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return "SELECT 1"
+
+    async def run():
+        callers = [asyncio.create_task(flight.ado("question", slow_answer)) for _ in range(CALLERS)]
+        await asyncio.sleep(0.05)
+        callers[0].cancel()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert [result for result, _ in results[1:]] == ["SELECT 1"] * (CALLERS - 1)
+        assert state == {"started": 1, "cancelled": 0}
+
+        # Once every caller has given up the computation is cancelled, and the next caller starts afresh
+        callers = [asyncio.create_task(flight.ado("question", slow_answer)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert state == {"started": 2, "cancelled": 1}
+        assert await flight.ado("question", slow_answer) == ("SELECT 1", False)
+
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise ValueError("model unavailable")
+        errors = await asyncio.gather(*(flight.ado("broken", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(e, ValueError) for e in errors)
+
+    asyncio.run(run())
+
+def test_pipeline_coalescing(build_pipeline):
+    """Test that users asking the same question at once share one LLM call, query and chart"""
+    pipeline = build_pipeline(False)
+    backend = pipeline.sql_generator.backend
+    charts = []
+    pipeline.visualizer.visualize = lambda df, question, user_role, viz_type=None: charts.append(viz_type) or {}
+    question = "What are the sales by region?"
+
+    results = run_together(lambda: pipeline.process(question, csv_files={"sales": "sales.csv"}))
+    print(f"{CALLERS} identical questions: {backend.calls} LLM call, {len(charts)} chart")
+    assert all(r["data"]["rows"] == 4 and r["data"]["status"] == "ok" for r in results)
+    assert backend.calls == 1 and len(charts) == 1
+    assert pipeline.single_flight.shared == CALLERS - 1
+
+    # Different roles are different requests
+    run_together(lambda: pipeline.process(question, user_role=f"Role {threading.get_ident()}",
+                                          csv_files={"sales": "sales.csv"}))
+    assert len(charts) == 1 + CALLERS
+
+    # The async entry point coalesces too, and so does SQL generation on its own
+    async def ask():
+        return await asyncio.gather(*(
+            pipeline.process_async("Total sales per region", csv_files={"sales": "sales.csv"})
+            for _ in range(CALLERS)
+        ))
+    calls = backend.calls
+    assert all(r["data"]["rows"] == 4 for r in asyncio.run(ask()))
+    assert backend.calls == calls + 1
+
+    generator = pipeline.sql_generator
+    schema_text = pipeline.schema_def.get_schema_text("sales")
+    sqls = run_together(lambda: generator.generate_sql("Sales split by region", schema_text, "Analyst"))
+    assert len(set(sqls)) == 1 and backend.calls == calls + 2
+    assert generator.stats["coalesced"] == CALLERS - 1
+
+def test_query_coalescing(build_pipeline):
+    """Test that identical queries running at once execute once and cancellable ones on their own"""
+    pipeline = build_pipeline(False)
+    executor = pipeline.query_executor
+    executions = []
+    execute = executor._execute_query
+    def counted(*args, **kwargs):
+        executions.append(args[0])
+        return execute(*args, **kwargs)
+    executor._execute_query = counted
+
+    queries = ["SELECT region, SUM(sales_amount) AS total FROM sales GROUP BY region",
+               "select region, SUM(sales_amount) as total\nfrom sales group by region;"]
+    frames = run_together(lambda: executor.execute_query(queries[threading.get_ident() % 2]))
+    assert len(executions) == 1
+    assert all(len(frame) == 4 for frame in frames)
+    assert len({id(frame) for frame in frames}) == CALLERS
+
+    executor.execute_query(queries[0], cancel_token=CancelToken())
+    executor.execute_query("SELECT region, RANDOM() AS r FROM sales")
+    assert len(executions) == 3 and executor.single_flight.calls == 1
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
@@ -0,0 +1,83 @@
+# src/test_sql_parser.py
+
+import os
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.sql_parser import base_tables, predicate_columns, referenced_columns
+
+SALES_COLUMNS = ['sale_id', 'date', 'product_name', 'product_category', 'quantity',
+                 'unit_price', 'customer_id', 'region', 'sales_channel', 'sales_amount']
+CUSTOMER_COLUMNS = ['customer_id', 'customer_name', 'segment', 'region']
+
+def test_base_tables():
+    """Test that only physical tables are resolved from generated SQL"""
+    test_cases = [
+        # SQLGenerator._clean_sql joins lines with newlines
+        ("SELECT region,\nSUM(sales_amount)\nFROM sales\nGROUP BY region", ['sales']),
+        ("SELECT c.segment, SUM(s.sales_amount)\nFROM sales s\nJOIN customers c ON s.customer_id = c.customer_id\nGROUP BY c.segment",
+         ['sales', 'customers']),
+        # CTE names and subquery aliases are not tables
+        ("WITH monthly AS (SELECT strftime('%m', date) AS m, SUM(sales_amount) AS t FROM sales GROUP BY m)\nSELECT * FROM monthly",
+         ['sales']),
+        ("SELECT x.region FROM (SELECT region FROM sales) x", ['sales']),
+        ("WITH months AS (SELECT 1 AS month UNION SELECT 2) SELECT month FROM months", []),
+        # Mentioning a table name in a literal does not load it
+        ("SELECT 'customers' AS label, COUNT(*) FROM sales", ['sales']),
+        ("SELECT region FROM sales WHERE customer_id IN (SELECT customer_id FROM customers)", ['sales', 'customers']),
+    ]
+
+    print("=== Testing SQL Table Resolution ===\n")
+
+    for sql, expected in test_cases:
+        tables = base_tables(sql)
+        print(f"{sql!r} -> {tables}")
+        assert tables == expected
+
+def test_referenced_columns():
+    """Test that column pruning keeps every column a query touches"""
+    tables = {'sales': SALES_COLUMNS, 'customers': CUSTOMER_COLUMNS}
+
+    columns = referenced_columns("SELECT region, SUM(sales_amount) FROM sales GROUP BY region", {'sales': SALES_COLUMNS})
+    assert columns == {'sales': ['region', 'sales_amount']}
+
+    columns = referenced_columns(
+        "SELECT c.segment, SUM(s.sales_amount) FROM sales AS s JOIN customers c ON s.customer_id = c.customer_id "
+        "WHERE s.date >= '2024-02-01' ORDER BY 2",
+        tables
+    )
+    assert columns == {'sales': ['date', 'customer_id', 'sales_amount'], 'customers': ['customer_id', 'segment']}
+
+    columns = referenced_columns("SELECT c.*, s.quantity FROM sales s JOIN customers c USING (customer_id)", tables)
+    assert columns == {'sales': ['quantity', 'customer_id'], 'customers': None}
+
+    # COUNT(*) reads no column, but the table still needs one to exist
+    columns = referenced_columns("SELECT COUNT(*) FROM sales", {'sales': SALES_COLUMNS})
+    assert columns == {'sales': ['sale_id']}
+
+    # A * between operands multiplies; only a * starting a select item selects every column
+    for sql in ["SELECT SUM(quantity * unit_price) AS revenue FROM sales",
+                "SELECT quantity * unit_price AS revenue FROM sales",
+                "SELECT SUM(quantity) * AVG(unit_price) FROM sales"]:
+        assert referenced_columns(sql, {'sales': SALES_COLUMNS}) == {'sales': ['quantity', 'unit_price']}
+    for sql in ["SELECT * FROM sales", "SELECT DISTINCT * FROM sales", "SELECT quantity, * FROM sales"]:
+        assert referenced_columns(sql, {'sales': SALES_COLUMNS}) == {'sales': None}
+
+def test_predicate_columns():
+    """Test that WHERE, JOIN and GROUP BY columns are found for adaptive indexing"""
+    tables = {'sales': SALES_COLUMNS, 'customers': CUSTOMER_COLUMNS}
+    predicates = predicate_columns(
+        "SELECT c.segment, SUM(s.sales_amount) FROM sales s\n"
+        "JOIN customers c ON s.customer_id = c.customer_id\n"
+        "WHERE s.date >= '2024-02-01' GROUP BY c.segment ORDER BY 2",
+        tables
+    )
+    print(f"Predicate columns: {predicates}")
+    assert predicates == {'sales': {'customer_id', 'date'}, 'customers': {'customer_id', 'segment'}}
+
+if __name__ == "__main__":
+    test_base_tables()
+    test_referenced_columns()
+    test_predicate_columns()
@@ -0,0 +1,88 @@
+# src/test_sql_validator.py
+
+import json
+import os
+import time
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from src.models.sql_generator import SQLGenerator
+from src.utils.llm_cache import LLMCache
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.semantic_cache import SemanticCache
+from src.utils.sql_validator import SQLValidator
+
+class ScriptedClient:
+    """Stands in for HTTPClient and answers with the next scripted SQL."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.prompts = []
+
+    def post(self, url, **kwargs):
+        self.prompts.append(kwargs["json"]["inputs"])
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps([{"generated_text": self.answers.pop(0)}]).encode("utf-8")
+        return response
+
+def test_sql_validator():
+    """Test that invalid SQL is caught against the schema without any data"""
+    validator = SQLValidator()
+    schema_text = SchemaDefinition().get_schema_text("sales")
+
+    print("=== Testing SQL Validation ===\n")
+
+    assert validator.validate("SELECT region, SUM(sales_amount) FROM sales GROUP BY region;", schema_text) is None
+    assert validator.validate(
+        "SELECT c.segment, COUNT(*) FROM sales s JOIN customers c ON s.customer_id = c.customer_id GROUP BY 1",
+        schema_text) is None
+
+    test_cases = [
+        ("SELECT revenue FROM sales", "no such column"),
+        ("SELECT * FROM orders", "no such table"),
+        ("SELEC region FROM sales", "syntax error"),
+        ("SELECT 1; SELECT 2", "one statement"),
+    ]
+    for sql, expected in test_cases:
+        start = time.perf_counter()
+        error = validator.validate(sql, schema_text)
+        elapsed = time.perf_counter() - start
+        print(f"{sql!r}: {error} ({elapsed * 1000:.2f} ms)")
+        assert expected in error
+        assert elapsed < 0.05
+
+    # Queries against schemas the validator does not know are not judged
+    assert validator.validate("SELECT * FROM orders", "orders(order_id)") is None
+    assert SQLValidator(enabled=False).validate("SELECT revenue FROM sales", schema_text) is None
+
+def test_repair_loop():
+    """Test that failed validation triggers a bounded number of repair requests"""
+    schema_text = SchemaDefinition().get_schema_text("sales")
+    question = "Which customers bought a laptop twice?"
+    valid_sql = "SELECT customer_id FROM sales WHERE product_name = 'Laptop' GROUP BY customer_id HAVING COUNT(*) = 2"
+
+    client = ScriptedClient(["SELECT customer FROM sales", valid_sql])
+    generator = SQLGenerator(api_key="test-key", http_client=client, cache=LLMCache(enabled=False),
+                             semantic_cache=SemanticCache(enabled=False), stream=False)
+    sql = generator.generate_sql(question, schema_text, "Analyst")
+    print(f"Repaired SQL: {sql}")
+    assert sql == valid_sql
+    assert "no such column: customer" in client.prompts[1]
+    assert generator.stats == {"llm": 1, "repair": 1}
+
+    # SQL that never compiles ends as an error result after max_repairs attempts
+    client = ScriptedClient(["SELECT revenue FROM sales"] * 3)
+    generator = SQLGenerator(api_key="test-key", http_client=client, cache=LLMCache(enabled=False),
+                             semantic_cache=SemanticCache(enabled=False), stream=False, max_repairs=2)
+    sql = generator.generate_sql(question, schema_text, "Analyst")
+    print(f"Unrepairable: {sql}")
+    assert sql.startswith("Error:") and "no such column: revenue" in sql
+    assert len(client.prompts) == 3 and not client.answers
+
+if __name__ == "__main__":
+    test_sql_validator()
+    test_repair_loop()
@@ -0,0 +1,114 @@
+# src/test_stage_graph.py
+
+import os
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.utils.stage_graph import StageGraph
+from src.visualization.visualizer import DataVisualizer
+
+def test_stage_graph():
+    """Test that independent stages run in parallel and each stage runs once"""
+    calls = []
+
+    def stage(name, seconds, value):
+        def run(done):
+            calls.append(name)
+            time.sleep(seconds)
+            return value(done)
+        return run
+
+    graph = StageGraph()
+    graph.add("source", stage("source", 0.0, lambda done: 2))
+    graph.add("left", stage("left", 0.2, lambda done: done["source"] * 10), after=("source",))
+    graph.add("right", stage("right", 0.2, lambda done: done["source"] + 1), after=("source",))
+    graph.add("join", stage("join", 0.0, lambda done: done["left"] + done["right"]), after=("left", "right"))
+
+    print("=== Testing Stage Graph ===\n")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        start = time.perf_counter()
+        results, timings = graph.run(executor)
+        elapsed = time.perf_counter() - start
+        print(f"Ran {len(results)} stages in {elapsed:.2f}s: {results}")
+        assert results["join"] == 23
+        assert sorted(calls) == ["join", "left", "right", "source"]
+        assert set(timings) == set(results) and timings["left"] >= 0.2
+        assert elapsed < 0.35
+
+        # Failures surface to the caller and unknown dependencies are reported
+        failing = StageGraph().add("boom", lambda done: 1 / 0)
+        try:
+            failing.run(executor)
+            assert False, "expected the stage error"
+        except ZeroDivisionError:
+            pass
+        try:
+            StageGraph().add("orphan", lambda done: None, after=("missing",)).run(executor)
+            assert False, "expected an unrunnable stage to be reported"
+        except ValueError:
+            pass
+
+        # A failure waits for the stages still running, then cleans up every finished result
+        released = []
+        def slow(done):
+            time.sleep(0.2)
+            return "slow"
+        def boom(done):
+            time.sleep(0.05)
+            raise ZeroDivisionError
+        graph = StageGraph()
+        graph.add("source", lambda done: "source", cleanup=released.append)
+        graph.add("slow", slow, after=("source",), cleanup=released.append)
+        graph.add("boom", boom, after=("source",))
+        graph.add("never", lambda done: "never", after=("slow", "boom"), cleanup=released.append)
+        try:
+            graph.run(executor)
+            assert False, "expected the stage error"
+        except ZeroDivisionError:
+            pass
+        assert sorted(released) == ["slow", "source"]
+
+def test_pipeline_stages(build_pipeline, work_dir):
+    """Test that the pipeline renders one chart and reports stage timings"""
+    pipeline = build_pipeline(prefetch=False)
+    pipeline.visualizer = DataVisualizer(output_dir=os.path.join(work_dir, "visualizations"))
+
+    results = pipeline.process("What are the sales by region?")
+    print(f"Timings: {results['timings']}")
+    charts = os.listdir(os.path.join(work_dir, "visualizations"))
+    assert len(charts) == 1 and results["visualization"]["path"].endswith(charts[0])
+    assert results["insights"]["summary"] and results["data"]["rows"] == 4
+    assert set(results["timings"]) == {"sql", "execute", "chart_type", "visualization", "insights", "total"}
+    assert results["timings"]["sql"] >= 0.3
+
+def test_failed_stage_closes_result(build_pipeline):
+    """Test that a stage failing after the query ran still closes its result"""
+    pipeline = build_pipeline(prefetch=False)
+    streams = []
+    execute = pipeline._execute
+    pipeline._execute = lambda *args: streams.append(execute(*args)) or streams[-1]
+    def failing_insights(*args):
+        raise RuntimeError("insights unavailable")
+    pipeline._insights = failing_insights
+
+    for process in (lambda: pipeline.process("What are the sales by region?", csv_files={"sales": "sales.csv"}),
+                    lambda: asyncio.run(pipeline.process_async("What are the sales by region?",
+                                                               csv_files={"sales": "sales.csv"}))):
+        try:
+            process()
+            assert False, "expected the stage error"
+        except RuntimeError:
+            pass
+    assert len(streams) == 2
+    assert all(stream.exhausted and stream._cursor is None for stream in streams)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
@@ -0,0 +1,223 @@
+# src/test_table_catalog.py
+
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.query_executor import QueryExecutor
+from src.utils.table_catalog import TableCatalog
+from src.utils.csv_loader import CSVLoader
+from src.utils.query_guard import CancelToken
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def test_table_catalog():
+    """Test that tables stay resident across queries and reload when the CSV changes"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(os.path.join(DATA_DIR, "sales.csv"), work_dir)
+        csv_path = os.path.join(work_dir, "sales.csv")
+
+        query_executor = QueryExecutor(data_dir=work_dir)
+        sql = "SELECT COUNT(*) AS n FROM sales"
+
+        print("=== Testing Table Catalog ===\n")
+
+        # First query loads the table, second one reuses it
+        first = query_executor.execute_query(sql, {'sales': 'sales.csv'})
+        loaded = query_executor.catalog.ensure_table('sales', csv_path, query_executor.load_csv, ['sale_id'])
+        print(f"Rows: {first['n'][0]}, reloaded on second use: {loaded}")
+        assert first['n'][0] == 100
+        assert not loaded
+
+        # Declared schema types shrink the resident footprint
+        report = query_executor.loader.memory_report['sales']
+        print(f"Memory: {report['before_mb']:.3f} MB -> {report['after_mb']:.3f} MB")
+        assert report['after_mb'] < report['before_mb']
+
+        # Appending a row changes size and mtime, so the table is reloaded
+        with open(csv_path, "a") as f:
+            f.write("101,2024-04-10,Monitor,Accessories,1,100.0,1,North,Online,100.0\n")
+        second = query_executor.execute_query(sql, {'sales': 'sales.csv'})
+        print(f"Rows after append: {second['n'][0]}")
+        assert second['n'][0] == 101
+
+        # Streaming a file in small chunks produces the same table
+        streaming_executor = QueryExecutor(data_dir=work_dir)
+        streaming_executor.loader = CSVLoader(memory_budget_mb=0.01, ingest_mode="stream")
+        streamed = streaming_executor.execute_query(sql, {'sales': 'sales.csv'})
+        print(f"Rows after streaming ingestion: {streamed['n'][0]}")
+        assert streamed['n'][0] == 101
+
+        # Only the referenced columns are loaded, and a wider query widens the table
+        assert query_executor.catalog.tables['sales']['columns'] == ['sale_id']
+        query_executor.execute_query("SELECT region, SUM(sales_amount) FROM sales GROUP BY region", {'sales': 'sales.csv'})
+        print(f"Loaded columns: {query_executor.catalog.tables['sales']['columns']}")
+        assert query_executor.catalog.tables['sales']['columns'] == ['sale_id', 'region', 'sales_amount']
+
+        # The primary key declared in the schema is indexed once it is loaded
+        indexes = [row[0] for row in query_executor.catalog.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'sales'")]
+        print(f"Indexes: {indexes}")
+        assert 'idx_sales_sale_id' in indexes
+
+        # The columnar cache keeps exactly one entry, for the current version of the CSV
+        entries = os.listdir(csv_path + ".cache")
+        print(f"Columnar cache entries: {entries}")
+        assert len(entries) == 1
+
+        # An on-disk catalog remembers fingerprints across instances
+        db_path = os.path.join(work_dir, "catalog.db")
+        catalog = TableCatalog(db_path=db_path)
+        assert catalog.ensure_table('sales', csv_path, query_executor.load_csv)
+        catalog.close()
+
+        reopened = TableCatalog(db_path=db_path)
+        assert not reopened.ensure_table('sales', csv_path, query_executor.load_csv)
+        reopened.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_date_columns():
+    """Test that DATE columns in formats other than ISO dates keep their values"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        sales = pd.read_csv(os.path.join(DATA_DIR, "sales.csv"))
+        dates = pd.to_datetime(sales['date'])
+        formats = {
+            "iso": sales['date'],
+            "us": dates.dt.strftime('%m/%d/%Y'),
+            "iso_time": dates.dt.strftime('%Y-%m-%dT10:30:00'),
+        }
+        for name, column in formats.items():
+            # Loaded as the sales table, whose schema declares date as DATE
+            data_dir = os.path.join(work_dir, name)
+            os.makedirs(data_dir)
+            sales.assign(date=column).to_csv(os.path.join(data_dir, "sales.csv"), index=False)
+            query_executor = QueryExecutor(data_dir=data_dir)
+            result = query_executor.execute_query("SELECT date FROM sales ORDER BY sale_id", {'sales': 'sales.csv'})
+            print(f"{name}: {result['date'][0]}")
+            assert result.attrs['status']['status'] == 'ok'
+            assert result['date'].tolist() == column.tolist()
+
+        # ISO dates are still typed, and date functions work on them
+        frame = query_executor.loader.compact(pd.DataFrame({'date': formats['iso']}), {'date': 'DATE'})
+        assert pd.api.types.is_datetime64_any_dtype(frame['date'])
+        query_executor = QueryExecutor(data_dir=os.path.join(work_dir, "iso"))
+        years = query_executor.execute_query("SELECT DISTINCT strftime('%Y', date) AS year FROM sales")
+        assert years['year'].tolist() == ['2024']
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_result_stream():
+    """Test that query results can be consumed in chunks without materializing them"""
+    query_executor = QueryExecutor(data_dir=DATA_DIR)
+    sql = "SELECT sale_id, region FROM sales ORDER BY sale_id"
+
+    print("=== Testing Result Stream ===\n")
+
+    stream = query_executor.execute_query_iter(sql, {'sales': 'sales.csv'}, chunksize=30)
+    preview = stream.head(5)
+    assert list(preview['sale_id']) == [1, 2, 3, 4, 5]
+
+    # Rows are counted as they are read, so the count is unknown until the end
+    assert stream.count() is None
+
+    # head() does not consume rows, so iteration still starts at the first one
+    sizes = [len(chunk) for chunk in stream]
+    print(f"Chunk sizes: {sizes}")
+    assert sizes == [30, 30, 30, 10]
+    assert stream.count() == 100
+
+    # A trailing comment does not disturb the query or its count
+    commented = query_executor.execute_query_iter("SELECT sale_id FROM sales -- every sale", {'sales': 'sales.csv'})
+    assert len(commented.collect()) == 100 and commented.count() == 100 and commented.status == "ok"
+
+    # A fully read stream fills the result cache; the next run is served from it
+    cached = query_executor.execute_query_iter(sql, {'sales': 'sales.csv'}, chunksize=30)
+    assert query_executor.result_cache.stats['hits'] == 1
+    sample = cached.collect(max_rows=50)
+    print(f"Collected {len(sample)} rows, truncated: {cached.truncated}")
+    assert len(sample) == 50 and cached.truncated
+
+def test_query_guardrails():
+    """Test that runaway queries are aborted by timeout, row cap and cancellation"""
+    query_executor = QueryExecutor(data_dir=DATA_DIR)
+    csv_files = {'sales': 'sales.csv'}
+    # An accidental cross join: 100^4 rows
+    runaway = "SELECT COUNT(*) FROM sales a, sales b, sales c, sales d"
+
+    print("=== Testing Query Guardrails ===\n")
+
+    result = query_executor.execute_query(runaway, csv_files, timeout=0.2)
+    print(f"Timeout: {result.attrs['status']}")
+    assert result.attrs['status'] == {"status": "aborted", "reason": "timeout"}
+    assert query_executor.last_timings['query'] < 5
+
+    result = query_executor.execute_query("SELECT sale_id FROM sales", csv_files, max_rows=10)
+    print(f"Row cap: {result.attrs['status']}, {len(result)} rows kept")
+    assert result.attrs['status']['reason'] == "max_rows" and len(result) == 10
+
+    # Only time spent in SQLite counts: a slow consumer does not time out a fast query
+    stream = query_executor.execute_query_iter("SELECT a.sale_id FROM sales a, sales b", csv_files,
+                                               chunksize=2000, timeout=0.5)
+    assert len(stream.head(5)) == 5
+    time.sleep(0.7)
+    rows = len(stream.collect())
+    print(f"After a slow consumer: {stream.status}, {rows} rows")
+    assert stream.status == "ok" and rows == 10000
+
+    token = CancelToken()
+    token.cancel()
+    result = query_executor.execute_query(runaway, csv_files, cancel_token=token)
+    assert result.attrs['status'] == {"status": "aborted", "reason": "cancelled"}
+
+    # Aborted results are not cached, and the connection keeps working
+    result = query_executor.execute_query("SELECT COUNT(*) AS n FROM sales", csv_files)
+    assert result.attrs['status']['status'] == "ok" and result['n'][0] == 100
+    assert query_executor.result_cache.stats['hits'] == 0
+
+def test_reload_under_open_stream():
+    """Test that a table can be widened while a stream still reads the old copy"""
+    query_executor = QueryExecutor(data_dir=DATA_DIR)
+
+    print("=== Testing Reload Under an Open Stream ===\n")
+
+    stream = query_executor.execute_query_iter("SELECT sale_id, region, sales_amount FROM sales", chunksize=5)
+    assert len(stream.head(1)) == 1
+
+    # Column pruning reloads sales with product_name while the stream's cursor is open
+    result = query_executor.execute_query("SELECT product_name, COUNT(*) AS n FROM sales GROUP BY product_name")
+    print(f"Reload under an open stream: {result.attrs['status']}")
+    assert result.attrs['status']['status'] == "ok" and result['n'].sum() == 100
+
+    # The new copy is indexed although the replaced one still holds the usual index name
+    indexes = [row[0] for row in query_executor.catalog.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'sales'")]
+    print(f"Indexes on the new copy: {indexes}")
+    assert indexes == ['idx_sales_sale_id_1']
+
+    # The stream keeps reading the copy it started on; the replaced table goes once it is closed
+    assert len(stream.collect()) == 100 and stream.status == "ok"
+    stream.close()
+    assert query_executor.catalog.drop_retired() == 0
+
+    # A table that cannot be loaded fails the query with an error status instead of raising
+    query_executor.open_csv = lambda *args, **kwargs: (_ for _ in ()).throw(OSError("disk unreadable"))
+    query_executor.catalog.invalidate('sales')
+    result = query_executor.execute_query("SELECT region FROM sales")
+    print(f"Load failure: {result.attrs['status']}")
+    assert result.attrs['status'] == {"status": "error", "reason": "disk unreadable"}
+
+if __name__ == "__main__":
+    test_table_catalog()
+    test_date_columns()
+    test_result_stream()
+    test_query_guardrails()
+    test_reload_under_open_stream()
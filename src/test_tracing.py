@@ -0,0 +1,125 @@
+# src/test_tracing.py
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add this to handle imports
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.utils.tracing import Span, Tracer, set_tracer
+
+def test_pipeline_trace(build_pipeline, work_dir):
+    """Test that one question produces a linked trace and a metrics snapshot"""
+    tracer = Tracer(enabled=True, trace_path=os.path.join(work_dir, "traces.jsonl"),
+                    metrics_path=os.path.join(work_dir, "metrics.prom"))
+    previous = set_tracer(tracer)
+    try:
+        pipeline = build_pipeline(True)
+        print("=== Testing Pipeline Tracing ===\n")
+
+        results = pipeline.process("What are the sales by region?", csv_files={"sales": "sales.csv"})
+        assert results["data"]["status"] == "ok"
+        tracer.close()
+
+        with open(tracer.trace_path, encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f]
+        names = {span["name"] for span in spans}
+        print(f"Spans: {sorted(names)}")
+        assert {"pipeline", "prompt_build", "llm_call", "csv_load", "sql_execute", "insights"} <= names
+
+        # Every span of the question hangs off the one pipeline span, across threads
+        root = next(span for span in spans if span["name"] == "pipeline")
+        by_id = {span["span_id"]: span for span in spans}
+        assert root["parent_id"] is None and root["attributes"]["rows"] == 4
+        assert root["attributes"]["route"] == "llm"
+        for span in spans:
+            assert span["trace_id"] == root["trace_id"]
+            if span is not root:
+                assert span["parent_id"] in by_id
+        assert len({span["thread"] for span in spans}) > 1
+        assert all(span["peak_memory_bytes"] >= 0 for span in spans)
+
+        with open(tracer.metrics_path, encoding="utf-8") as f:
+            metrics = f.read()
+        assert "# TYPE nli_span_seconds histogram" in metrics
+        assert 'nli_span_seconds_count{span="llm_call"} 1' in metrics
+        assert 'nli_span_seconds_bucket{span="pipeline",le="+Inf"} 1' in metrics
+        assert 'nli_span_rows_total{span="pipeline"} 4' in metrics
+    finally:
+        set_tracer(previous)
+        tracer.close()
+
+def test_concurrent_snapshots():
+    """Test that traces finishing at once in many threads never fail on the metrics snapshot"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        threads, traces = 8, 200
+        tracer = Tracer(enabled=True, trace_path=os.path.join(work_dir, "traces.jsonl"),
+                        metrics_path=os.path.join(work_dir, "metrics.prom"), metrics_interval=0)
+        def trace(_):
+            for _ in range(traces):
+                with tracer.span("pipeline", rows=1):
+                    pass
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(trace, range(threads)))
+        tracer.close()
+        with open(tracer.metrics_path, encoding="utf-8") as f:
+            assert f'nli_span_seconds_count{{span="pipeline"}} {threads * traces}' in f.read()
+        # No temporary files are left behind
+        assert sorted(os.listdir(work_dir)) == ["metrics.prom", "traces.jsonl"]
+
+        # Snapshots are throttled; closing writes the last one
+        tracer = Tracer(enabled=True, trace_path=os.path.join(work_dir, "throttled.jsonl"),
+                        metrics_path=os.path.join(work_dir, "throttled.prom"), metrics_interval=60)
+        for _ in range(3):
+            with tracer.span("pipeline"):
+                pass
+        with open(tracer.metrics_path, encoding="utf-8") as f:
+            assert 'nli_span_seconds_count{span="pipeline"} 1' in f.read()
+        tracer.close()
+        with open(tracer.metrics_path, encoding="utf-8") as f:
+            assert 'nli_span_seconds_count{span="pipeline"} 3' in f.read()
+
+        # A snapshot that cannot be written is reported, not raised into the traced code
+        blocked = os.path.join(work_dir, "blocked")
+        open(blocked, "w").close()
+        tracer = Tracer(enabled=True, trace_path=os.path.join(work_dir, "blocked.jsonl"),
+                        metrics_path=os.path.join(blocked, "metrics.prom"))
+        with tracer.span("pipeline"):
+            pass
+        tracer.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_disabled_overhead():
+    """Test that a disabled tracer hands out one shared no-op span and records nothing"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracer = Tracer(enabled=False, trace_path=os.path.join(work_dir, "traces.jsonl"),
+                        metrics_path=os.path.join(work_dir, "metrics.prom"))
+        count = 100000
+        spans = set()
+        start = time.perf_counter()
+        for _ in range(count):
+            with tracer.span("sql_execute", rows=1) as span:
+                span.set(status="ok")
+                tracer.annotate(route="llm")
+            spans.add(id(span))
+        per_span = (time.perf_counter() - start) / count
+        print(f"Disabled span: {per_span * 1e9:.0f} ns")
+        # Nothing is allocated, timed or written per span
+        assert len(spans) == 1 and not isinstance(span, Span)
+        tracer.close()
+        assert tracer.metrics == {} and os.listdir(work_dir) == []
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-s"]))
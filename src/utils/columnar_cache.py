@@ -0,0 +1,310 @@
+# src/utils/columnar_cache.py
+
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from src.utils.fingerprint import fingerprint_key
+
+MANIFEST = "manifest.json"
+
+class ColumnarCache:
+    """
+    Sidecar cache that stores parsed CSV tables as raw NumPy column files.
+
+    Each CSV gets a "<name>.csv.cache" directory next to it holding one
+    subdirectory per source fingerprint. Numeric and date columns are stored as
+    fixed-width binary arrays and read back memory-mapped; text columns are
+    dictionary-encoded into integer codes plus a JSON list of values.
+    """
+
+    def __init__(self, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled (bool, optional): Use the cache. Defaults to COLUMNAR_CACHE or True.
+        """
+        if enabled is None:
+            enabled = os.getenv("COLUMNAR_CACHE", "true").lower() == "true"
+        self.enabled = enabled
+
+    def cache_dir(self, csv_path):
+        """Return the sidecar directory for a CSV file."""
+        return f"{csv_path}.cache"
+
+    def entry_dir(self, csv_path, fingerprint):
+        """Return the cache directory for one version of a CSV file."""
+        return os.path.join(self.cache_dir(csv_path), fingerprint_key(fingerprint))
+
+    def is_valid(self, csv_path, fingerprint):
+        """
+        Check whether a complete cache exists for this exact version of the CSV.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            fingerprint (dict): Current fingerprint of the CSV file
+
+        Returns:
+            bool: True if the cache can be used
+        """
+        manifest = _read_manifest(self.entry_dir(csv_path, fingerprint))
+        return bool(manifest) and manifest.get("fingerprint", {}).get("size") == fingerprint["size"]
+
+    def read(self, csv_path, fingerprint, columns=None):
+        """
+        Read a cached table as a single DataFrame.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            fingerprint (dict): Current fingerprint of the CSV file
+            columns (list, optional): Columns to read. Reads all columns if None.
+
+        Returns:
+            pandas.DataFrame: Cached data backed by memory-mapped arrays where possible
+        """
+        entry = self.entry_dir(csv_path, fingerprint)
+        manifest = _read_manifest(entry)
+        dictionaries = _read_dictionaries(entry, manifest, columns)
+        return _slice(entry, manifest, dictionaries, 0, manifest["rows"], columns)
+
+    def read_chunks(self, csv_path, fingerprint, chunk_rows, columns=None):
+        """
+        Read a cached table in bounded chunks.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            fingerprint (dict): Current fingerprint of the CSV file
+            chunk_rows (int): Rows per chunk
+            columns (list, optional): Columns to read. Reads all columns if None.
+
+        Yields:
+            pandas.DataFrame: Consecutive slices of the table
+        """
+        entry = self.entry_dir(csv_path, fingerprint)
+        manifest = _read_manifest(entry)
+        dictionaries = _read_dictionaries(entry, manifest, columns)
+        for start in range(0, manifest["rows"], chunk_rows):
+            stop = min(start + chunk_rows, manifest["rows"])
+            yield _slice(entry, manifest, dictionaries, start, stop, columns)
+
+    def writer(self, csv_path, fingerprint, widen=False):
+        """
+        Start writing a new cache entry for a CSV file.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            fingerprint (dict): Fingerprint of the CSV version being cached
+            widen (bool): Store integers as int64 and floats as float64. Needed when
+                          data arrives in chunks whose narrowed dtypes may differ.
+
+        Returns:
+            ColumnarCacheWriter: Writer that accepts DataFrame chunks
+        """
+        return ColumnarCacheWriter(self, csv_path, fingerprint, widen)
+
+    def _publish(self, tmp_dir, csv_path, fingerprint):
+        """Move a finished entry into place and drop entries for older versions."""
+        entry = self.entry_dir(csv_path, fingerprint)
+        try:
+            os.rename(tmp_dir, entry)
+        except OSError:
+            # Another writer published the same version first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        for name in os.listdir(self.cache_dir(csv_path)):
+            path = os.path.join(self.cache_dir(csv_path), name)
+            if path != entry and not name.endswith(".tmp"):
+                shutil.rmtree(path, ignore_errors=True)
+
+class ColumnarWriter:
+    """Append DataFrame chunks to a new directory in the columnar cache format."""
+
+    def __init__(self, directory, widen=False):
+        self.directory = directory
+        self.widen = widen
+        os.makedirs(self.directory)
+        self.columns = None
+        self.files = {}
+        self.dictionaries = {}
+        self.rows = 0
+
+    def append(self, df):
+        """
+        Append a chunk of rows.
+
+        Args:
+            df (pandas.DataFrame): Chunk with the same columns as earlier chunks
+        """
+        if self.columns is None:
+            self.columns = [self._describe(i, name, df[name]) for i, name in enumerate(df.columns)]
+        for col in self.columns:
+            self._write_column(col, df[col["name"]])
+        self.rows += len(df)
+
+    def finish(self, **fields):
+        """
+        Close the column files and write the manifest, which marks the directory complete.
+
+        Args:
+            **fields: Extra manifest entries
+        """
+        for handle in self.files.values():
+            handle.close()
+        for col in self.columns or []:
+            if col["kind"] == "dictionary":
+                with open(os.path.join(self.directory, col["values_file"]), "w") as f:
+                    json.dump(list(self.dictionaries[col["name"]]), f)
+        manifest = dict(fields, rows=self.rows, columns=self.columns or [])
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+
+    def abort(self):
+        """Discard a partially written directory."""
+        for handle in self.files.values():
+            handle.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _describe(self, position, name, series):
+        """Choose the on-disk representation for a column."""
+        col = {"name": name, "file": f"col{position}.bin"}
+        dtype = series.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            col.update(kind="bool", dtype="uint8")
+        elif pd.api.types.is_integer_dtype(dtype):
+            if self.widen or isinstance(dtype, pd.api.extensions.ExtensionDtype):
+                # Later chunks may be wider or contain missing values
+                col.update(kind="numeric", dtype="int64", mask_file=f"col{position}.mask")
+            else:
+                col.update(kind="numeric", dtype=str(dtype))
+        elif pd.api.types.is_float_dtype(dtype):
+            col.update(kind="numeric", dtype="float64" if self.widen else str(dtype))
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            col.update(kind="datetime", dtype="int64")
+        else:
+            col.update(kind="dictionary", dtype="int32", values_file=f"col{position}.json")
+            self.dictionaries[name] = {}
+        return col
+
+    def _write_column(self, col, series):
+        """Append one column of a chunk to its files."""
+        if col["kind"] == "dictionary":
+            # Factorize the chunk, then map its local codes onto the table-wide dictionary
+            values = self.dictionaries[col["name"]]
+            codes, uniques = pd.factorize(series)
+            mapping = np.array([values.setdefault(str(v), len(values)) for v in uniques], dtype="int32")
+            if len(mapping):
+                codes = np.where(codes < 0, -1, mapping[np.maximum(codes, 0)])
+            self._handle(col["file"]).write(codes.astype("int32").tobytes())
+        elif col["kind"] == "datetime":
+            stamps = pd.to_datetime(series).astype("datetime64[ns]")
+            self._handle(col["file"]).write(stamps.to_numpy().view("int64").tobytes())
+        elif col["kind"] == "bool":
+            self._handle(col["file"]).write(series.to_numpy(dtype="uint8").tobytes())
+        elif col.get("mask_file"):
+            # Nullable integers: values plus a validity mask; raises if a chunk has fractions
+            ints = pd.array(series, dtype="Int64")
+            self._handle(col["file"]).write(ints.to_numpy(dtype="int64", na_value=0).tobytes())
+            self._handle(col["mask_file"]).write(np.asarray(ints.isna(), dtype="uint8").tobytes())
+        else:
+            self._handle(col["file"]).write(series.to_numpy(dtype=col["dtype"]).tobytes())
+
+    def _handle(self, file_name):
+        """Return an open append handle for a column file."""
+        if file_name not in self.files:
+            self.files[file_name] = open(os.path.join(self.directory, file_name), "ab")
+        return self.files[file_name]
+
+class ColumnarCacheWriter(ColumnarWriter):
+    """Append DataFrame chunks to a new columnar cache entry."""
+
+    def __init__(self, cache, csv_path, fingerprint, widen=False):
+        super().__init__(os.path.join(cache.cache_dir(csv_path), f"{uuid.uuid4().hex}.tmp"), widen)
+        self.cache = cache
+        self.csv_path = csv_path
+        self.fingerprint = fingerprint
+
+    def commit(self):
+        """Finish the entry and make it visible to readers."""
+        self.finish(fingerprint=self.fingerprint)
+        self.cache._publish(self.directory, self.csv_path, self.fingerprint)
+
+def write_frame(df, directory):
+    """
+    Write a whole DataFrame to a new directory in the columnar cache format.
+
+    Args:
+        df (pandas.DataFrame): Data with unique column names
+        directory (str): Directory to create
+    """
+    writer = ColumnarWriter(directory)
+    try:
+        writer.append(df)
+        writer.finish()
+    except Exception:
+        writer.abort()
+        raise
+
+def read_frame(directory):
+    """
+    Read a DataFrame written by write_frame().
+
+    Args:
+        directory (str): Directory holding the columns
+
+    Returns:
+        pandas.DataFrame or None: The data, memory-mapped where possible, or None if
+                                  the directory is missing or incomplete
+    """
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        return None
+    dictionaries = _read_dictionaries(directory, manifest, None)
+    return _slice(directory, manifest, dictionaries, 0, manifest["rows"], None)
+
+def _read_dictionaries(entry, manifest, columns):
+    """Load the value lists of dictionary-encoded columns."""
+    dictionaries = {}
+    for col in manifest["columns"]:
+        if col["kind"] == "dictionary" and (columns is None or col["name"] in columns):
+            with open(os.path.join(entry, col["values_file"])) as f:
+                dictionaries[col["name"]] = json.load(f)
+    return dictionaries
+
+def _slice(entry, manifest, dictionaries, start, stop, columns):
+    """Materialize rows [start, stop) of a cached table."""
+    rows = manifest["rows"]
+    data = {}
+    for col in manifest["columns"]:
+        name = col["name"]
+        if columns is not None and name not in columns:
+            continue
+        values = _memmap(os.path.join(entry, col["file"]), col["dtype"], rows)[start:stop]
+        if col["kind"] == "dictionary":
+            data[name] = pd.Categorical.from_codes(np.asarray(values), categories=dictionaries[name])
+        elif col["kind"] == "datetime":
+            data[name] = values.view("datetime64[ns]")
+        elif col["kind"] == "bool":
+            data[name] = values.astype(bool)
+        elif col.get("mask_file"):
+            mask = np.asarray(_memmap(os.path.join(entry, col["mask_file"]), "uint8", rows)[start:stop], dtype=bool)
+            data[name] = pd.arrays.IntegerArray(np.asarray(values), mask) if mask.any() else values
+        else:
+            data[name] = values
+    # copy=False keeps numeric columns backed by the memory-mapped files
+    return pd.DataFrame(data, index=pd.RangeIndex(start, stop), copy=False)
+
+def _read_manifest(entry):
+    """Load an entry's manifest, or None if it is missing or incomplete."""
+    try:
+        with open(os.path.join(entry, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _memmap(path, dtype, rows):
+    """Memory-map a column file, handling empty tables."""
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
@@ -0,0 +1,307 @@
+# src/utils/csv_loader.py
+
+import os
+import pandas as pd
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.columnar_cache import ColumnarCache
+from src.utils.fingerprint import file_fingerprint
+
+# Parsed CSV data typically takes 2-3x the size of the text on disk
+PARSE_EXPANSION = 3
+# Rows sampled to estimate the in-memory size of one parsed row
+SAMPLE_ROWS = 1000
+# A chunk is held as parsed text, typed columns and SQLite row tuples at the same time
+CHUNK_OVERHEAD = 4
+
+class CSVLoader:
+    """Load CSV files into compact DataFrames typed from SchemaDefinition."""
+
+    def __init__(self, schema_def=None, category_threshold=None, memory_budget_mb=None, ingest_mode=None,
+                 cache=None):
+        """
+        Initialize the loader.
+
+        Args:
+            schema_def (SchemaDefinition, optional): Schema used to type the columns
+            category_threshold (float, optional): Maximum ratio of unique values to rows
+                                                  for a TEXT column to become categorical.
+                                                  Defaults to CATEGORY_THRESHOLD or 0.5.
+            memory_budget_mb (float, optional): Peak memory allowed for ingesting one table.
+                                                Defaults to INGEST_MEMORY_BUDGET_MB or 256.
+            ingest_mode (str, optional): "auto" streams files that would not fit the budget,
+                                         "stream" always streams, "full" never does.
+                                         Defaults to INGEST_MODE or "auto".
+            cache (ColumnarCache, optional): Sidecar cache of parsed tables
+        """
+        self.schema_def = schema_def or SchemaDefinition()
+        if category_threshold is None:
+            category_threshold = float(os.getenv("CATEGORY_THRESHOLD", "0.5"))
+        self.category_threshold = category_threshold
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.getenv("INGEST_MEMORY_BUDGET_MB", "256"))
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.ingest_mode = (ingest_mode or os.getenv("INGEST_MODE", "auto")).lower()
+        self.cache = cache or ColumnarCache()
+
+        # table_name -> {"rows": int, "before_mb": float, "after_mb": float}
+        self.memory_report = {}
+
+    def column_types(self, table_name):
+        """
+        Look up the declared column types for a table in any domain.
+
+        Args:
+            table_name (str): Table name
+
+        Returns:
+            dict: Mapping of column name to declared type (e.g. "INTEGER")
+        """
+        if not table_name:
+            return {}
+        for schema in self.schema_def.schemas.values():
+            table_info = schema.get('tables', {}).get(table_name)
+            if table_info:
+                return {col: info.get('type', 'TEXT') for col, info in table_info.get('columns', {}).items()}
+        return {}
+
+    def header(self, file_path):
+        """
+        Read the column names of a CSV file without loading any rows.
+
+        Args:
+            file_path (str): Path to the CSV file
+
+        Returns:
+            list: Column names in file order
+        """
+        return list(pd.read_csv(file_path, nrows=0).columns)
+
+    def read(self, file_path, table_name=None, columns=None):
+        """
+        Read a CSV file and convert its columns to compact dtypes.
+
+        Args:
+            file_path (str): Path to the CSV file
+            table_name (str, optional): Table name used to find the declared schema
+            columns (list, optional): Only read these columns. Reads all columns if None.
+
+        Returns:
+            pandas.DataFrame: Loaded data
+        """
+        df = pd.read_csv(file_path, usecols=columns)
+        types = self.column_types(table_name)
+        if not types:
+            return df
+
+        before = memory_mb(df)
+        df = self.compact(df, types)
+        after = memory_mb(df)
+
+        name = table_name or os.path.basename(file_path)
+        self.memory_report[name] = {"rows": len(df), "before_mb": before, "after_mb": after}
+        print(f"Memory for {name}: {before:.2f} MB -> {after:.2f} MB")
+        return df
+
+    def open(self, file_path, table_name=None, columns=None):
+        """
+        Open a CSV file for ingestion.
+
+        When the columnar cache has to be built, every column is parsed once so
+        later loads can prune columns from the cache instead of the CSV text.
+
+        Args:
+            file_path (str): Path to the CSV file
+            table_name (str, optional): Table name used to find the declared schema
+            columns (list, optional): Only return these columns. Returns all columns if None.
+
+        Returns:
+            pandas.DataFrame or iterator: The whole table, or an iterator of DataFrame
+                                          chunks when the file is streamed
+        """
+        stream = self.should_stream(file_path, columns)
+        if not self.cache.enabled:
+            if stream:
+                return self.read_chunks(file_path, table_name, columns)
+            return self.read(file_path, table_name, columns)
+
+        fingerprint = file_fingerprint(file_path)
+        if self.cache.is_valid(file_path, fingerprint):
+            print(f"Reading {file_path} from columnar cache")
+            if stream:
+                return self.cache.read_chunks(file_path, fingerprint, self.chunk_rows(file_path, columns), columns)
+            return self.cache.read(file_path, fingerprint, columns)
+
+        if stream:
+            return self._caching_chunks(file_path, table_name, fingerprint, columns)
+        df = self.read(file_path, table_name)
+        writer = self._cache_writer(file_path, fingerprint)
+        if writer and self._cache_append(writer, df):
+            writer.commit()
+        return df[columns] if columns is not None else df
+
+    def _caching_chunks(self, file_path, table_name, fingerprint, columns=None):
+        """Stream a CSV file while writing its chunks to the columnar cache."""
+        writer = self._cache_writer(file_path, fingerprint, widen=True)
+        try:
+            for chunk in self.read_chunks(file_path, table_name):
+                if writer and not self._cache_append(writer, chunk):
+                    writer = None
+                yield chunk[columns] if columns is not None else chunk
+        except BaseException:
+            if writer:
+                writer.abort()
+            raise
+        if writer:
+            writer.commit()
+
+    def _cache_writer(self, file_path, fingerprint, widen=False):
+        """Start a cache entry, or return None if the cache cannot be written."""
+        try:
+            return self.cache.writer(file_path, fingerprint, widen=widen)
+        except OSError as e:
+            print(f"Columnar cache disabled for {file_path}: {e}")
+            return None
+
+    def _cache_append(self, writer, df):
+        """Append data to a cache entry, abandoning the entry on failure."""
+        try:
+            writer.append(df)
+            return True
+        except Exception as e:
+            print(f"Error writing columnar cache: {e}")
+            writer.abort()
+            return False
+
+    def should_stream(self, file_path, columns=None):
+        """Decide whether a file has to be streamed to stay within the memory budget."""
+        if self.ingest_mode == "stream":
+            return True
+        if self.ingest_mode == "full":
+            return False
+        estimate = os.path.getsize(file_path) * PARSE_EXPANSION
+        if columns is not None:
+            estimate = estimate * len(columns) / max(1, len(self.header(file_path)))
+        return estimate > self.memory_budget_bytes
+
+    def chunk_rows(self, file_path, columns=None):
+        """
+        Estimate how many rows fit in one chunk under the memory budget.
+
+        Args:
+            file_path (str): Path to the CSV file
+            columns (list, optional): Columns that will be read. All columns if None.
+
+        Returns:
+            int: Number of rows per chunk
+        """
+        sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS, usecols=columns)
+        if sample.empty:
+            return SAMPLE_ROWS
+        row_bytes = memory_mb(sample) * 1024 * 1024 / len(sample)
+        return max(1, int(self.memory_budget_bytes / (row_bytes * CHUNK_OVERHEAD)))
+
+    def read_chunks(self, file_path, table_name=None, columns=None):
+        """
+        Read a CSV file in bounded chunks.
+
+        Args:
+            file_path (str): Path to the CSV file
+            table_name (str, optional): Table name used to find the declared schema
+            columns (list, optional): Only read these columns. Reads all columns if None.
+
+        Yields:
+            pandas.DataFrame: Typed chunks of the file
+        """
+        types = self.column_types(table_name)
+        rows = self.chunk_rows(file_path, columns)
+        print(f"Streaming {file_path} in chunks of {rows} rows")
+        for chunk in pd.read_csv(file_path, chunksize=rows, usecols=columns):
+            # Categories only pay off for resident frames; chunks go straight to SQLite
+            yield self.compact(chunk, types, categorize=False)
+
+    def compact(self, df, types, categorize=True):
+        """
+        Convert DataFrame columns to the narrowest dtypes allowed by their declared types.
+
+        Args:
+            df (pandas.DataFrame): Data as parsed by pandas
+            types (dict): Mapping of column name to declared type
+            categorize (bool): Convert low-cardinality TEXT columns to categoricals
+
+        Returns:
+            pandas.DataFrame: The same data with compact dtypes
+        """
+        for col, col_type in types.items():
+            if col not in df.columns:
+                continue
+            col_type = col_type.upper()
+            if col_type == "INTEGER":
+                if not df[col].isna().any():
+                    df[col] = pd.to_numeric(df[col], downcast='integer')
+            elif col_type == "DATE":
+                df[col] = parse_dates(df[col])
+            elif col_type == "TEXT" and categorize:
+                if len(df) and df[col].nunique() / len(df) <= self.category_threshold:
+                    df[col] = df[col].astype('category')
+            # DECIMAL stays float64 so monetary sums keep their precision
+        return df
+
+def memory_mb(df):
+    """Return the deep memory usage of a DataFrame in megabytes."""
+    return float(df.memory_usage(deep=True).sum()) / (1024 * 1024)
+
+def parse_dates(values):
+    """
+    Parse a DATE column, keeping the original text unless every value survives the round trip.
+
+    Dates go back to SQLite as text (see sqlite_frame), so the column is only
+    converted when that text is exactly what the CSV held. Other formats, such
+    as MM/DD/YYYY or ISO datetimes with a "T", stay as written rather than
+    being lost or rewritten.
+
+    Args:
+        values (pandas.Series): Column as parsed by pandas
+
+    Returns:
+        pandas.Series: Datetime column, or the values unchanged
+    """
+    if not pd.api.types.is_object_dtype(values.dtype) and not pd.api.types.is_string_dtype(values.dtype):
+        return values
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    present = values.notna()
+    if parsed[present].isna().any():
+        return values
+    if not (format_dates(parsed)[present] == values[present].astype(str)).all():
+        return values
+    return parsed
+
+def format_dates(values):
+    """ISO-8601 text of a datetime column: dates alone when no value has a time of day."""
+    if (values.dropna() == values.dropna().dt.normalize()).all():
+        return values.dt.strftime('%Y-%m-%d')
+    return values.dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def sqlite_frame(df):
+    """
+    Prepare a typed DataFrame for SQLite, which has no native date type.
+
+    Dates are written back as ISO-8601 text so SQL comparisons and strftime()
+    behave exactly as they did on the raw CSV values. Missing values in nullable
+    columns become None.
+    """
+    date_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    nullable_cols = [
+        col for col in df.columns
+        if isinstance(df[col].dtype, pd.api.extensions.ExtensionDtype)
+        and not isinstance(df[col].dtype, pd.CategoricalDtype)
+        and pd.api.types.is_numeric_dtype(df[col].dtype)
+    ]
+    if len(date_cols) == 0 and not nullable_cols:
+        return df
+    df = df.copy(deep=False)
+    for col in nullable_cols:
+        # sqlite3 cannot bind pd.NA or NumPy scalars
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    for col in date_cols:
+        df[col] = format_dates(df[col])
+    return df
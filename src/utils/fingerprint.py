@@ -0,0 +1,29 @@
+# src/utils/fingerprint.py
+
+import hashlib
+import os
+
+def file_fingerprint(file_path, hash_content=False):
+    """
+    Compute a cheap fingerprint of a source file.
+
+    Args:
+        file_path (str): Path to the file
+        hash_content (bool): Also include a SHA-256 digest of the file contents
+
+    Returns:
+        dict: Fingerprint with mtime, size and optionally the content hash
+    """
+    stat = os.stat(file_path)
+    fingerprint = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+    if hash_content:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+def fingerprint_key(fingerprint):
+    """Return a short, filesystem-safe key for a fingerprint."""
+    return f"{fingerprint['mtime']}-{fingerprint['size']}"
@@ -0,0 +1,212 @@
+# src/utils/http_client.py
+
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# 429 is rate limiting, 503 is returned while an inference model is loading
+RETRY_STATUSES = {429, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Stop calling an endpoint that keeps failing.
+
+    After failure_threshold consecutive failed requests the circuit opens and
+    requests fail fast. Once reset_timeout seconds have passed a single trial
+    request is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold (int, optional): Consecutive failures that open the circuit.
+                                               Defaults to CIRCUIT_FAILURE_THRESHOLD or 5.
+            reset_timeout (float, optional): Seconds before a trial request is allowed.
+                                             Defaults to CIRCUIT_RESET_SECONDS or 30.
+        """
+        if failure_threshold is None:
+            failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        if reset_timeout is None:
+            reset_timeout = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a request may be sent.
+
+        Returns:
+            bool: False while the circuit is open
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class HTTPClient:
+    """
+    Keep-alive HTTP client with timeouts, retries and a circuit breaker.
+
+    Requests go through one pooled requests.Session, so repeated calls to the
+    same host reuse their connections instead of paying a new TLS handshake.
+    Connection errors, timeouts and 429/502/503/504 responses are retried with
+    jittered exponential backoff, honouring Retry-After when the server sends it.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None, backoff_base=None,
+                 backoff_max=None, pool_size=None, breaker=None):
+        """
+        Initialize the client.
+
+        Args:
+            connect_timeout (float, optional): Seconds to establish a connection.
+                                               Defaults to HTTP_CONNECT_TIMEOUT or 5.
+            read_timeout (float, optional): Seconds to wait for response data.
+                                            Defaults to HTTP_READ_TIMEOUT or 60.
+            max_retries (int, optional): Retries after the first attempt.
+                                         Defaults to HTTP_MAX_RETRIES or 3.
+            backoff_base (float, optional): Backoff before the first retry, doubled on each
+                                            further retry. Defaults to HTTP_BACKOFF_BASE or 0.5.
+            backoff_max (float, optional): Longest backoff. Defaults to HTTP_BACKOFF_MAX or 8.
+            pool_size (int, optional): Connections kept per host. Defaults to HTTP_POOL_SIZE or 10.
+            breaker (CircuitBreaker, optional): Circuit breaker. A new one is created if not provided.
+        """
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        if read_timeout is None:
+            read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+        if max_retries is None:
+            max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+        if backoff_base is None:
+            backoff_base = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+        if backoff_max is None:
+            backoff_max = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+        if pool_size is None:
+            pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        # Retries are handled here so they can share the backoff and breaker logic
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, url, **kwargs):
+        """
+        Send a POST request.
+
+        Args:
+            url (str): Request URL
+            **kwargs: Passed to requests.Session.post
+
+        Returns:
+            requests.Response: The final response
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.exceptions.RequestException: If the request still fails after all retries
+        """
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request with retries, see post().
+
+        Returns:
+            requests.Response: The final response
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {url}; not sending request")
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if last_attempt:
+                    self.breaker.record_failure()
+                    raise
+                print(f"Request to {url} failed ({e.__class__.__name__}), retrying")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                # Client errors are the caller's problem, not a sign the endpoint is down
+                self.breaker.record_success()
+                return response
+            if last_attempt:
+                self.breaker.record_failure()
+                return response
+            print(f"Request to {url} returned {response.status_code}, retrying")
+            delay = self._backoff(attempt, response.headers.get("Retry-After"))
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before the next attempt.
+
+        Uses full jitter over an exponentially growing window, so clients that
+        failed together do not retry together. A Retry-After header in seconds
+        takes precedence, capped at backoff_max.
+        """
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        window = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, window)
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def get_shared_client():
+    """
+    Process-wide HTTPClient, so every generator reuses the same connection pool.
+
+    Returns:
+        HTTPClient: The shared client
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient()
+        return _shared_client
@@ -0,0 +1,120 @@
+# src/utils/index_advisor.py
+
+import os
+import threading
+import time
+from collections import Counter
+from src.utils.schema_definitions import SchemaDefinition
+
+class IndexAdvisor:
+    """Create SQLite indexes from schema keys and from columns that queries keep filtering on."""
+
+    def __init__(self, schema_def=None, adaptive=None, threshold=None):
+        """
+        Initialize the advisor.
+
+        Args:
+            schema_def (SchemaDefinition, optional): Schema providing primary keys and relationships
+            adaptive (bool, optional): Also index hot predicate columns.
+                                       Defaults to ADAPTIVE_INDEXING or True.
+            threshold (int, optional): Number of queries a column must appear in as a
+                                       WHERE/JOIN/GROUP BY column before it is indexed.
+                                       Defaults to INDEX_THRESHOLD or 3.
+        """
+        self.schema_def = schema_def or SchemaDefinition()
+        if adaptive is None:
+            adaptive = os.getenv("ADAPTIVE_INDEXING", "true").lower() == "true"
+        if threshold is None:
+            threshold = int(os.getenv("INDEX_THRESHOLD", "3"))
+        self.adaptive = adaptive
+        self.threshold = threshold
+
+        # (table_name, column) -> number of queries that used it as a predicate
+        self.predicate_counts = Counter()
+        self._lock = threading.Lock()
+
+    def key_columns(self, table_name):
+        """
+        Columns to index because the schema declares them as keys.
+
+        Args:
+            table_name (str): Table name
+
+        Returns:
+            list: Primary key and relationship columns of the table
+        """
+        columns = []
+        for schema in self.schema_def.schemas.values():
+            table_info = schema.get('tables', {}).get(table_name)
+            if table_info and table_info.get('primary_key'):
+                columns.append(table_info['primary_key'])
+            for rel in schema.get('relationships', []):
+                if rel.get('from_table') == table_name:
+                    columns.append(rel.get('from_column'))
+                if rel.get('to_table') == table_name:
+                    columns.append(rel.get('to_column'))
+        return list(dict.fromkeys(col for col in columns if col))
+
+    def record(self, predicates):
+        """
+        Record the predicate columns of one executed query.
+
+        Args:
+            predicates (dict): Mapping of table name to the columns it was filtered,
+                               joined or grouped on
+        """
+        if not self.adaptive:
+            return
+        with self._lock:
+            for table_name, columns in predicates.items():
+                for column in columns:
+                    self.predicate_counts[(table_name, column)] += 1
+
+    def hot_columns(self, table_name):
+        """Return the predicate columns of a table that reached the threshold."""
+        if not self.adaptive:
+            return []
+        with self._lock:
+            return sorted(
+                column for (table, column), count in self.predicate_counts.items()
+                if table == table_name and count >= self.threshold
+            )
+
+    def ensure_indexes(self, conn, table_name, loaded_columns):
+        """
+        Create any missing key and hot-column indexes on a loaded table.
+
+        Args:
+            conn (sqlite3.Connection): Connection holding the table
+            table_name (str): Table to index
+            loaded_columns (list): Columns present in the table
+
+        Returns:
+            float: Seconds spent building indexes
+        """
+        loaded = set(loaded_columns)
+        wanted = [col for col in self.key_columns(table_name) + self.hot_columns(table_name) if col in loaded]
+        if not wanted:
+            return 0.0
+
+        # index name -> table; a replaced table kept for an open result stream
+        # holds on to its index names until it is dropped
+        taken = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'").fetchall())
+        indexed = set()
+        for name, table in taken.items():
+            if table == table_name:
+                indexed.update(row[2] for row in conn.execute(f'PRAGMA index_info("{name}")'))
+        start = time.perf_counter()
+        for column in dict.fromkeys(wanted):
+            if column in indexed:
+                continue
+            index_name = f"idx_{table_name}_{column}"
+            suffix = 0
+            while index_name in taken:
+                suffix += 1
+                index_name = f"idx_{table_name}_{column}_{suffix}"
+            conn.execute(f'CREATE INDEX "{index_name}" ON "{table_name}" ("{column}")')
+            taken[index_name] = table_name
+            print(f"Created index {index_name}")
+        conn.commit()
+        return time.perf_counter() - start
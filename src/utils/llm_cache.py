@@ -0,0 +1,183 @@
+# src/utils/llm_cache.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+class LLMCache:
+    """
+    Disk-backed exact-match cache of generated SQL.
+
+    Entries are keyed by the normalized question, a hash of the schema text,
+    the user role and the model URL, so a schema or model change never serves
+    stale SQL. Entries expire after a TTL and the least recently used ones are
+    evicted beyond max_entries.
+    """
+
+    def __init__(self, cache_path=None, ttl_seconds=None, max_entries=None, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_path (str, optional): SQLite file holding the cache.
+                                        Defaults to LLM_CACHE_PATH or ./output/llm_cache.db.
+            ttl_seconds (float, optional): Seconds an entry stays valid.
+                                           Defaults to LLM_CACHE_TTL or 604800 (one week).
+            max_entries (int, optional): Most entries kept. Defaults to LLM_CACHE_MAX_ENTRIES or 10000.
+            enabled (bool, optional): Use the cache. Defaults to LLM_CACHE or True.
+        """
+        if enabled is None:
+            enabled = os.getenv("LLM_CACHE", "true").lower() == "true"
+        if cache_path is None:
+            cache_path = os.getenv("LLM_CACHE_PATH", "./output/llm_cache.db")
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("LLM_CACHE_TTL", "604800"))
+        if max_entries is None:
+            max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.enabled = enabled
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        # saved_seconds adds up the original generation latency of every hit
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "saved_seconds": 0.0}
+        self._lock = threading.Lock()
+        self.conn = None
+        if self.enabled:
+            directory = os.path.dirname(os.path.abspath(cache_path))
+            os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, sql TEXT NOT NULL, latency REAL NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups served from the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def make_key(self, question, schema_text, user_role, model_url):
+        """
+        Build the cache key for a generation request.
+
+        Args:
+            question (str): Natural language question
+            schema_text (str): Database schema in text format
+            user_role (str): User role
+            model_url (str): Inference endpoint
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps({
+            "question": normalize_question(question),
+            "scope": request_scope(schema_text, user_role, model_url),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up generated SQL.
+
+        Args:
+            key (str): Key from make_key()
+
+        Returns:
+            str or None: Cached SQL, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT sql, latency, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += row[1]
+            return row[0]
+
+    def put(self, key, sql, latency):
+        """
+        Store generated SQL.
+
+        Error results are never stored, so a failed call is retried next time.
+
+        Args:
+            key (str): Key from make_key()
+            sql (str): Generated SQL
+            latency (float): Seconds the generation took
+        """
+        if not self.enabled or not is_cacheable(sql):
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, sql, latency, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, sql, latency, now, now)
+            )
+            excess = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self.stats["evictions"] += excess
+            self.conn.commit()
+
+    def __len__(self):
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self):
+        """Remove every cached entry."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            self.enabled = False
+
+def request_scope(schema_text, user_role, model_url):
+    """
+    Identify everything besides the question that shapes the generated SQL.
+
+    Returns:
+        str: Hex digest of the schema text, user role and model URL
+    """
+    payload = json.dumps({
+        "schema": hashlib.sha256(schema_text.encode("utf-8")).hexdigest(),
+        "role": " ".join(user_role.lower().split()),
+        "model": model_url,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def normalize_question(question):
+    """Lowercase a question and drop whitespace and trailing punctuation differences."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+def is_cacheable(sql):
+    """Check that a generation result is SQL rather than an error message."""
+    return bool(sql and sql.strip()) and not sql.startswith("Error:")
@@ -1,84 +1,385 @@
 # src/utils/query_executor.py
 
 import pandas as pd
-import sqlite3
-from contextlib import closing
 import os
+import time
+from src.utils.table_catalog import TableCatalog
+from src.utils.csv_loader import CSVLoader
+from src.utils.index_advisor import IndexAdvisor
+from src.utils.result_cache import ResultCache
+from src.utils.result_stream import ResultStream
+from src.utils.fingerprint import file_fingerprint
+from src.utils.schema_definitions import SchemaDefinition
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import get_tracer
+from src.utils.sql_parser import base_tables, canonical_sql, is_deterministic, predicate_columns, referenced_columns
 
 class QueryExecutor:
-    """Execute SQL queries against CSV files using an in-memory SQLite database."""
+    """Execute SQL queries against CSV files using a long-lived SQLite table catalog."""
     
-    def __init__(self, data_dir=None):
+    def __init__(self, data_dir=None, catalog=None, schema_def=None, column_pruning=None, result_cache=None,
+                 timeout=None, max_rows=None, single_flight=None):
         """
         Initialize the QueryExecutor.
         
         Args:
             data_dir (str, optional): Directory containing CSV files
+            catalog (TableCatalog, optional): Catalog holding the resident tables.
+                                              A new one is created if not provided.
+            schema_def (SchemaDefinition, optional): Schema used to type and index loaded columns
+            column_pruning (bool, optional): Only load the columns a query references.
+                                             Defaults to COLUMN_PRUNING or True.
+            result_cache (ResultCache, optional): Cache of query results. A new one is
+                                                  created if not provided.
+            timeout (float, optional): Seconds a query may run before it is aborted.
+                                       Defaults to QUERY_TIMEOUT or 30; 0 disables it.
+            max_rows (int, optional): Largest result a query may return before it is aborted.
+                                      Defaults to QUERY_MAX_ROWS or 1000000; 0 disables it.
+            single_flight (SingleFlight, optional): Lets concurrent identical queries share one
+                                                    execution. A new one is created if not provided.
         """
         if data_dir is None:
             # Default to a 'data' directory in the project root
             data_dir = os.getenv("DATA_DIR", "./data")
         self.data_dir = data_dir
+        self.catalog = catalog or TableCatalog()
+        schema_def = schema_def or SchemaDefinition()
+        self.loader = CSVLoader(schema_def)
+        self.index_advisor = IndexAdvisor(schema_def)
+        if column_pruning is None:
+            column_pruning = os.getenv("COLUMN_PRUNING", "true").lower() == "true"
+        self.column_pruning = column_pruning
+        self.result_cache = result_cache or ResultCache()
+        if timeout is None:
+            timeout = float(os.getenv("QUERY_TIMEOUT", "30"))
+        if max_rows is None:
+            max_rows = int(os.getenv("QUERY_MAX_ROWS", "1000000"))
+        self.timeout = timeout or None
+        self.max_rows = max_rows or None
+        self.single_flight = single_flight or SingleFlight()
+        
+        # Seconds spent loading tables, building indexes and running the last query
+        self.last_timings = {}
+        # Outcome of the last query: {"status": "ok" | "aborted" | "error", "reason": ...}
+        self.last_status = {}
+    
+    def _resolve_path(self, file_path):
+        """Resolve a CSV path relative to the data directory."""
+        if not os.path.isabs(file_path) and not file_path.startswith(self.data_dir):
+            file_path = os.path.join(self.data_dir, file_path)
+        return os.path.abspath(file_path)
     
-    def load_csv(self, file_path, table_name=None):
+    def load_csv(self, file_path, table_name=None, columns=None):
         """
-        Load a CSV file into a pandas DataFrame.
+        Load a CSV file into a pandas DataFrame, typed from the table's declared schema.
         
         Args:
             file_path (str): Path to the CSV file
             table_name (str, optional): Name to use for the table in SQL queries
+            columns (list, optional): Only load these columns. Loads all columns if None.
             
         Returns:
             pandas.DataFrame: Loaded data
         """
         # If file_path doesn't include the data_dir, prepend it
-        if not os.path.isabs(file_path) and not file_path.startswith(self.data_dir):
-            file_path = os.path.join(self.data_dir, file_path)
+        file_path = self._resolve_path(file_path)
         
         # Load the CSV
         try:
-            df = pd.read_csv(file_path)
+            df = self.loader.read(file_path, table_name, columns)
             print(f"Loaded {len(df)} rows from {file_path}")
             return df
         except Exception as e:
             print(f"Error loading CSV file {file_path}: {e}")
             return pd.DataFrame()
     
-    def execute_query(self, sql_query, csv_files=None):
+    def open_csv(self, file_path, table_name=None, columns=None):
+        """
+        Open a CSV file for ingestion into the catalog.
+        
+        Files too large for the ingestion memory budget are streamed in chunks.
+        
+        Args:
+            file_path (str): Path to the CSV file
+            table_name (str, optional): Name to use for the table in SQL queries
+            columns (list, optional): Only load these columns. Loads all columns if None.
+            
+        Returns:
+            pandas.DataFrame or iterator: Loaded data or an iterator of chunks
+        """
+        file_path = self._resolve_path(file_path)
+        try:
+            return self.loader.open(file_path, table_name, columns)
+        except Exception as e:
+            print(f"Error loading CSV file {file_path}: {e}")
+            return pd.DataFrame()
+    
+    def execute_query(self, sql_query, csv_files=None, timeout=None, max_rows=None, cancel_token=None):
         """
         Execute an SQL query against one or more CSV files.
         
+        Queries that run past the timeout, return more than max_rows rows or are
+        cancelled stop early; the returned frame then holds the rows fetched so far
+        and its attrs["status"] records why.
+        
+        An identical query (up to formatting, against the same files and with the
+        same limits) asked while one is running waits for that one's result instead
+        of running again. Queries with a cancel token always run on their own, so
+        cancelling one never aborts another caller's query.
+        
         Args:
             sql_query (str): SQL query to execute
             csv_files (dict, optional): Dictionary mapping table names to CSV file paths.
                                        If None, will try to infer from the query.
+                                       Tables the query does not read are not loaded.
+            timeout (float, optional): Overrides the executor's timeout for this query
+            max_rows (int, optional): Overrides the executor's row cap for this query
+            cancel_token (CancelToken, optional): Token that aborts the query when triggered
             
         Returns:
             pandas.DataFrame: Query results
         """
+        if cancel_token is not None or not is_deterministic(sql_query):
+            return self._execute_query(sql_query, csv_files, timeout, max_rows, cancel_token)
+        key = (canonical_sql(sql_query), tuple(sorted((csv_files or {}).items())), timeout, max_rows)
+        result, shared = self.single_flight.do(
+            key, lambda: self._execute_query(sql_query, csv_files, timeout, max_rows)
+        )
+        if shared:
+            print(f"Shared the result of an identical query in flight: {len(result)} rows")
+            self.last_status = dict(result.attrs["status"])
+            # Every caller gets a frame of its own
+            result = result.copy()
+        return result
+    
+    def _execute_query(self, sql_query, csv_files=None, timeout=None, max_rows=None, cancel_token=None):
+        start = time.perf_counter()
+        stream, cache_hit = self._open_stream(sql_query, csv_files, None, timeout, max_rows, cancel_token)
+        with get_tracer().span("sql_fetch") as span:
+            result = stream.collect()
+            span.set(rows=len(result), status=stream.status)
+        if not cache_hit:
+            if stream.status == "ok":
+                print(f"Query returned {len(result)} rows")
+            self._finish_timings(time.perf_counter() - start)
+        
+        self.last_status = {"status": stream.status, "reason": stream.reason or stream.error}
+        result.attrs["status"] = dict(self.last_status)
+        return result
+    
+    def execute_query_iter(self, sql_query, csv_files=None, chunksize=None, timeout=None, max_rows=None,
+                           cancel_token=None):
+        """
+        Execute an SQL query and return its result as a stream of DataFrame chunks.
+        
+        Rows are fetched from SQLite as the stream is consumed, so large results
+        are never materialized in full. Results that stay within the result cache
+        budget are cached once the stream has been read to the end. The stream's
+        status reports whether a guardrail aborted the query.
+        
+        Args:
+            sql_query (str): SQL query to execute
+            csv_files (dict, optional): Dictionary mapping table names to CSV file paths.
+                                       If None, will try to infer from the query.
+            chunksize (int, optional): Rows per chunk. Defaults to RESULT_CHUNK_ROWS or 10000.
+            timeout (float, optional): Overrides the executor's timeout for this query
+            max_rows (int, optional): Overrides the executor's row cap for this query
+            cancel_token (CancelToken, optional): Token that aborts the query when triggered
+            
+        Returns:
+            ResultStream: Lazily fetched query results
+        """
+        start = time.perf_counter()
+        stream, cache_hit = self._open_stream(sql_query, csv_files, chunksize, timeout, max_rows, cancel_token)
+        if not cache_hit:
+            # Only the time to the first row is known up front
+            self._finish_timings(time.perf_counter() - start)
+        self.last_status = {"status": stream.status, "reason": stream.reason or stream.error}
+        return stream
+    
+    def prefetch(self, table_names, csv_files=None, cancel_token=None):
+        """
+        Load and index tables ahead of the query that will read them.
+        
+        Tables are loaded whole, so whatever columns the query turns out to need
+        are already resident, and one at a time, so cancelling stops the ones
+        that have not started. A query prepared meanwhile waits on the catalog
+        lock for the table in progress and then reuses it.
+        
+        Args:
+            table_names (list): Tables to load, most likely first
+            csv_files (dict, optional): Dictionary mapping table names to CSV file paths.
+                                       Defaults to a CSV named after each table.
+            cancel_token (CancelToken, optional): Token that stops prefetching further tables
+            
+        Returns:
+            list: Tables that were loaded or already resident
+        """
+        csv_files = csv_files or {}
+        with get_tracer().span("prefetch", tables=list(table_names)) as span:
+            loaded = self._prefetch(table_names, csv_files, cancel_token)
+            span.set(loaded=loaded)
+        return loaded
+    
+    def close(self):
+        """Close the catalog holding the loaded tables."""
+        self.catalog.close()
+    
+    def _prefetch(self, table_names, csv_files, cancel_token):
+        loaded = []
+        for table_name in table_names:
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            file_path = self._resolve_path(csv_files.get(table_name, f"{table_name}.csv"))
+            if not os.path.exists(file_path):
+                continue
+            try:
+                with self.catalog.lock:
+                    self.catalog.ensure_table(table_name, file_path, self.open_csv)
+                    entry = self.catalog.tables.get(table_name)
+                    if entry:
+                        columns = entry["columns"] or self._headers({table_name: file_path}).get(table_name, [])
+                        self.index_advisor.ensure_indexes(self.catalog.conn, table_name, columns)
+                        loaded.append(table_name)
+            except Exception as e:
+                # The query loads the table itself if it needs it
+                print(f"Error prefetching table '{table_name}': {e}")
+        return loaded
+    
+    def _open_stream(self, sql_query, csv_files, chunksize, timeout, max_rows, cancel_token):
+        """
+        Prepare the query's tables and open a result stream over it.
+        
+        Returns:
+            tuple: (ResultStream, whether the result came from the result cache)
+        """
+        try:
+            fingerprints, cacheable, cached = self._prepare(sql_query, csv_files)
+        except Exception as e:
+            # A table that cannot be loaded fails this query, not the caller
+            self.last_timings = {"load": 0.0, "index": 0.0}
+            return ResultStream.from_error(e, chunksize), False
+        if cached is not None:
+            get_tracer().annotate(result_cache="hit")
+            return ResultStream.from_frame(cached, chunksize), True
+        
+        # Time spent in _prepare is not counted against the query timeout
+        on_complete = None
+        if cacheable and self.result_cache.enabled:
+            on_complete = lambda df: self.result_cache.put(sql_query, fingerprints, df)
+        # SQLite runs the query up to its first row here; the rest is fetched as the stream is read
+        with get_tracer().span("sql_execute") as span:
+            stream = ResultStream(self.catalog.conn, self.catalog.lock, sql_query, chunksize,
+                                  on_complete=on_complete, retain_bytes=self.result_cache.max_bytes,
+                                  timeout=self.timeout if timeout is None else timeout or None,
+                                  max_rows=self.max_rows if max_rows is None else max_rows or None,
+                                  cancel_token=cancel_token)
+            span.set(status=stream.status, columns=len(stream.columns))
+        return stream, False
+    
+    def _prepare(self, sql_query, csv_files):
+        """
+        Resolve, load and index the tables a query reads.
+        
+        Args:
+            sql_query (str): SQL query to execute
+            csv_files (dict, optional): Dictionary mapping table names to CSV file paths
+            
+        Returns:
+            tuple: (fingerprints, cacheable, cached result or None)
+        """
         if csv_files is None:
             csv_files = self._infer_tables_from_query(sql_query)
+        else:
+            used = {table.lower() for table in base_tables(sql_query)}
+            csv_files = {name: path for name, path in csv_files.items() if name.lower() in used}
+        
+        paths = {table_name: self._resolve_path(file_path) for table_name, file_path in csv_files.items()}
         
-        # Create an in-memory SQLite database
-        with closing(sqlite3.connect(':memory:')) as conn:
-            # Load each CSV file into a table
-            for table_name, file_path in csv_files.items():
-                df = self.load_csv(file_path)
-                df.to_sql(table_name, conn, index=False, if_exists='replace')
+        # Serve repeated questions from the result cache while their sources are unchanged
+        fingerprints = self._fingerprints(paths)
+        cacheable = fingerprints is not None and is_deterministic(sql_query)
+        if cacheable:
+            cached = self.result_cache.get(sql_query, fingerprints)
+            if cached is not None:
+                self.last_timings = {"load": 0.0, "index": 0.0, "query": 0.0}
+                print(f"Result cache hit: {len(cached)} rows")
+                return fingerprints, cacheable, cached
+        
+        headers = self._headers(paths)
+        needed = referenced_columns(sql_query, headers) if self.column_pruning else {}
+        self.index_advisor.record(predicate_columns(sql_query, headers))
+        
+        tracer = get_tracer()
+        with self.catalog.lock:
+            # Load each CSV file into the catalog, reusing tables that are still current
+            start = time.perf_counter()
+            with tracer.span("csv_load", tables=sorted(paths)) as span:
+                reloaded = [table_name for table_name, file_path in paths.items()
+                            if self.catalog.ensure_table(table_name, file_path, self.open_csv, needed.get(table_name))]
+                span.set(reloaded=reloaded)
+            load_time = time.perf_counter() - start
+            
+            # Index schema keys and hot predicate columns of the loaded tables
+            index_time = 0.0
+            with tracer.span("index_build"):
+                for table_name in paths:
+                    entry = self.catalog.tables.get(table_name)
+                    if entry:
+                        loaded = entry["columns"] or headers.get(table_name, [])
+                        index_time += self.index_advisor.ensure_indexes(self.catalog.conn, table_name, loaded)
+        
+        self.last_timings = {"load": load_time, "index": index_time}
+        return fingerprints, cacheable, None
+    
+    def _finish_timings(self, elapsed):
+        """Record the query time next to the load and index times and report them."""
+        query_time = max(elapsed - self.last_timings["load"] - self.last_timings["index"], 0.0)
+        self.last_timings["query"] = query_time
+        print(f"Load {self.last_timings['load']:.3f}s, index build {self.last_timings['index']:.3f}s, "
+              f"query {query_time:.3f}s")
+    
+    def _fingerprints(self, paths):
+        """
+        Fingerprint each table's source file.
+        
+        Args:
+            paths (dict): Mapping of table names to resolved CSV paths
+            
+        Returns:
+            dict or None: Mapping of table names to fingerprints, or None if a
+                          source file cannot be read
+        """
+        try:
+            return {table_name: file_fingerprint(file_path) for table_name, file_path in paths.items()}
+        except OSError:
+            return None
+    
+    def _headers(self, paths):
+        """
+        Read the column names of each table's CSV file.
+        
+        Args:
+            paths (dict): Mapping of table names to resolved CSV paths
             
-            # Execute the query
+        Returns:
+            dict: Mapping of table names to column lists
+        """
+        headers = {}
+        for table_name, file_path in paths.items():
             try:
-                result = pd.read_sql_query(sql_query, conn)
-                print(f"Query returned {len(result)} rows")
-                return result
-            except Exception as e:
-                print(f"Error executing query: {e}")
-                return pd.DataFrame()
+                headers[table_name] = self.loader.header(file_path)
+            except Exception:
+                # Missing or unreadable files are reported when the table is loaded
+                continue
+        return headers
     
     def _infer_tables_from_query(self, sql_query):
         """
-        Attempt to infer which tables are needed based on the SQL query.
-        This is a simple implementation and might need to be enhanced.
+        Infer which tables are needed based on the SQL query.
+        
+        CTE names, subquery aliases and table-valued functions are not tables,
+        so they are never mapped to CSV files.
         
         Args:
             sql_query (str): SQL query to analyze
@@ -86,42 +387,5 @@ class QueryExecutor:
         Returns:
             dict: Mapping of table names to file paths
         """
-        # Simple implementation - looks for table names in the query
-        # This won't handle all cases correctly but works for basic queries
-        tables = {}
-        
-        # Common keywords followed by table names
-        keywords = ['FROM', 'JOIN', 'INTO', 'UPDATE']
-        
-        # Convert to uppercase for case-insensitive matching
-        query_upper = sql_query.upper()
-        
-        for keyword in keywords:
-            # Find all occurrences of the keyword
-            start_idx = 0
-            while True:
-                idx = query_upper.find(f" {keyword} ", start_idx)
-                if idx == -1:
-                    break
-                
-                # Extract the table name - this is a simplified approach
-                start_pos = idx + len(keyword) + 2  # +2 for the spaces
-                end_pos = query_upper.find(" ", start_pos)
-                if end_pos == -1:
-                    end_pos = len(query_upper)
-                
-                # Remove any non-alphanumeric characters
-                table_name = query_upper[start_pos:end_pos].strip()
-                table_name = ''.join(c for c in table_name if c.isalnum() or c == '_')
-                
-                if table_name and table_name not in tables:
-                    # Assume there's a CSV file with the same name
-                    tables[table_name.lower()] = f"{table_name.lower()}.csv"
-                
-                start_idx = end_pos
-        
-        # Default to 'sales.csv' if no tables found
-        if not tables:
-            tables['sales'] = 'sales.csv'
-        
-        return tables
\ No newline at end of file
+        # Assume there's a CSV file named after each base table
+        return {table.lower(): f"{table.lower()}.csv" for table in base_tables(sql_query)}
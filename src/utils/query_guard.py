@@ -0,0 +1,81 @@
+# src/utils/query_guard.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Number of SQLite virtual machine instructions between guard checks
+PROGRESS_INTERVAL = 10000
+
+class CancelToken:
+    """Handle a caller can use to cancel a running query from another thread."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Request cancellation. The query stops at its next progress check."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+class QueryGuard:
+    """
+    Wall-clock timeout and cancellation for queries on an SQLite connection.
+
+    The guard is installed as the connection's progress handler, which SQLite
+    calls every PROGRESS_INTERVAL instructions; returning non-zero interrupts
+    the running statement with an OperationalError.
+
+    The timeout is a budget for the time spent inside SQLite: each installed()
+    block adds its duration to the total, so time the caller spends between
+    fetches, rendering a chart for instance, does not count against the query.
+    """
+
+    def __init__(self, timeout=None, cancel_token=None):
+        """
+        Initialize the guard.
+
+        Args:
+            timeout (float, optional): Seconds the query may spend in SQLite. No limit if None or 0.
+            cancel_token (CancelToken, optional): Token that cancels the query when triggered
+        """
+        self.timeout = timeout or None
+        self.cancel_token = cancel_token
+        self.reason = None
+        # Seconds spent in finished installed() blocks, and when the current one started
+        self.elapsed = 0.0
+        self._started = None
+
+    def check(self):
+        """
+        Check whether the query must stop.
+
+        Returns:
+            str or None: "cancelled" or "timeout", or None to keep running
+        """
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            self.reason = "cancelled"
+        elif self.timeout is not None and self._spent() > self.timeout:
+            self.reason = "timeout"
+        return self.reason
+
+    @contextmanager
+    def installed(self, conn):
+        """Run the enclosed statements with the guard as the progress handler, charging their time to the budget."""
+        conn.set_progress_handler(lambda: 1 if self.check() else 0, PROGRESS_INTERVAL)
+        self._started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.elapsed += time.monotonic() - self._started
+            self._started = None
+            conn.set_progress_handler(None, 0)
+
+    def _spent(self):
+        """Seconds charged to the query so far, including the running call."""
+        if self._started is None:
+            return self.elapsed
+        return self.elapsed + time.monotonic() - self._started
@@ -0,0 +1,268 @@
+# src/utils/result_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import pandas as pd
+from src.utils.columnar_cache import read_frame, write_frame
+from src.utils.sql_parser import canonical_sql
+
+class ResultCache:
+    """
+    LRU cache of query results keyed by canonical SQL and source table fingerprints.
+
+    Entries live in memory up to a byte budget. With a cache directory configured,
+    results are also written to disk in the columnar cache format and survive
+    restarts; results whose columns that format cannot hold unchanged stay in
+    memory only. Every entry remembers
+    the fingerprints of the tables it read, so a changed CSV evicts exactly the
+    entries that depend on it.
+    """
+
+    def __init__(self, max_mb=None, cache_dir=None, max_disk_mb=None, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_mb (float, optional): Memory budget. Defaults to RESULT_CACHE_MB or 64.
+            cache_dir (str, optional): Directory for the on-disk tier. Defaults to
+                                       RESULT_CACHE_DIR; no disk tier if unset.
+            max_disk_mb (float, optional): Disk budget. Defaults to RESULT_CACHE_DISK_MB or 512.
+            enabled (bool, optional): Use the cache. Defaults to RESULT_CACHE or True.
+        """
+        if enabled is None:
+            enabled = os.getenv("RESULT_CACHE", "true").lower() == "true"
+        if max_mb is None:
+            max_mb = float(os.getenv("RESULT_CACHE_MB", "64"))
+        if cache_dir is None:
+            cache_dir = os.getenv("RESULT_CACHE_DIR")
+        if max_disk_mb is None:
+            max_disk_mb = float(os.getenv("RESULT_CACHE_DISK_MB", "512"))
+        self.enabled = enabled
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+
+        # key -> {"df": DataFrame, "bytes": int, "tables": {table: fingerprint}}
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        # key -> {"bytes": int, "tables": {table: fingerprint}}, oldest first
+        self.disk_entries = OrderedDict()
+        self.disk_bytes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        # table -> fingerprint seen on the last lookup, to skip scans while nothing changes
+        self.table_versions = {}
+        self._lock = threading.RLock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def make_key(self, sql_query, fingerprints):
+        """
+        Build the cache key for a query.
+
+        Args:
+            sql_query (str): SQL query
+            fingerprints (dict): Mapping of table name to source file fingerprint
+
+        Returns:
+            str: Hex digest identifying the query and the data it reads
+        """
+        payload = json.dumps({"sql": canonical_sql(sql_query), "tables": fingerprints}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, sql_query, fingerprints):
+        """
+        Look up a cached result.
+
+        Args:
+            sql_query (str): SQL query
+            fingerprints (dict): Current fingerprints of the tables the query reads
+
+        Returns:
+            pandas.DataFrame or None: Cached result, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.invalidate_stale(fingerprints)
+            key = self.make_key(sql_query, fingerprints)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["df"].copy(deep=False)
+
+            df = self._read_disk(key)
+            if df is not None:
+                self.stats["disk_hits"] += 1
+                self._store_memory(key, df, fingerprints)
+                return df.copy(deep=False)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, sql_query, fingerprints, df):
+        """
+        Store a query result.
+
+        Args:
+            sql_query (str): SQL query
+            fingerprints (dict): Fingerprints of the tables the result was computed from
+            df (pandas.DataFrame): Query result
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            key = self.make_key(sql_query, fingerprints)
+            self._store_memory(key, df, fingerprints)
+            self._write_disk(key, df, fingerprints)
+
+    def invalidate_stale(self, fingerprints):
+        """
+        Drop every entry built from an older version of one of these tables.
+
+        Args:
+            fingerprints (dict): Current fingerprints by table name
+        """
+        with self._lock:
+            changed = [table for table, fingerprint in fingerprints.items()
+                       if self.table_versions.get(table) != fingerprint]
+            if not changed:
+                return
+            for table in changed:
+                self.table_versions[table] = fingerprints[table]
+            for key, entry in list(self.entries.items()):
+                if _is_stale(entry["tables"], fingerprints):
+                    self._drop_memory(key)
+                    self.stats["invalidations"] += 1
+            for key, entry in list(self.disk_entries.items()):
+                if _is_stale(entry["tables"], fingerprints):
+                    self._drop_disk(key)
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        """Remove every cached result from memory and disk."""
+        with self._lock:
+            for key in list(self.entries):
+                self._drop_memory(key)
+            for key in list(self.disk_entries):
+                self._drop_disk(key)
+
+    def _store_memory(self, key, df, fingerprints):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop_memory(key)
+        self.entries[key] = {"df": df, "bytes": size, "tables": fingerprints}
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop_memory(oldest)
+            self.stats["evictions"] += 1
+
+    def _drop_memory(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["bytes"]
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base, f"{base}.json"
+
+    def _write_disk(self, key, df, fingerprints):
+        if not self.cache_dir or key in self.disk_entries or not _storable(df):
+            return
+        data_dir, meta_path = self._paths(key)
+        # Left behind by an interrupted write
+        shutil.rmtree(data_dir, ignore_errors=True)
+        try:
+            write_frame(df, data_dir)
+            with open(meta_path, "w") as f:
+                json.dump({"tables": fingerprints}, f)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error writing result cache entry: {e}")
+            self._drop_disk(key)
+            return
+        self._add_disk(key, _disk_size(data_dir), fingerprints)
+        while self.disk_bytes > self.max_disk_bytes:
+            self._drop_disk(next(iter(self.disk_entries)))
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key):
+        if key not in self.disk_entries:
+            return None
+        data_dir, _ = self._paths(key)
+        try:
+            df = read_frame(data_dir)
+        except (OSError, ValueError, KeyError):
+            df = None
+        if df is None:
+            self._drop_disk(key)
+            return None
+        # Text comes back dictionary-encoded; restore plain strings
+        for name in df.columns:
+            if isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = df[name].astype(object)
+        self.disk_entries.move_to_end(key)
+        # Copied out of the memory-mapped files, which eviction deletes
+        return df.copy()
+
+    def _add_disk(self, key, size, fingerprints):
+        self.disk_entries[key] = {"bytes": size, "tables": fingerprints}
+        self.disk_bytes += size
+
+    def _drop_disk(self, key):
+        entry = self.disk_entries.pop(key, None)
+        if entry is not None:
+            self.disk_bytes -= entry["bytes"]
+        data_dir, meta_path = self._paths(key)
+        shutil.rmtree(data_dir, ignore_errors=True)
+        try:
+            os.remove(meta_path)
+        except OSError:
+            pass
+
+    def _load_disk_index(self):
+        """Rebuild the disk index from the metadata files, oldest first."""
+        # Pickled results from older versions are never loaded, since unpickling can run code
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, name))
+        metas = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        metas.sort(key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name)))
+        for name in metas:
+            key = name[:-len(".json")]
+            data_dir, meta_path = self._paths(key)
+            try:
+                with open(meta_path) as f:
+                    tables = json.load(f)["tables"]
+                self._add_disk(key, _disk_size(data_dir), tables)
+            except (OSError, ValueError, KeyError):
+                self._drop_disk(key)
+
+def _is_stale(entry_tables, fingerprints):
+    """Check whether an entry read a table whose fingerprint has since changed."""
+    return any(
+        table in fingerprints and fingerprints[table] != fingerprint
+        for table, fingerprint in entry_tables.items()
+    )
+
+def _storable(df):
+    """Check that the columnar format can hold a result unchanged."""
+    if not df.columns.is_unique or not all(isinstance(name, str) for name in df.columns):
+        return False
+    # Object columns are stored as text, so they may hold nothing else
+    return all(
+        pd.api.types.infer_dtype(df[name], skipna=True) in ("string", "empty")
+        for name in df.columns if df[name].dtype == object
+    )
+
+def _disk_size(data_dir):
+    """Total size of a stored result's column files."""
+    return sum(entry.stat().st_size for entry in os.scandir(data_dir))
@@ -0,0 +1,299 @@
+# src/utils/result_stream.py
+
+import os
+import threading
+import pandas as pd
+from src.utils.query_guard import QueryGuard
+
+class ResultStream:
+    """
+    Lazily fetched query result that yields DataFrame chunks.
+
+    Rows are pulled from an SQLite cursor with fetchmany(), so a large result
+    never has to fit in memory at once. Rows are counted as they are read, so
+    the row count is known once the stream has been read to the end.
+
+    status is "ok" until the query fails ("error") or is stopped by a guardrail
+    ("aborted", with reason "timeout", "cancelled" or "max_rows"). Rows fetched
+    before an abort are still returned.
+    """
+
+    def __init__(self, conn, lock, sql_query, chunksize=None, on_complete=None, retain_bytes=0,
+                 timeout=None, max_rows=None, cancel_token=None):
+        """
+        Start streaming a query.
+
+        Args:
+            conn (sqlite3.Connection): Connection holding the tables
+            lock (threading.RLock): Lock guarding the connection
+            sql_query (str): SQL query to run
+            chunksize (int, optional): Rows per chunk. Defaults to RESULT_CHUNK_ROWS or 10000.
+            on_complete (callable, optional): Called with the full result once the stream
+                                              is exhausted, if it stayed within retain_bytes
+            retain_bytes (int): Largest result to keep for on_complete
+            timeout (float, optional): Wall-clock seconds the query may spend in SQLite,
+                                      summed over its calls; time between fetches is not counted
+            max_rows (int, optional): Stop with an "aborted" status after this many rows
+            cancel_token (CancelToken, optional): Token that aborts the query when triggered
+        """
+        if chunksize is None:
+            chunksize = int(os.getenv("RESULT_CHUNK_ROWS", "10000"))
+        self.conn = conn
+        self.lock = lock
+        self.sql_query = sql_query
+        self.chunksize = chunksize
+        self.on_complete = on_complete
+        self.retain_bytes = retain_bytes
+        self.max_rows = max_rows
+        self.guard = QueryGuard(timeout, cancel_token)
+
+        self.columns = []
+        self.status = "ok"
+        self.reason = None
+        self.error = None
+        self.exhausted = False
+        self.truncated = False
+        self._rows_seen = 0
+        # Set once no more rows will be read, making _rows_seen the row count
+        self._counted = False
+        self._buffer = []
+        self._retained = [] if on_complete else None
+        self._retained_bytes = 0
+        self._cursor = None
+        # Pipeline stages may read the same stream from several threads
+        self._read_lock = threading.RLock()
+
+        if conn is None:
+            return
+        with self.lock:
+            try:
+                with self.guard.installed(conn):
+                    self._cursor = conn.execute(sql_query)
+                self.columns = [col[0] for col in self._cursor.description or []]
+            except Exception as e:
+                self._fail(e)
+
+    @classmethod
+    def from_frame(cls, df, chunksize=None):
+        """
+        Wrap an already materialized DataFrame (e.g. a cached result) as a stream.
+
+        Args:
+            df (pandas.DataFrame): Result data
+            chunksize (int, optional): Rows per chunk
+
+        Returns:
+            ResultStream: Stream over the DataFrame
+        """
+        stream = cls(None, None, None, chunksize)
+        stream.columns = list(df.columns)
+        stream._buffer = [df.iloc[start:start + stream.chunksize]
+                          for start in range(0, len(df), stream.chunksize)]
+        stream.exhausted = True
+        stream._rows_seen = len(df)
+        stream._counted = True
+        return stream
+
+    @classmethod
+    def from_error(cls, error, chunksize=None):
+        """
+        Empty stream with an "error" status, for a query that could not be started.
+
+        Args:
+            error (Exception): What went wrong
+            chunksize (int, optional): Rows per chunk
+
+        Returns:
+            ResultStream: Stream with no rows
+        """
+        stream = cls(None, None, None, chunksize)
+        stream._fail(error)
+        return stream
+
+    def __iter__(self):
+        """Yield the remaining result chunks; each row is produced once."""
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def head(self, n=10):
+        """
+        Return the first n rows without consuming them from the stream.
+
+        Args:
+            n (int): Number of rows
+
+        Returns:
+            pandas.DataFrame: Up to n rows
+        """
+        with self._read_lock:
+            while sum(len(chunk) for chunk in self._buffer) < n and not self.exhausted:
+                chunk = self._fetch()
+                if chunk is None:
+                    break
+                self._buffer.append(chunk)
+            if not self._buffer:
+                return pd.DataFrame(columns=self.columns)
+            return pd.concat(self._buffer, ignore_index=True).head(n)
+
+    def collect(self, max_rows=None):
+        """
+        Materialize the remaining rows as one DataFrame.
+
+        Args:
+            max_rows (int, optional): Stop after this many rows. Sets truncated if more remain.
+
+        Returns:
+            pandas.DataFrame: Collected rows
+        """
+        chunks = []
+        rows = 0
+        for chunk in self:
+            if max_rows is not None and rows + len(chunk) > max_rows:
+                keep = max_rows - rows
+                chunks.append(chunk.iloc[:keep])
+                self._buffer.insert(0, chunk.iloc[keep:])
+                self.truncated = True
+                break
+            chunks.append(chunk)
+            rows += len(chunk)
+            if max_rows is not None and rows == max_rows and self.head(1).shape[0]:
+                self.truncated = True
+                break
+        if not chunks:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(chunks, ignore_index=True)
+
+    def count(self):
+        """
+        Total number of rows in the result, if it is known.
+
+        The query is not run again to count it: the count is the number of rows
+        read, known once the stream has been read to the end. A stream that was
+        aborted or failed reports the rows it delivered.
+
+        Returns:
+            int or None: Row count, or None while rows remain unread
+        """
+        return self._rows_seen if self._counted else None
+
+    def close(self):
+        """Release the underlying cursor."""
+        if self._cursor is not None:
+            with self.lock:
+                self._cursor.close()
+            self._cursor = None
+        self.exhausted = True
+        self._buffer = []
+
+    def _next_chunk(self):
+        with self._read_lock:
+            if self._buffer:
+                return self._buffer.pop(0)
+            if self.exhausted:
+                return None
+            return self._fetch()
+
+    def _fetch(self):
+        """Fetch the next chunk from the cursor, or None when the result is exhausted."""
+        size = self.chunksize
+        if self.max_rows is not None:
+            # One extra row tells a result at the cap apart from one over it
+            size = min(size, self.max_rows - self._rows_seen + 1)
+        try:
+            with self.lock, self.guard.installed(self.conn):
+                rows = self._cursor.fetchmany(size)
+        except Exception as e:
+            self._fail(e)
+            return None
+        if not rows:
+            self._finish()
+            return None
+        if self.max_rows is not None and self._rows_seen + len(rows) > self.max_rows:
+            rows = rows[:self.max_rows - self._rows_seen]
+            self._abort("max_rows")
+            if not rows:
+                return None
+        chunk = pd.DataFrame.from_records(rows, columns=self.columns)
+        self._rows_seen += len(chunk)
+        self._retain(chunk)
+        if len(rows) < size and self.status == "ok":
+            # A short fetch is the last one; no need to ask the cursor again
+            self._finish()
+        return chunk
+
+    def _retain(self, chunk):
+        """Keep small results around so they can be handed to on_complete."""
+        if self._retained is None:
+            return
+        self._retained_bytes += int(chunk.memory_usage(deep=True).sum())
+        if self._retained_bytes > self.retain_bytes:
+            self._retained = None
+            return
+        self._retained.append(chunk)
+
+    def _fail(self, error):
+        """Stop the stream after an SQLite error, telling guardrail interrupts apart."""
+        if self.guard.reason is not None:
+            self._abort(self.guard.reason)
+            return
+        print(f"Error executing query: {error}")
+        self.status = "error"
+        self.error = str(error)
+        self._counted = True
+        self._release()
+
+    def _abort(self, reason):
+        """Stop the stream because a guardrail tripped; partial results are never cached."""
+        print(f"Query aborted: {reason}")
+        self.status = "aborted"
+        self.reason = reason
+        self._counted = True
+        self._retained = None
+        self._release()
+
+    def _release(self):
+        self.exhausted = True
+        if self._cursor is not None:
+            with self.lock:
+                self._cursor.close()
+            self._cursor = None
+
+    def _finish(self):
+        self._counted = True
+        self._release()
+        if self._retained is not None:
+            retained = self._retained
+            self._retained = None
+            if retained:
+                df = pd.concat(retained, ignore_index=True)
+            else:
+                df = pd.DataFrame(columns=self.columns)
+            self.on_complete(df)
+
+def sample_frame(data, max_rows):
+    """
+    Bounded DataFrame view of a query result, for stages that need random access.
+
+    A ResultStream is sampled with head(), so the rows stay available to later
+    consumers of the same stream.
+
+    Args:
+        data (pandas.DataFrame or ResultStream): Query result
+        max_rows (int): Largest number of rows to materialize
+
+    Returns:
+        tuple: (pandas.DataFrame, bool) The rows and whether the result had more
+    """
+    if isinstance(data, pd.DataFrame):
+        return data, False
+    sample = data.head(max_rows + 1)
+    return sample.head(max_rows), len(sample) > max_rows
@@ -54,7 +54,10 @@ class SchemaDefinition:
         schema = self.get_schema(domain)
         if not schema:
             return "No schema found for the specified domain."
-        
+        return self.format_schema(domain, schema)
+    
+    def format_schema(self, domain, schema):
+        """Format a domain schema, or a subset of its tables and columns, as prompt text."""
         text = f"Domain: {domain}\n"
         text += f"Description: {schema.get('description', 'No description available')}\n\n"
         
@@ -77,4 +80,11 @@ class SchemaDefinition:
             for rel in schema.get('relationships'):
                 text += f"  - {rel.get('from_table')}.{rel.get('from_column')} -> {rel.get('to_table')}.{rel.get('to_column')}\n"
         
-        return text
\ No newline at end of file
+        return text
+    
+    def domain_for_text(self, schema_text):
+        """Find the domain whose full schema text this is, or None."""
+        for domain in self.schemas:
+            if self.get_schema_text(domain) == schema_text:
+                return domain
+        return None
@@ -0,0 +1,249 @@
+# src/utils/schema_linker.py
+
+import os
+import re
+import threading
+from collections import deque
+from src.utils.schema_definitions import SchemaDefinition
+
+# Words too common in questions and descriptions to link anything
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "at", "be", "by", "did", "do", "does", "each", "e", "for",
+    "from", "g", "give", "had", "has", "have", "how", "i", "id", "in", "is", "it", "its", "list", "many",
+    "me", "much", "my", "of", "on", "or", "our", "per", "show", "than", "that", "the", "their", "this",
+    "to", "was", "we", "were", "what", "when", "where", "which", "who", "with",
+}
+# Question words -> schema words they usually refer to
+SYNONYMS = {
+    "revenue": ["amount", "sales"], "income": ["amount"], "turnover": ["amount"], "spend": ["amount"],
+    "bought": ["sale", "quantity"], "purchases": ["sale"], "orders": ["sale"], "units": ["quantity"],
+    "clients": ["customer"], "buyers": ["customer"], "items": ["product"],
+    "daily": ["date"], "weekly": ["date"], "monthly": ["date"], "yearly": ["date"], "month": ["date"],
+    "year": ["date"], "quarter": ["date"], "week": ["date"], "day": ["date"], "trend": ["date"],
+    "when": ["date"], "recent": ["date"], "last": ["date"],
+}
+
+class SchemaLinker:
+    """
+    Prune a domain schema down to the tables and columns a question needs.
+
+    Tables and columns are scored by lexical overlap between the question and
+    their names and descriptions, widened by a small synonym table. The
+    relevant tables are completed with the tables on the relationship paths
+    between them, and every kept table keeps its key and join columns, so the
+    LLM still sees how to join what it is given. Tables are kept whole unless
+    they are wider than max_columns, since a question can filter on a column it
+    never names ("laptops" lives in product_name).
+    """
+
+    def __init__(self, schema_def=None, enabled=None, max_tables=None, max_columns=None):
+        """
+        Initialize the linker.
+
+        Args:
+            schema_def (SchemaDefinition, optional): Schema to prune
+            enabled (bool, optional): Prune prompts. Defaults to SCHEMA_LINKING or True.
+            max_tables (int, optional): Most tables linked directly from the question, before join
+                                        paths are added. Defaults to SCHEMA_LINK_MAX_TABLES or 5.
+            max_columns (int, optional): Tables with more columns than this keep only their
+                                         matched, key and join columns.
+                                         Defaults to SCHEMA_LINK_MAX_COLUMNS or 12.
+        """
+        if enabled is None:
+            enabled = os.getenv("SCHEMA_LINKING", "true").lower() == "true"
+        if max_tables is None:
+            max_tables = int(os.getenv("SCHEMA_LINK_MAX_TABLES", "5"))
+        if max_columns is None:
+            max_columns = int(os.getenv("SCHEMA_LINK_MAX_COLUMNS", "12"))
+        self.schema_def = schema_def or SchemaDefinition()
+        self.enabled = enabled
+        self.max_tables = max_tables
+        self.max_columns = max_columns
+
+        # Prompt schema tokens before and after pruning, summed over all prompts
+        self.stats = {"prompts": 0, "full_tokens": 0, "linked_tokens": 0}
+        self._lock = threading.Lock()
+
+    def link(self, question, domain):
+        """
+        Select the part of a domain schema relevant to a question.
+
+        Args:
+            question (str): Natural language question
+            domain (str): Data domain
+
+        Returns:
+            dict or None: Schema in SchemaDefinition's layout holding only the linked
+                          tables, columns and relationships; None if nothing matched
+        """
+        schema = self.schema_def.get_schema(domain)
+        relationships = schema.get("relationships", [])
+        table_scores, column_scores = self._score(question, schema)
+        ranked = self._rank(table_scores)
+        if not ranked:
+            return None
+
+        tables = self._with_join_paths(ranked, relationships)
+        linked_relationships = [
+            rel for rel in relationships if rel.get("from_table") in tables and rel.get("to_table") in tables
+        ]
+        join_columns = {(rel.get("from_table"), rel.get("from_column")) for rel in linked_relationships}
+        join_columns |= {(rel.get("to_table"), rel.get("to_column")) for rel in linked_relationships}
+
+        linked_tables = {}
+        for table_name, table_info in schema.get("tables", {}).items():
+            if table_name not in tables:
+                continue
+            scores = column_scores[table_name]
+            matched = {col for col, score in scores.items() if score > 0}
+            if len(scores) <= self.max_columns or (table_name in ranked and not matched):
+                # Narrow tables, and wide ones named without any of their columns, stay whole
+                matched = set(scores)
+            keep = [
+                col for col in table_info.get("columns", {})
+                if col in matched or col == table_info.get("primary_key") or (table_name, col) in join_columns
+            ]
+            linked_tables[table_name] = dict(table_info, columns={
+                col: table_info["columns"][col] for col in keep
+            })
+        return dict(schema, tables=linked_tables, relationships=linked_relationships)
+
+    def likely_tables(self, question, domain):
+        """
+        Predict the tables a query answering the question will read.
+
+        Args:
+            question (str): Natural language question
+            domain (str): Data domain
+
+        Returns:
+            list: Linked tables, most relevant first, followed by the tables on the
+                  join paths between them; empty if nothing matched
+        """
+        schema = self.schema_def.get_schema(domain)
+        table_scores, _ = self._score(question, schema)
+        ranked = self._rank(table_scores)
+        if not ranked:
+            return []
+        tables = self._with_join_paths(ranked, schema.get("relationships", []))
+        return ranked + [name for name in schema.get("tables", {}) if name in tables and name not in ranked]
+
+    def schema_text(self, question, schema_text):
+        """
+        Prompt schema text for a question.
+
+        Args:
+            question (str): Natural language question
+            schema_text (str): Full schema text of the domain
+
+        Returns:
+            tuple: (schema text to put in the prompt, tokens before, tokens after). The
+                   full text is returned unchanged when its domain is unknown or nothing links.
+        """
+        full_tokens = count_tokens(schema_text)
+        text = schema_text
+        domain = self.schema_def.domain_for_text(schema_text) if self.enabled else None
+        if domain is not None:
+            linked = self.link(question, domain)
+            if linked is not None:
+                text = self.schema_def.format_schema(domain, linked)
+        linked_tokens = count_tokens(text)
+        with self._lock:
+            self.stats["prompts"] += 1
+            self.stats["full_tokens"] += full_tokens
+            self.stats["linked_tokens"] += linked_tokens
+        return text, full_tokens, linked_tokens
+
+    def _score(self, question, schema):
+        """
+        Score a schema's tables and columns by their overlap with the question.
+
+        Returns:
+            tuple: (table name -> score, table name -> {column name -> score})
+        """
+        relationships = schema.get("relationships", [])
+        keys = {(rel.get("from_table"), rel.get("from_column")) for rel in relationships}
+        keys |= {(rel.get("to_table"), rel.get("to_column")) for rel in relationships}
+        words = question_words(question)
+        table_scores = {}
+        column_scores = {}
+        for table_name, table_info in schema.get("tables", {}).items():
+            name_score = 2.0 * len(words & _name_words(table_name))
+            # Key columns are kept with their table anyway; scoring them would link
+            # every table that merely references the one the question is about
+            scores = {
+                col_name: 0.0 if col_name == table_info.get("primary_key") or (table_name, col_name) in keys
+                else 2.0 * len(words & _name_words(col_name))
+                + 0.5 * len(words & _text_words(col_info.get("description", "")))
+                for col_name, col_info in table_info.get("columns", {}).items()
+            }
+            column_scores[table_name] = scores
+            table_scores[table_name] = name_score + sum(scores.values())
+        return table_scores, column_scores
+
+    def _rank(self, table_scores):
+        """Tables that matched the question, best first, at most max_tables of them."""
+        matched = [name for name, score in table_scores.items() if score > 0]
+        return sorted(matched, key=lambda name: -table_scores[name])[:self.max_tables]
+
+    def _with_join_paths(self, tables, relationships):
+        """Add the tables on the shortest relationship paths connecting the linked tables."""
+        graph = {}
+        for rel in relationships:
+            graph.setdefault(rel.get("from_table"), set()).add(rel.get("to_table"))
+            graph.setdefault(rel.get("to_table"), set()).add(rel.get("from_table"))
+
+        result = set(tables)
+        anchor = tables[0]
+        for target in tables[1:]:
+            # Breadth-first search from the best table to each other one
+            previous = {anchor: None}
+            queue = deque([anchor])
+            while queue and target not in previous:
+                node = queue.popleft()
+                for neighbour in graph.get(node, ()):
+                    if neighbour not in previous:
+                        previous[neighbour] = node
+                        queue.append(neighbour)
+            node = target if target in previous else None
+            while node is not None:
+                result.add(node)
+                node = previous[node]
+        return result
+
+def question_words(question):
+    """Content words of a question, singularized and expanded with synonyms."""
+    words = _text_words(question)
+    for word in list(words):
+        words.update(SYNONYMS.get(word, ()))
+    return words
+
+def count_tokens(text):
+    """
+    Approximate the LLM token count of a text.
+
+    Counts punctuation marks as one token each and words as one token per
+    four characters, which tracks BPE tokenizers closely enough for comparing
+    prompt sizes without a model-specific tokenizer.
+    """
+    return sum(max(1, (len(piece) + 3) // 4) for piece in re.findall(r"\w+|[^\w\s]", text))
+
+def _text_words(text):
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        words.add(word)
+        words.add(_singular(word))
+    return words
+
+def _name_words(name):
+    parts = name.lower().split("_")
+    return set(parts) | {_singular(part) for part in parts}
+
+def _singular(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
@@ -0,0 +1,303 @@
+# src/utils/semantic_cache.py
+
+import difflib
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+
+TOKEN_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:\.\d+)?|\w+")
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?$")
+SQL_STRING_RE = re.compile(r"'((?:[^']|'')*)'")
+
+# Posting lists longer than this are skipped when collecting candidates; such
+# features are too common to tell questions apart and would dominate lookup time
+MAX_POSTINGS = 2000
+# Candidates scored exactly after the inverted index pass
+CANDIDATES = 20
+
+class SemanticCache:
+    """
+    In-memory similarity index over previously answered questions.
+
+    Questions are represented by word, word-bigram and character trigram
+    features weighted by IDF. Lookups collect candidates from an inverted index
+    of the rarer features and score them by cosine similarity, so their cost
+    follows the length of the posting lists rather than the number of cached
+    questions. A match above the threshold returns the cached SQL with the
+    question's literals (numbers, quoted strings and values that appear as SQL
+    literals, such as a region) replaced by the new question's, provided the
+    two questions differ in nothing but those literals.
+
+    Values seen as string literals in cached SQL are treated like numbers when
+    comparing questions, so "North" and "South" count as the same feature once
+    both have been seen.
+    """
+
+    def __init__(self, threshold=None, max_entries=None, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold (float, optional): Minimum cosine similarity for a match.
+                                         Defaults to SEMANTIC_CACHE_THRESHOLD or 0.85.
+            max_entries (int, optional): Most questions kept; the oldest are dropped first.
+                                         Defaults to SEMANTIC_CACHE_MAX_ENTRIES or 100000.
+            enabled (bool, optional): Use the cache. Defaults to SEMANTIC_CACHE or True.
+        """
+        if threshold is None:
+            threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        if max_entries is None:
+            max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+        if enabled is None:
+            enabled = os.getenv("SEMANTIC_CACHE", "true").lower() == "true"
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        # Entry id -> {"scope", "tokens", "features", "sql", "slots", "norm"}, None once evicted
+        self.entries = []
+        self.live = 0
+        self.oldest = 0
+        # feature -> array of entry ids, and feature -> number of live entries having it
+        self.postings = {}
+        self.doc_freq = Counter()
+        # Lowercased single-word string literals seen in cached SQL
+        self.values = set()
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.live
+
+    def add(self, question, scope, sql):
+        """
+        Index an answered question.
+
+        Args:
+            question (str): Natural language question
+            scope (str): Identifies the schema, role and model the SQL was generated for
+            sql (str): Generated SQL
+        """
+        if not self.enabled:
+            return
+        tokens = tokenize_question(question)
+        slots = find_slots(tokens, sql)
+        with self._lock:
+            self.values.update(
+                match.group(1).lower() for match in SQL_STRING_RE.finditer(sql) if match.group(1).isalpha()
+            )
+            features = question_features(tokens, self.values)
+            if not features:
+                return
+            entry_id = len(self.entries)
+            self.entries.append({"scope": scope, "tokens": tokens, "features": features, "sql": sql, "slots": slots})
+            self.live += 1
+            for feature in features:
+                posting = self.postings.get(feature)
+                if posting is None:
+                    posting = self.postings[feature] = array("i")
+                posting.append(entry_id)
+                self.doc_freq[feature] += 1
+            while self.live > self.max_entries:
+                self._evict_oldest()
+
+    def lookup(self, question, scope):
+        """
+        Find SQL for a question similar to one answered before.
+
+        Args:
+            question (str): Natural language question
+            scope (str): Identifies the schema, role and model the SQL must be generated for
+
+        Returns:
+            tuple: (SQL with the question's literals substituted, similarity), or (None, best similarity)
+        """
+        if not self.enabled:
+            return None, 0.0
+        tokens = tokenize_question(question)
+        with self._lock:
+            features = question_features(tokens, self.values)
+            if not self.live or not features:
+                self.stats["misses"] += 1
+                return None, 0.0
+            ranked = self._rank(features, scope)
+            best = ranked[0][1] if ranked else 0.0
+            for entry_id, similarity in ranked:
+                if similarity < self.threshold:
+                    break
+                entry = self.entries[entry_id]
+                sql = substitute(entry, tokens)
+                if sql is not None:
+                    self.stats["hits"] += 1
+                    return sql, similarity
+                # The wording was similar but differs in more than the literals of the SQL
+                self.stats["rejected"] += 1
+            self.stats["misses"] += 1
+            return None, best
+
+    def _rank(self, features, scope):
+        """Score the most promising entries of a scope by IDF-weighted cosine similarity."""
+        total = self.live
+        idf = {feature: math.log((total + 1) / (self.doc_freq.get(feature, 0) + 1)) + 1 for feature in features}
+
+        # Collect candidates from the rarest features first
+        usable = sorted((feature for feature in features if feature in self.postings), key=lambda f: self.doc_freq[f])
+        selective = [feature for feature in usable if len(self.postings[feature]) <= MAX_POSTINGS] or usable[:3]
+        if not selective:
+            return []
+        ids = np.concatenate([np.frombuffer(self.postings[feature], dtype=np.int32) for feature in selective])
+        weights = np.concatenate([
+            np.full(len(self.postings[feature]), idf[feature] ** 2) for feature in selective
+        ])
+        unique, inverse = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if len(unique) > CANDIDATES:
+            top = np.argpartition(-scores, CANDIDATES)[:CANDIDATES]
+            unique = unique[top]
+
+        query_norm = math.sqrt(sum(weight * weight for weight in idf.values()))
+        ranked = []
+        for entry_id in unique.tolist():
+            entry = self.entries[entry_id]
+            if entry is None or entry["scope"] != scope:
+                continue
+            dot = sum(idf[feature] ** 2 for feature in features if feature in entry["features"])
+            ranked.append((entry_id, dot / (query_norm * self._norm(entry, total))))
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+
+    def _norm(self, entry, total):
+        """
+        IDF-weighted length of an entry's feature vector.
+
+        IDF drifts slowly as questions are added, so the norm is only recomputed
+        once the index has grown or shrunk by a tenth since it was last computed.
+        """
+        if entry.get("norm") is None or abs(total - entry["norm_total"]) > entry["norm_total"] / 10:
+            entry["norm"] = math.sqrt(sum(
+                (math.log((total + 1) / (self.doc_freq.get(feature, 0) + 1)) + 1) ** 2 for feature in entry["features"]
+            ))
+            entry["norm_total"] = total
+        return entry["norm"]
+
+    def _evict_oldest(self):
+        while self.entries[self.oldest] is None:
+            self.oldest += 1
+        entry = self.entries[self.oldest]
+        self.entries[self.oldest] = None
+        self.live -= 1
+        for feature in entry["features"]:
+            self.doc_freq[feature] -= 1
+            if not self.doc_freq[feature]:
+                del self.doc_freq[feature]
+                del self.postings[feature]
+        # Posting lists still hold the evicted id; compact them once they are mostly stale
+        if self.oldest > self.live:
+            self._compact()
+
+    def _compact(self):
+        self.postings = {
+            feature: array("i", (entry_id for entry_id in ids if self.entries[entry_id] is not None))
+            for feature, ids in self.postings.items()
+        }
+
+def tokenize_question(question):
+    """Split a question into lowercase words, numbers and quoted strings."""
+    return [token if token[0] in "'\"" else token.lower() for token in TOKEN_RE.findall(question)]
+
+def question_features(tokens, values=()):
+    """
+    Similarity features of a question.
+
+    Numbers, quoted strings and known values are replaced by placeholders, so
+    questions that only differ in their literals share every feature.
+    """
+    words = [
+        "<num>" if NUMBER_RE.match(token) else "<str>" if token[0] in "'\"" else "<val>" if token in values else token
+        for token in tokens
+    ]
+    features = set(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        if word[0] == "<":
+            continue
+        padded = f"#{word}#"
+        features.update(f"~{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return frozenset(features)
+
+def find_slots(tokens, sql):
+    """
+    Find the question tokens that appear as literals in the SQL.
+
+    Returns:
+        dict: Token position -> literal as written in the SQL
+    """
+    literals = {match.group(1).replace("''", "'") for match in SQL_STRING_RE.finditer(sql)}
+    lowered = {literal.lower(): literal for literal in literals}
+    slots = {}
+    for position, token in enumerate(tokens):
+        if NUMBER_RE.match(token):
+            if re.search(rf"(?<![\w.]){re.escape(token)}(?![\w.])", sql):
+                slots[position] = token
+        elif token[0] in "'\"":
+            value = token[1:-1]
+            if value in literals:
+                slots[position] = value
+        elif token in lowered:
+            slots[position] = lowered[token]
+    return slots
+
+def substitute(entry, tokens):
+    """
+    Rewrite an entry's SQL for a new question.
+
+    The new question is aligned with the cached one token by token. The only
+    differences allowed are slots swapped one for one, each replaced by the
+    new question's token in the SQL. Any other added, missing or changed word
+    ("by channel", "before" for "in", a region the SQL does not filter on)
+    could change what the SQL must do, so the match is refused.
+
+    Returns:
+        str or None: Rewritten SQL, or None if the questions cannot be mapped safely
+    """
+    old_tokens = entry["tokens"]
+    matcher = difflib.SequenceMatcher(a=old_tokens, b=tokens, autojunk=False)
+    replacements = {}
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # Every difference must be a one-for-one swap of slots
+        if tag != "replace" or old_end - old_start != new_end - new_start:
+            return None
+        for offset, position in enumerate(range(old_start, old_end)):
+            if position not in entry["slots"]:
+                return None
+            replacements[entry["slots"][position]] = _literal_value(tokens[new_start + offset], entry["slots"][position])
+
+    sql = entry["sql"]
+    for old, new in replacements.items():
+        sql = _replace_literal(sql, old, new)
+    return sql
+
+def _literal_value(token, old):
+    """Write a question token the way the SQL wrote the literal it replaces."""
+    if token[0] in "'\"":
+        return token[1:-1]
+    if old.isupper():
+        return token.upper()
+    if old[:1].isupper():
+        return token.capitalize()
+    return token
+
+def _replace_literal(sql, old, new):
+    """Replace a literal in SQL, as a quoted string or as a bare number."""
+    quoted_old = old.replace("'", "''")
+    quoted_new = new.replace("'", "''")
+    sql = sql.replace(f"'{quoted_old}'", f"'{quoted_new}'")
+    if NUMBER_RE.match(old):
+        sql = re.sub(rf"(?<![\w.']){re.escape(old)}(?![\w.'])", new, sql)
+    return sql
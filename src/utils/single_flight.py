@@ -0,0 +1,138 @@
+# src/utils/single_flight.py
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent identical requests.
+
+    The first caller for a key runs the computation. Callers arriving with the
+    same key before it finishes wait for it and get the same result, or the
+    same exception. Nothing is kept once it finishes, so later calls, retries
+    after an error included, start a new computation; caching is left to the
+    caches.
+
+    Threads coalesce through do() and coroutines through ado(); a thread and a
+    coroutine asking for the same key run separately.
+    """
+
+    def __init__(self, enabled=None):
+        """
+        Initialize the group.
+
+        Args:
+            enabled (bool, optional): Coalesce requests. Defaults to COALESCE_REQUESTS or True.
+        """
+        if enabled is None:
+            enabled = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+        self.enabled = enabled
+
+        # Computations started, and callers that joined one already in flight
+        self.calls = 0
+        self.shared = 0
+        # key -> Future of the running computation
+        self._flights = {}
+        # (event loop, key) -> [Task of the computation, callers waiting for it]
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run func, or wait for the identical computation already running in another thread.
+
+        Args:
+            key (hashable): Identifies identical requests
+            func (callable): Computation, called without arguments
+
+        Returns:
+            tuple: (result, True if it came from another caller's computation)
+
+        Raises:
+            Exception: Whatever the computation raised, in every caller that shared it
+        """
+        if not self.enabled:
+            return func(), False
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def ado(self, key, factory):
+        """
+        Await a coroutine, or the identical one already running on this event loop.
+
+        The computation runs in a task of its own, so cancelling one caller only
+        stops that caller from waiting. The computation itself is cancelled when
+        every caller waiting for it has been.
+
+        Args:
+            key (hashable): Identifies identical requests
+            factory (callable): Returns the coroutine to run; only called by the first caller
+
+        Returns:
+            tuple: (result, True if it came from another caller's computation)
+
+        Raises:
+            Exception: Whatever the computation raised, in every caller that shared it
+        """
+        if not self.enabled:
+            return await factory(), False
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            flight = self._tasks.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = [loop.create_task(factory()), 0]
+                self._tasks[flight_key] = flight
+                flight[0].add_done_callback(lambda task: self._finished(flight_key, task))
+                self.calls += 1
+            else:
+                self.shared += 1
+            flight[1] += 1
+
+        task = flight[0]
+        try:
+            return await asyncio.shield(task), not leader
+        except asyncio.CancelledError:
+            if not task.done():
+                with self._lock:
+                    if flight[1] == 1:
+                        # Nobody else wants the result; a new caller starts afresh
+                        self._forget(flight_key, task)
+                        task.cancel()
+            raise
+        finally:
+            with self._lock:
+                flight[1] -= 1
+
+    def _finished(self, flight_key, task):
+        with self._lock:
+            self._forget(flight_key, task)
+
+    def _forget(self, flight_key, task):
+        flight = self._tasks.get(flight_key)
+        if flight is not None and flight[0] is task:
+            del self._tasks[flight_key]
@@ -0,0 +1,587 @@
+# src/utils/sql_parser.py
+
+import re
+
+# Token patterns, tried in order
+TOKEN_PATTERNS = [
+    ("whitespace", r"\s+"),
+    ("comment", r"--[^\n]*|/\*.*?(?:\*/|$)"),
+    ("string", r"'(?:[^']|'')*'?"),
+    ("quoted_ident", r'"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?'),
+    ("number", r"\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?"),
+    ("ident", r"[A-Za-z_][A-Za-z0-9_$]*"),
+    ("op", r"<=|>=|<>|!=|==|\|\||::|[-+*/%<>=~&|^!]"),
+    ("punct", r"[(),.;?:@$]"),
+]
+TOKEN_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_PATTERNS), re.DOTALL)
+
+# Words that can follow a table name without being an alias
+RESERVED = {
+    "SELECT", "FROM", "WHERE", "GROUP", "ORDER", "BY", "HAVING", "LIMIT", "OFFSET",
+    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL", "ON", "USING",
+    "UNION", "INTERSECT", "EXCEPT", "ALL", "AS", "WITH", "RECURSIVE", "AND", "OR", "NOT",
+    "IN", "IS", "NULL", "LIKE", "BETWEEN", "CASE", "WHEN", "THEN", "ELSE", "END",
+    "WINDOW", "DISTINCT", "VALUES", "INTO", "UPDATE", "SET", "DELETE", "INSERT",
+    "ASC", "DESC", "EXISTS", "FILTER", "OVER", "PARTITION", "ROWS", "RANGE",
+}
+
+class Token:
+    """A single lexical token of an SQL statement."""
+
+    __slots__ = ("type", "value")
+
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+    @property
+    def name(self):
+        """Identifier name with quotes removed, or None for non-identifiers."""
+        if self.type == "ident":
+            return self.value
+        if self.type == "quoted_ident":
+            inner = self.value[1:-1] if len(self.value) > 1 else ""
+            return inner.replace('""', '"')
+        return None
+
+    @property
+    def upper(self):
+        """Upper-cased token text, used for keyword comparisons."""
+        return self.value.upper()
+
+    def is_keyword(self, *words):
+        """Check whether this is an unquoted identifier matching one of the keywords."""
+        return self.type == "ident" and self.value.upper() in words
+
+    def __repr__(self):
+        return f"Token({self.type!r}, {self.value!r})"
+
+def tokenize(sql):
+    """
+    Split an SQL statement into tokens, dropping whitespace and comments.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        list: Token objects
+    """
+    tokens = []
+    pos = 0
+    while pos < len(sql):
+        match = TOKEN_RE.match(sql, pos)
+        if not match:
+            # Unknown character; keep it so positions stay meaningful
+            tokens.append(Token("punct", sql[pos]))
+            pos += 1
+            continue
+        kind = match.lastgroup
+        if kind not in ("whitespace", "comment"):
+            tokens.append(Token(kind, match.group()))
+        pos = match.end()
+    return tokens
+
+# Functions and literals whose value changes between executions
+NONDETERMINISTIC = {"RANDOM", "RANDOMBLOB", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP", "CHANGES",
+                    "LAST_INSERT_ROWID", "TOTAL_CHANGES"}
+
+def canonical_sql(sql):
+    """
+    Normalize an SQL statement so trivially different spellings compare equal.
+
+    Whitespace and comments are dropped, keywords are upper-cased and a trailing
+    semicolon is removed. Identifiers and literals are left untouched because
+    they determine result column names and values.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        str: Canonical form of the statement
+    """
+    tokens = tokenize(sql)
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    return " ".join(
+        token.upper if token.type == "ident" and token.upper in RESERVED else token.value
+        for token in tokens
+    )
+
+def is_deterministic(sql):
+    """
+    Check whether a query returns the same rows every time it runs on the same data.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        bool: False if the query uses random numbers or the current date/time
+    """
+    for token in tokenize(sql):
+        if token.type == "ident" and token.upper in NONDETERMINISTIC:
+            return False
+        if token.type == "string" and token.value.lower() in ("'now'", "'localtime'"):
+            return False
+    return True
+
+class TableRef:
+    """A table (or CTE) named in a FROM or JOIN clause."""
+
+    def __init__(self, name, alias=None):
+        self.name = name
+        self.alias = alias
+
+    def __repr__(self):
+        return f"TableRef({self.name!r}, alias={self.alias!r})"
+
+class SubqueryRef:
+    """A parenthesized query used as a FROM or JOIN source."""
+
+    def __init__(self, query, alias=None):
+        self.query = query
+        self.alias = alias
+
+    def __repr__(self):
+        return f"SubqueryRef(alias={self.alias!r})"
+
+class SelectNode:
+    """One SELECT (or VALUES) core of a query."""
+
+    def __init__(self):
+        self.sources = []
+        self.subqueries = []
+        self.bare_star = False
+        self.qualified_stars = []
+
+class QueryNode:
+    """A full query: optional WITH clause plus SELECT cores joined by set operators."""
+
+    def __init__(self):
+        self.ctes = []
+        self.recursive = False
+        self.selects = []
+        self.subqueries = []
+
+    def walk(self):
+        """Yield this query and every nested query (CTEs, FROM subqueries, expression subqueries)."""
+        yield self
+        children = [query for _, query in self.ctes] + list(self.subqueries)
+        for select in self.selects:
+            children.extend(source.query for source in select.sources if isinstance(source, SubqueryRef))
+            children.extend(select.subqueries)
+        for child in children:
+            yield from child.walk()
+
+class SQLParser:
+    """
+    Small recursive-descent parser for the structure of SELECT statements.
+
+    It does not validate expressions; it only recovers what the executor needs:
+    CTE definitions, FROM/JOIN sources with their aliases, nested subqueries
+    and star selections.
+    """
+
+    # Keywords that end a FROM clause at the current nesting level
+    FROM_END = {"WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "WINDOW",
+                "UNION", "INTERSECT", "EXCEPT", "RETURNING"}
+    JOIN_WORDS = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL"}
+    SET_OPERATORS = {"UNION", "INTERSECT", "EXCEPT"}
+
+    def __init__(self, sql):
+        self.tokens = tokenize(sql)
+        self.pos = 0
+
+    def parse(self):
+        """Parse the first statement of the SQL text into a QueryNode."""
+        return self._query()
+
+    def _peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def _at_end(self):
+        token = self._peek()
+        return token is None or token.value in (")", ";")
+
+    def _starts_query(self, offset=0):
+        token = self._peek(offset)
+        return token is not None and token.is_keyword("SELECT", "WITH", "VALUES")
+
+    def _query(self):
+        query = QueryNode()
+        if self._peek() is not None and self._peek().is_keyword("WITH"):
+            self.pos += 1
+            if self._peek() is not None and self._peek().is_keyword("RECURSIVE"):
+                query.recursive = True
+                self.pos += 1
+            self._ctes(query)
+
+        while not self._at_end():
+            token = self._peek()
+            if token.is_keyword("SELECT", "VALUES"):
+                query.selects.append(self._select())
+            elif token.value == "(" and (self._starts_query(1) or (self._peek(1) and self._peek(1).value == "(")):
+                # Parenthesized compound member
+                self.pos += 1
+                query.subqueries.append(self._query())
+                self._expect_close()
+            elif token.is_keyword(*self.SET_OPERATORS, "ALL", "DISTINCT"):
+                self.pos += 1
+            else:
+                # ORDER BY / LIMIT of a compound query, or anything we do not model
+                self._expression_token(query.subqueries)
+        return query
+
+    def _ctes(self, query):
+        while self._peek() is not None:
+            name = self._peek().name
+            if name is None:
+                return
+            self.pos += 1
+            if self._peek() is not None and self._peek().value == "(":
+                # Column list of the CTE
+                self._skip_parens()
+            while self._peek() is not None and self._peek().is_keyword("AS", "NOT", "MATERIALIZED"):
+                self.pos += 1
+            if self._peek() is None or self._peek().value != "(":
+                return
+            self.pos += 1
+            query.ctes.append((name, self._query()))
+            self._expect_close()
+            if self._peek() is not None and self._peek().value == ",":
+                self.pos += 1
+                continue
+            return
+
+    def _select(self):
+        select = SelectNode()
+        self.pos += 1  # SELECT or VALUES
+        in_select_list = True
+        prev = None
+        while not self._at_end():
+            token = self._peek()
+            if token.is_keyword(*self.SET_OPERATORS):
+                break
+            if token.is_keyword("FROM"):
+                self.pos += 1
+                in_select_list = False
+                self._from_clause(select)
+                prev = None
+                continue
+            if token.is_keyword("WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "WINDOW"):
+                in_select_list = False
+            if in_select_list and token.value == "*":
+                if prev is not None and prev.value == "." and self.pos >= 2:
+                    select.qualified_stars.append(self.tokens[self.pos - 2].name)
+                elif prev is None or prev.value == "," or prev.is_keyword("DISTINCT", "ALL"):
+                    select.bare_star = True
+                # Anywhere else it multiplies
+            prev = token
+            self._expression_token(select.subqueries)
+        return select
+
+    def _from_clause(self, select):
+        while not self._at_end():
+            token = self._peek()
+            if token.is_keyword(*self.FROM_END):
+                return
+            if token.value == "," or token.is_keyword(*self.JOIN_WORDS):
+                self.pos += 1
+                continue
+            if token.is_keyword("ON"):
+                self.pos += 1
+                self._join_condition(select)
+                continue
+            if token.is_keyword("USING"):
+                self.pos += 1
+                if self._peek() is not None and self._peek().value == "(":
+                    self._skip_parens()
+                continue
+            self._source(select)
+
+    def _join_condition(self, select):
+        while not self._at_end():
+            token = self._peek()
+            if token.is_keyword(*self.FROM_END) or token.is_keyword(*self.JOIN_WORDS) or token.value == ",":
+                return
+            self._expression_token(select.subqueries)
+
+    def _source(self, select):
+        token = self._peek()
+        if token.value == "(":
+            self.pos += 1
+            if self._starts_query():
+                sub = self._query()
+                self._expect_close()
+                select.sources.append(SubqueryRef(sub, self._alias()))
+            else:
+                # Parenthesized join: its sources belong to this SELECT
+                self._from_clause(select)
+                self._expect_close()
+                self._alias()
+            return
+
+        name = token.name
+        if name is None:
+            self.pos += 1
+            return
+        self.pos += 1
+        # Schema-qualified names: keep the last part
+        while (self._peek() is not None and self._peek().value == "."
+               and self._peek(1) is not None and self._peek(1).name):
+            name = self._peek(1).name
+            self.pos += 2
+        if self._peek() is not None and self._peek().value == "(":
+            # Table-valued function such as json_each(...)
+            self._expression_token(select.subqueries)
+            self._alias()
+            return
+        select.sources.append(TableRef(name, self._alias()))
+
+    def _alias(self):
+        token = self._peek()
+        if token is not None and token.is_keyword("AS"):
+            self.pos += 1
+            token = self._peek()
+            if token is not None and token.name:
+                self.pos += 1
+                return token.name
+            return None
+        if token is not None and token.name and token.upper not in RESERVED:
+            self.pos += 1
+            return token.name
+        return None
+
+    def _expression_token(self, subqueries):
+        """Consume one expression token, descending into parenthesized subqueries."""
+        token = self._peek()
+        if token.value == "(":
+            self.pos += 1
+            if self._starts_query():
+                subqueries.append(self._query())
+                self._expect_close()
+                return
+            while not self._at_end():
+                self._expression_token(subqueries)
+            self._expect_close()
+            return
+        self.pos += 1
+
+    def _skip_parens(self):
+        depth = 0
+        while self._peek() is not None:
+            value = self._peek().value
+            self.pos += 1
+            if value == "(":
+                depth += 1
+            elif value == ")":
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _expect_close(self):
+        if self._peek() is not None and self._peek().value == ")":
+            self.pos += 1
+
+def parse(sql):
+    """
+    Parse the structure of an SQL query.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        QueryNode: Root of the parsed query
+    """
+    return SQLParser(sql).parse()
+
+def base_tables(sql):
+    """
+    List the physical tables a query reads, excluding CTE names and subquery aliases.
+
+    Args:
+        sql (str): SQL query
+
+    Returns:
+        list: Table names in order of first appearance
+    """
+    tables = []
+    seen = set()
+
+    def collect(query, visible):
+        scope = visible | {name.lower() for name, _ in query.ctes}
+        for _, cte in query.ctes:
+            collect(cte, scope)
+        for sub in query.subqueries:
+            collect(sub, scope)
+        for select in query.selects:
+            for source in select.sources:
+                if isinstance(source, SubqueryRef):
+                    collect(source.query, scope)
+                elif source.name.lower() not in scope and source.name.lower() not in seen:
+                    seen.add(source.name.lower())
+                    tables.append(source.name)
+            for sub in select.subqueries:
+                collect(sub, scope)
+
+    collect(parse(sql), set())
+    return tables
+
+def referenced_columns(sql, table_columns):
+    """
+    Work out which columns of each table a query can touch.
+
+    The result is a conservative superset: any identifier that names a column of
+    a table counts as a reference to it, wherever it appears (SELECT list, WHERE,
+    JOIN conditions, GROUP BY, ORDER BY, ...). A bare "*" or "alias.*" selects
+    every column of the tables it covers.
+
+    Args:
+        sql (str): SQL query
+        table_columns (dict): Mapping of table name to its list of column names
+
+    Returns:
+        dict: Mapping of table name to the list of needed columns (in table order),
+              or None for tables whose every column is needed
+    """
+    tokens = tokenize(sql)
+    lookup = {table.lower(): table for table in table_columns}
+    columns_lower = {
+        table: {col.lower(): col for col in columns}
+        for table, columns in table_columns.items()
+    }
+    root = parse(sql)
+    aliases = _table_aliases(root, lookup)
+
+    needed = {table: set() for table in table_columns}
+    all_columns = set()
+    if any(token.is_keyword("NATURAL") for token in tokens):
+        # NATURAL JOIN compares every shared column implicitly
+        all_columns.update(table_columns)
+    all_columns.update(_star_tables(root, lookup, aliases, table_columns))
+
+    for _, table, column in _column_refs(tokens, aliases, columns_lower):
+        needed[table].add(column)
+
+    result = {}
+    for table, columns in table_columns.items():
+        if table in all_columns:
+            result[table] = None
+        else:
+            ordered = [col for col in columns if col in needed[table]]
+            # A table needs at least one column to exist, e.g. for COUNT(*)
+            result[table] = ordered or list(columns[:1])
+    return result
+
+def predicate_columns(sql, table_columns):
+    """
+    Find the columns a query filters, joins or groups on.
+
+    These are the columns that benefit from an index: references inside WHERE,
+    JOIN ... ON / USING and GROUP BY clauses at any nesting level.
+
+    Args:
+        sql (str): SQL query
+        table_columns (dict): Mapping of table name to its list of column names
+
+    Returns:
+        dict: Mapping of table name to the set of predicate columns
+    """
+    tokens = tokenize(sql)
+    lookup = {table.lower(): table for table in table_columns}
+    columns_lower = {
+        table: {col.lower(): col for col in columns}
+        for table, columns in table_columns.items()
+    }
+    aliases = _table_aliases(parse(sql), lookup)
+    clauses = _clauses(tokens)
+
+    predicates = {table: set() for table in table_columns}
+    for index, table, column in _column_refs(tokens, aliases, columns_lower):
+        if clauses[index] in ("WHERE", "ON", "USING", "GROUP"):
+            predicates[table].add(column)
+    return predicates
+
+def _column_refs(tokens, aliases, columns_lower):
+    """
+    Resolve identifier tokens to table columns.
+
+    Qualified references ("alias.col") resolve through the alias map. Unqualified
+    names count for every table that has such a column.
+
+    Yields:
+        tuple: (token index, table name, column name)
+    """
+    for i, token in enumerate(tokens):
+        prev = tokens[i - 1] if i > 0 else None
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        name = token.name
+        if name is None or (nxt is not None and nxt.value == "."):
+            continue
+        lower = name.lower()
+
+        if prev is not None and prev.value == "." and i > 1:
+            qualifier = tokens[i - 2].name
+            table = aliases.get(qualifier.lower()) if qualifier else None
+            if table:
+                if lower in columns_lower[table]:
+                    yield i, table, columns_lower[table][lower]
+                continue
+
+        for table, columns in columns_lower.items():
+            if lower in columns:
+                yield i, table, columns[lower]
+
+def _clauses(tokens):
+    """Label every token with the clause it belongs to (SELECT, FROM, ON, WHERE, ...)."""
+    labels = []
+    stack = []
+    clause = None
+    for i, token in enumerate(tokens):
+        if token.value == "(":
+            labels.append(clause)
+            stack.append(clause)
+            continue
+        if token.value == ")":
+            clause = stack.pop() if stack else None
+            labels.append(clause)
+            continue
+        if token.is_keyword("SELECT", "FROM", "ON", "USING", "WHERE", "GROUP", "HAVING",
+                            "ORDER", "LIMIT", "WINDOW"):
+            clause = token.upper
+        elif token.is_keyword("JOIN"):
+            clause = "FROM"
+        labels.append(clause)
+    return labels
+
+def _table_aliases(root, lookup):
+    """Map table names and their aliases (lower-cased) to the tables being loaded."""
+    aliases = {}
+    for query in root.walk():
+        for select in query.selects:
+            for source in select.sources:
+                if isinstance(source, TableRef) and source.name.lower() in lookup:
+                    table = lookup[source.name.lower()]
+                    aliases.setdefault(source.name.lower(), table)
+                    if source.alias:
+                        aliases[source.alias.lower()] = table
+    return aliases
+
+def _star_tables(root, lookup, aliases, table_columns):
+    """Find the tables whose every column is selected through "*" or "alias.*"."""
+    tables = set()
+    for query in root.walk():
+        for select in query.selects:
+            if select.bare_star:
+                for source in select.sources:
+                    if isinstance(source, TableRef) and source.name.lower() in lookup:
+                        tables.add(lookup[source.name.lower()])
+            for qualifier in select.qualified_stars:
+                table = aliases.get(qualifier.lower()) if qualifier else None
+                if table:
+                    tables.add(table)
+                elif qualifier is None:
+                    # Could not tell which table the star belongs to
+                    tables.update(table_columns)
+    return tables
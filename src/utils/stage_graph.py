@@ -0,0 +1,108 @@
+# src/utils/stage_graph.py
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+class StageGraph:
+    """
+    Run pipeline stages in dependency order, independent ones in parallel.
+
+    Each stage is a function called once with a dict of the results of the
+    stages it depends on. A stage starts as soon as all of its dependencies
+    have finished; when several are ready at once they run on the worker pool.
+    If a stage fails, the results of the stages that did finish are handed to
+    their cleanup functions, so resources such as open query results are
+    released.
+    """
+
+    def __init__(self):
+        # name -> (function, names of the stages it depends on, cleanup function)
+        self.stages = {}
+
+    def add(self, name, func, after=(), cleanup=None):
+        """
+        Add a stage.
+
+        Args:
+            name (str): Stage name, used for its result and timing
+            func (callable): Called as func(results) with the results of the stages in after
+            after (tuple): Names of the stages that must finish first
+            cleanup (callable, optional): Called with the stage's result if another stage fails
+
+        Returns:
+            StageGraph: The graph, so calls can be chained
+        """
+        self.stages[name] = (func, tuple(after), cleanup)
+        return self
+
+    def run(self, executor):
+        """
+        Run every stage once.
+
+        A stage that is the only one able to run is called in the calling thread
+        rather than handed to the pool. When a stage fails, stages that have not
+        started are dropped and running ones are waited for, then every finished
+        result is passed to its stage's cleanup before the error is raised.
+
+        Args:
+            executor (concurrent.futures.Executor): Pool for stages that run in parallel
+
+        Returns:
+            tuple: (stage name -> result, stage name -> seconds)
+
+        Raises:
+            ValueError: If a stage depends on an unknown stage or on itself through a cycle
+            Exception: The first exception raised by a stage
+        """
+        results = {}
+        timings = {}
+        pending = dict(self.stages)
+        running = {}
+        try:
+            while pending or running:
+                ready = [name for name, (_, after, _) in pending.items() if all(dep in results for dep in after)]
+                if not ready and not running:
+                    raise ValueError(f"Stages can never run: {', '.join(sorted(pending))}")
+
+                if len(ready) == 1 and not running:
+                    name = ready[0]
+                    func, after, _ = pending.pop(name)
+                    results[name], timings[name] = _timed(func, {dep: results[dep] for dep in after})
+                    continue
+
+                for name in ready:
+                    func, after, _ = pending.pop(name)
+                    # Each stage sees the caller's context variables, such as the open trace span
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, _timed, func, {dep: results[dep] for dep in after})] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name], timings[name] = future.result()
+        except BaseException:
+            self._clean_up(results, running)
+            raise
+        return results, timings
+
+    def _clean_up(self, results, running):
+        """After a failure: drop stages not started, wait for running ones, then clean up every result."""
+        for future in running:
+            future.cancel()
+        wait(running)
+        for future, name in running.items():
+            if not future.cancelled() and future.exception() is None:
+                results[name] = future.result()[0]
+        for name, result in results.items():
+            cleanup = self.stages[name][2]
+            if cleanup is None:
+                continue
+            try:
+                cleanup(result)
+            except Exception as e:
+                print(f"Error cleaning up stage {name}: {e}")
+
+def _timed(func, inputs):
+    start = time.perf_counter()
+    result = func(inputs)
+    return result, time.perf_counter() - start
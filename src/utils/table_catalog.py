@@ -0,0 +1,271 @@
+# src/utils/table_catalog.py
+
+import json
+import os
+import sqlite3
+import threading
+import pandas as pd
+from src.utils.csv_loader import sqlite_frame
+from src.utils.fingerprint import file_fingerprint
+
+class TableCatalog:
+    """Long-lived SQLite catalog that keeps CSV-backed tables resident across queries."""
+
+    META_TABLE = "_nli_catalog"
+    # Tables are loaded under a staging name and renamed into place; a replaced
+    # table that an open result stream still reads is renamed aside until it can be dropped
+    STAGING_SUFFIX = "__nli_staging"
+    RETIRED_SUFFIX = "__nli_retired_"
+
+    def __init__(self, db_path=None, hash_content=None):
+        """
+        Initialize the catalog.
+
+        Args:
+            db_path (str, optional): SQLite database path. Defaults to CATALOG_DB_PATH
+                                     or an in-memory database.
+            hash_content (bool, optional): Compare content hashes when mtime or size
+                                           change, so touched-but-identical files are
+                                           not reloaded. Defaults to CATALOG_HASH_CONTENT.
+        """
+        if db_path is None:
+            db_path = os.getenv("CATALOG_DB_PATH", ":memory:")
+        if hash_content is None:
+            hash_content = os.getenv("CATALOG_HASH_CONTENT", "false").lower() == "true"
+        self.db_path = db_path
+        self.hash_content = hash_content
+
+        # One shared connection; all access goes through the lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+
+        # table_name -> {"path": str, "fingerprint": dict, "columns": list or None}
+        self.tables = {}
+        # Replaced tables waiting for the streams reading them to close
+        self._retired = []
+        self._retired_count = 0
+        self._load_metadata()
+
+    def ensure_table(self, table_name, file_path, loader, columns=None):
+        """
+        Make sure a table is loaded and up to date with its source file.
+
+        A resident table that already holds every requested column is reused.
+        Otherwise the table is reloaded with the union of the columns it held
+        and the ones requested, so alternating queries do not thrash.
+
+        Args:
+            table_name (str): Name of the table in SQL queries
+            file_path (str): Path to the source CSV file
+            loader (callable): Called as loader(file_path, table_name, columns) and returns
+                              a DataFrame or an iterator of DataFrame chunks
+            columns (list, optional): Columns the caller needs. All columns if None.
+
+        Returns:
+            bool: True if the table was (re)loaded, False if the resident copy was reused
+        """
+        with self.lock:
+            try:
+                fingerprint = file_fingerprint(file_path)
+            except OSError as e:
+                print(f"Error reading source file {file_path}: {e}")
+                return False
+
+            entry = self.tables.get(table_name)
+            if entry and entry["path"] == file_path and self._is_current(table_name, entry, fingerprint):
+                if _covers(entry.get("columns"), columns):
+                    return False
+                if columns is not None:
+                    loaded = set(entry["columns"])
+                    columns = entry["columns"] + [col for col in columns if col not in loaded]
+
+            if self.hash_content:
+                fingerprint = file_fingerprint(file_path, hash_content=True)
+
+            # Load into a staging table so result streams still reading the resident
+            # copy are not disturbed; SQLite cannot drop a table an open cursor reads
+            staging = table_name + self.STAGING_SUFFIX
+            data = loader(file_path, table_name, columns)
+            if isinstance(data, pd.DataFrame):
+                if data.empty and len(data.columns) == 0:
+                    return False
+                sqlite_frame(data).to_sql(staging, self.conn, index=False, if_exists='replace')
+            elif not self._bulk_insert(staging, data):
+                return False
+            self._swap_in(table_name, staging)
+            self._record(table_name, file_path, fingerprint, columns)
+            print(f"Catalog loaded table '{table_name}' from {file_path}")
+            return True
+
+    def invalidate(self, table_name=None):
+        """
+        Drop one table (or all tables) from the catalog so the next use reloads it.
+
+        Args:
+            table_name (str, optional): Table to drop. Drops every table if None.
+        """
+        with self.lock:
+            names = [table_name] if table_name else list(self.tables)
+            for name in names:
+                self._retire(name)
+                self.conn.execute(f'DELETE FROM {self.META_TABLE} WHERE table_name = ?', (name,))
+                self.tables.pop(name, None)
+            self.conn.commit()
+            self.drop_retired()
+
+    def drop_retired(self):
+        """
+        Drop replaced tables that no open result stream reads any more.
+
+        Returns:
+            int: Replaced tables still kept for open streams
+        """
+        with self.lock:
+            for name in list(self._retired):
+                try:
+                    self.conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+                    self._retired.remove(name)
+                except sqlite3.OperationalError:
+                    # Still read by an open stream; tried again after the next load
+                    pass
+            self.conn.commit()
+            return len(self._retired)
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self.lock:
+            self.conn.close()
+
+    def _swap_in(self, table_name, staging):
+        """Replace a table with a freshly loaded staging table."""
+        self._retire(table_name)
+        self.conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table_name}"')
+        self.conn.commit()
+        self.drop_retired()
+
+    def _retire(self, table_name):
+        """Rename a table aside, to be dropped once no open stream reads it."""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        if exists:
+            self._retired_count += 1
+            retired = f"{table_name}{self.RETIRED_SUFFIX}{self._retired_count}"
+            # Unlike DROP TABLE, a rename works while a cursor is reading the table
+            self.conn.execute(f'ALTER TABLE "{table_name}" RENAME TO "{retired}"')
+            self._retired.append(retired)
+
+    def _bulk_insert(self, table_name, chunks):
+        """
+        Stream DataFrame chunks into a table inside a single transaction.
+
+        Args:
+            table_name (str): Table to (re)create
+            chunks (iterator): DataFrame chunks with identical columns
+
+        Returns:
+            bool: True if the table was written
+        """
+        previous = self._set_bulk_pragmas()
+        insert_sql = None
+        rows = 0
+        try:
+            for chunk in chunks:
+                chunk = sqlite_frame(chunk)
+                if insert_sql is None:
+                    # Let pandas derive the column types, then insert rows ourselves
+                    chunk.head(0).to_sql(table_name, self.conn, index=False, if_exists='replace')
+                    placeholders = ", ".join("?" * len(chunk.columns))
+                    insert_sql = f'INSERT INTO "{table_name}" VALUES ({placeholders})'
+                self.conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+                rows += len(chunk)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            self.conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            self.conn.commit()
+            print(f"Error streaming table '{table_name}': {e}")
+            return False
+        finally:
+            self._restore_pragmas(previous)
+
+        print(f"Streamed {rows} rows into '{table_name}'")
+        return insert_sql is not None
+
+    def _set_bulk_pragmas(self):
+        """Relax durability for a bulk load and return the settings to restore."""
+        previous = {
+            pragma: self.conn.execute(f'PRAGMA {pragma}').fetchone()[0]
+            for pragma in ('synchronous', 'journal_mode', 'temp_store')
+        }
+        # The catalog can always be rebuilt from the CSVs, so skip fsyncs during the load
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA journal_mode = MEMORY')
+        self.conn.execute('PRAGMA temp_store = MEMORY')
+        return previous
+
+    def _restore_pragmas(self, previous):
+        """Restore the settings saved by _set_bulk_pragmas."""
+        for pragma, value in previous.items():
+            self.conn.execute(f'PRAGMA {pragma} = {value}')
+
+    def _is_current(self, table_name, entry, fingerprint):
+        """Check whether a resident table still matches its source file."""
+        old = entry["fingerprint"]
+        if old.get("mtime") == fingerprint["mtime"] and old.get("size") == fingerprint["size"]:
+            return True
+        if self.hash_content and old.get("sha256") and old.get("size") == fingerprint["size"]:
+            # mtime moved but the size did not; fall back to comparing contents
+            current = file_fingerprint(entry["path"], hash_content=True)
+            if current["sha256"] == old["sha256"]:
+                self._record(table_name, entry["path"], current, entry.get("columns"))
+                return True
+        return False
+
+    def _record(self, table_name, file_path, fingerprint, columns=None):
+        """Remember which source version and columns a table was loaded from."""
+        self.tables[table_name] = {"path": file_path, "fingerprint": fingerprint, "columns": columns}
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO {self.META_TABLE} (table_name, source_path, fingerprint, columns) '
+            'VALUES (?, ?, ?, ?)',
+            (table_name, file_path, json.dumps(fingerprint), json.dumps(columns))
+        )
+        self.conn.commit()
+
+    def _load_metadata(self):
+        """Restore table fingerprints persisted by a previous run (on-disk catalogs only)."""
+        with self.lock:
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.META_TABLE} '
+                '(table_name TEXT PRIMARY KEY, source_path TEXT, fingerprint TEXT, columns TEXT)'
+            )
+            existing = [row[1] for row in self.conn.execute(f'PRAGMA table_info({self.META_TABLE})')]
+            if 'columns' not in existing:
+                # Catalogs written before column pruning held every column
+                self.conn.execute(f'ALTER TABLE {self.META_TABLE} ADD COLUMN columns TEXT')
+            self.conn.commit()
+            # Replaced and half-loaded tables left behind by a previous run
+            leftovers = [
+                row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                if self.RETIRED_SUFFIX in row[0] or row[0].endswith(self.STAGING_SUFFIX)
+            ]
+            for name in leftovers:
+                self.conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            self.conn.commit()
+            rows = self.conn.execute(
+                f'SELECT table_name, source_path, fingerprint, columns FROM {self.META_TABLE}'
+            ).fetchall()
+            for table_name, source_path, fingerprint, columns in rows:
+                self.tables[table_name] = {
+                    "path": source_path,
+                    "fingerprint": json.loads(fingerprint),
+                    "columns": json.loads(columns) if columns else None,
+                }
+
+def _covers(loaded, requested):
+    """Check whether the loaded columns include every requested column (None means all)."""
+    if loaded is None:
+        return True
+    if requested is None:
+        return False
+    return set(requested) <= set(loaded)
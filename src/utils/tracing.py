@@ -0,0 +1,294 @@
+# src/utils/tracing.py
+
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The span the current thread or task is inside of
+_current_span = contextvars.ContextVar("nli_current_span", default=None)
+
+class Span:
+    """One timed operation in a trace, opened with Tracer.span()."""
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = None
+        self.parent_id = None
+        self.start = None
+        self.duration = None
+        self._started = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+    def set(self, **attributes):
+        """Add attributes, such as row counts, to the span."""
+        self.attributes.update(attributes)
+
+class _NoopSpan:
+    """Span handed out while tracing is disabled; every operation does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Record timed spans of pipeline work and aggregate them into metrics.
+
+    Spans nest through a context variable, so work done in a stage belongs
+    to that stage's span and every span of one question shares a trace id.
+    Finished spans are appended to a JSON-lines trace file with their
+    duration, attributes and the process's peak memory. Per-span latency
+    histograms, row counts and errors are kept in memory and written as a
+    Prometheus text snapshot when a trace completes, at most once per
+    metrics interval, and when the tracer is closed.
+
+    While disabled, span() returns a shared no-op span, so instrumented code
+    pays for little more than the method call.
+    """
+
+    def __init__(self, enabled=None, trace_path=None, metrics_path=None, metrics_interval=None):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled (bool, optional): Record spans. Defaults to TRACING or False.
+            trace_path (str, optional): JSON-lines trace file. Defaults to TRACE_PATH
+                                        or ./output/traces.jsonl.
+            metrics_path (str, optional): Prometheus text snapshot. Defaults to METRICS_PATH
+                                          or ./output/metrics.prom.
+            metrics_interval (float, optional): Minimum seconds between snapshots. Defaults to
+                                                METRICS_INTERVAL or 1.
+        """
+        if enabled is None:
+            enabled = os.getenv("TRACING", "false").lower() == "true"
+        self.enabled = enabled
+        self.trace_path = trace_path or os.getenv("TRACE_PATH", "./output/traces.jsonl")
+        self.metrics_path = metrics_path or os.getenv("METRICS_PATH", "./output/metrics.prom")
+        if metrics_interval is None:
+            metrics_interval = float(os.getenv("METRICS_INTERVAL", "1"))
+        self.metrics_interval = metrics_interval
+
+        # span name -> {"count", "sum", "buckets", "rows", "errors"}
+        self.metrics = {}
+        self._file = None
+        self._lock = threading.Lock()
+        # When the last snapshot was taken, and whether spans finished since
+        self._metrics_written = None
+        self._metrics_dirty = False
+        self._write_lock = threading.Lock()
+
+    def span(self, name, **attributes):
+        """
+        Open a span, to be used as a context manager.
+
+        Args:
+            name (str): Operation name (e.g., "llm_call")
+            **attributes: Initial span attributes
+
+        Returns:
+            Span: The span, or a no-op span if tracing is disabled
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span, if any."""
+        if not self.enabled:
+            return
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def prometheus_text(self):
+        """
+        Render the aggregated metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Metrics snapshot
+        """
+        lines = [
+            "# HELP nli_span_seconds Time spent in each instrumented operation",
+            "# TYPE nli_span_seconds histogram",
+        ]
+        with self._lock:
+            metrics = {name: dict(values, buckets=list(values["buckets"])) for name, values in self.metrics.items()}
+        for name, values in sorted(metrics.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values["buckets"]):
+                cumulative += count
+                lines.append(f'nli_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'nli_span_seconds_bucket{{span="{name}",le="+Inf"}} {values["count"]}')
+            lines.append(f'nli_span_seconds_sum{{span="{name}"}} {values["sum"]:.6f}')
+            lines.append(f'nli_span_seconds_count{{span="{name}"}} {values["count"]}')
+        lines += ["# HELP nli_span_rows_total Rows produced by each operation", "# TYPE nli_span_rows_total counter"]
+        lines += [f'nli_span_rows_total{{span="{name}"}} {values["rows"]}' for name, values in sorted(metrics.items())]
+        lines += ["# HELP nli_span_errors_total Operations that raised", "# TYPE nli_span_errors_total counter"]
+        lines += [f'nli_span_errors_total{{span="{name}"}} {values["errors"]}' for name, values in sorted(metrics.items())]
+        lines += [
+            "# HELP nli_process_peak_memory_bytes Peak resident memory of the process",
+            "# TYPE nli_process_peak_memory_bytes gauge",
+            f"nli_process_peak_memory_bytes {peak_memory_bytes()}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        """Write the Prometheus snapshot, replacing the previous one atomically."""
+        path = path or self.metrics_path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock:
+            with self._lock:
+                self._metrics_written = time.monotonic()
+                self._metrics_dirty = False
+            # A temporary file of its own, so a concurrent writer never renames it away
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    def close(self):
+        """Write a final metrics snapshot if spans finished since the last one, and close the trace file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            pending = self._metrics_dirty
+        if pending:
+            self._snapshot()
+
+    def _finish(self, span):
+        """Record a finished span in the trace file and the metrics."""
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": span.start,
+            "duration": span.duration,
+            "thread": threading.current_thread().name,
+            "peak_memory_bytes": peak_memory_bytes(),
+            "attributes": span.attributes,
+        }
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            values = self.metrics.setdefault(
+                span.name, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS), "rows": 0, "errors": 0}
+            )
+            values["count"] += 1
+            values["sum"] += span.duration
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    values["buckets"][i] += 1
+                    break
+            rows = span.attributes.get("rows")
+            if isinstance(rows, int):
+                values["rows"] += rows
+            if "error" in span.attributes:
+                values["errors"] += 1
+            self._metrics_dirty = True
+
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+                self._file = open(self.trace_path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            due = span.parent_id is None and (
+                self._metrics_written is None
+                or time.monotonic() - self._metrics_written >= self.metrics_interval
+            )
+        if due:
+            self._snapshot()
+
+    def _snapshot(self):
+        """Write the metrics snapshot; a failed write is reported, never raised into the traced code."""
+        try:
+            self.write_metrics()
+        except OSError as e:
+            print(f"Error writing metrics to {self.metrics_path}: {e}")
+
+def peak_memory_bytes():
+    """Peak resident memory of the process so far, or 0 where it cannot be read."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """
+    Process-wide Tracer, configured from the environment on first use.
+
+    Returns:
+        Tracer: The shared tracer
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+def set_tracer(tracer):
+    """
+    Replace the process-wide Tracer.
+
+    Args:
+        tracer (Tracer): Tracer used by every instrumented component from now on
+
+    Returns:
+        Tracer: The tracer it replaced
+    """
+    global _tracer
+    with _tracer_lock:
+        previous = _tracer
+        _tracer = tracer
+    return previous
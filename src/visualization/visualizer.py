@@ -1,25 +1,39 @@
 # src/visualization/visualizer.py
 
+import matplotlib
+# Charts are only saved to files, and may be rendered off the main thread
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
+import threading
+import uuid
 from pathlib import Path
 import os
+from src.utils.result_stream import sample_frame
+from src.utils.tracing import get_tracer
+
+_render_lock = threading.Lock()
 
 class DataVisualizer:
     """Generate appropriate visualizations based on query results."""
     
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, max_rows=None):
         """
         Initialize the visualizer.
         
         Args:
             output_dir (str, optional): Directory to save visualizations
+            max_rows (int, optional): Most rows read from a streamed result.
+                                      Defaults to VIZ_MAX_ROWS or 1000.
         """
         if output_dir is None:
             output_dir = os.getenv("VISUALIZATION_DIR", "./output/visualizations")
+        if max_rows is None:
+            max_rows = int(os.getenv("VIZ_MAX_ROWS", "1000"))
         self.output_dir = Path(output_dir)
+        self.max_rows = max_rows
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Set the style for visualizations
@@ -30,7 +44,8 @@ class DataVisualizer:
         Create an appropriate visualization based on the data.
         
         Args:
-            df (pandas.DataFrame): Data to visualize
+            df (pandas.DataFrame or ResultStream): Data to visualize. Only the first
+                                                   max_rows rows of a stream are plotted.
             query_text (str): Original query text
             user_role (str, optional): User role for context-aware visualizations
             viz_type (str, optional): Force a specific visualization type
@@ -39,6 +54,7 @@ class DataVisualizer:
         Returns:
             dict: Visualization metadata including file path
         """
+        df, _ = sample_frame(df, self.max_rows)
         if df.empty:
             return {"error": "No data to visualize"}
         
@@ -46,9 +62,9 @@ class DataVisualizer:
         if viz_type is None:
             viz_type = self._recommend_visualization(df, query_text)
         
-        # Create a unique filename
+        # Create a unique filename; charts of concurrent questions can share a second
         timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"{viz_type}_{timestamp}.png"
+        file_name = f"{viz_type}_{timestamp}_{uuid.uuid4().hex[:8]}.png"
         file_path = self.output_dir / file_name
         
         # Generate the title if not provided
@@ -56,42 +72,60 @@ class DataVisualizer:
             title = self._generate_title(query_text, df.columns)
         
         # Create the visualization
-        fig, ax = plt.subplots(figsize=(10, 6))
+        # pyplot keeps global state, so charts from concurrent pipelines take turns
+        with get_tracer().span("render", chart=viz_type, rows=len(df)), _render_lock:
+            fig, ax = plt.subplots(figsize=(10, 6))
         
-        try:
-            if viz_type == "bar":
-                self._create_bar_chart(df, ax)
-            elif viz_type == "line":
-                self._create_line_chart(df, ax)
-            elif viz_type == "pie":
-                self._create_pie_chart(df, ax)
-            elif viz_type == "scatter":
-                self._create_scatter_plot(df, ax)
-            elif viz_type == "heatmap":
-                self._create_heatmap(df, ax)
-            else:
-                # Default to a table for small datasets or unknown types
-                self._create_table_visualization(df, ax)
-            
-            # Add title and labels
-            plt.title(title, fontsize=14, pad=20)
-            plt.tight_layout()
-            
-            # Save the figure
-            plt.savefig(file_path, dpi=300, bbox_inches='tight')
-            plt.close(fig)
-            
-            return {
-                "type": viz_type,
-                "path": str(file_path),
-                "title": title,
-                "data_shape": df.shape
-            }
+            try:
+                if viz_type == "bar":
+                    self._create_bar_chart(df, ax)
+                elif viz_type == "line":
+                    self._create_line_chart(df, ax)
+                elif viz_type == "pie":
+                    self._create_pie_chart(df, ax)
+                elif viz_type == "scatter":
+                    self._create_scatter_plot(df, ax)
+                elif viz_type == "heatmap":
+                    self._create_heatmap(df, ax)
+                else:
+                    # Default to a table for small datasets or unknown types
+                    self._create_table_visualization(df, ax)
+
+                # Add title and labels
+                plt.title(title, fontsize=14, pad=20)
+                plt.tight_layout()
+
+                # Save the figure
+                plt.savefig(file_path, dpi=300, bbox_inches='tight')
+                plt.close(fig)
+
+                return {
+                    "type": viz_type,
+                    "path": str(file_path),
+                    "title": title,
+                    "data_shape": df.shape
+                }
+
+            except Exception as e:
+                plt.close(fig)
+                print(f"Error creating visualization: {e}")
+                return {"error": str(e)}
+    
+    def recommend(self, df, query_text):
+        """
+        Recommend a visualization type without rendering anything.
+        
+        Args:
+            df (pandas.DataFrame or ResultStream): Data to visualize
+            query_text (str): Original query text
             
-        except Exception as e:
-            plt.close(fig)
-            print(f"Error creating visualization: {e}")
-            return {"error": str(e)}
+        Returns:
+            str or None: Recommended visualization type, or None if there is no data
+        """
+        df, _ = sample_frame(df, self.max_rows)
+        if df.empty:
+            return None
+        return self._recommend_visualization(df, query_text)
     
     def _recommend_visualization(self, df, query_text):
         """